@@ -5,6 +5,7 @@ depletion simulation.
 """
 from __future__ import absolute_import, division, print_function
 from .version import __version__  # noqa
+from .nuclide_index import *
 from .materialflow import *
 from .depcode import *
 from .serpent_depcode import *
@@ -15,3 +16,4 @@ from .reactor import *
 from .sparger import *
 from .separator import *
 from .results import *
+from .results_collection import *
@@ -1,4 +1,6 @@
 import os
+import time
+import hashlib
 from pathlib import Path
 from copy import deepcopy
 
@@ -13,6 +15,7 @@ import networkx as nx
 
 from saltproc import SerpentDepcode, OpenMCDepcode, Simulation, Reactor
 from saltproc import Process, Sparger, Separator, Materialflow
+from saltproc.process import _make_waste_stream
 
 # Validator that fills defualt values of JSON schema before validating
 from saltproc._schema_default import DefaultFillingValidator
@@ -47,76 +50,103 @@ def run():
 
     # Check: Restarting previous simulation or starting new?
     failed_step = simulation.check_restart()
-    # Run sequence
-    # Start sequence
-    for step_idx in range(failed_step, len(msr.depletion_timesteps)):
-        print("\n\n\nStep #%i has been started" % (step_idx + 1))
-        simulation.sim_depcode.write_runtime_input(msr,
-                                                   step_idx,
-                                                   simulation.restart_flag)
-
-        if rebuild_saltproc_results:
-            simulation.sim_depcode.rebuild_simulation_files(step_idx)
-        else:
-            depcode.run_depletion_step(mpi_args, threads)
-        if step_idx == 0 and simulation.restart_flag is False:  # First step
-            # Read general simulation data which never changes
-            simulation.store_depcode_metadata()
-            # Parse and store data for initial state (beginning of step_idx)
-            mats = depcode.read_depleted_materials(False)
-            simulation.store_mat_data(mats, step_idx - 1, False)
-        # Finish of First step
-        # Main sequence
-        mats = depcode.read_depleted_materials(True)
-        simulation.store_mat_data(mats, step_idx, False)
-        simulation.store_step_neutronics_parameters()
-        simulation.store_step_metadata()
-
-        # Reprocessing here
-        if run_without_reprocessing:
-            waste_and_feed_streams = None
-            waste_streams = None
-            extracted_mass = None
-        else:
-            for key in mats.keys():
-                print('\nMass and volume of '
-                      f'{key} before reproc: {mats[key].mass} g, ',
-                      f'{mats[key].volume} cm3')
-            waste_streams, extracted_mass = reprocess_materials(mats,
-                                                                process_file,
-                                                                dot_file)
-            for key in mats.keys():
-                print('\nMass and volume of '
-                      f'{key} after reproc: {mats[key].mass} g, ',
-                      f'{mats[key].volume} cm3')
-
-            waste_and_feed_streams = refill_materials(mats,
-                                                      extracted_mass,
-                                                      waste_streams,
-                                                      process_file)
-            for key in mats.keys():
-                print('\nMass and volume of '
-                      f'{key} after refill: {mats[key].mass} g, ',
-                      f'{mats[key].volume} cm3')
-
-            print("Removed mass [g]:", extracted_mass)
-
-         # Store in DB after reprocessing and refill (right before next depl)
-        simulation.store_after_repr(mats, waste_and_feed_streams, step_idx)
-        depcode.update_depletable_materials(mats, simulation.burn_time)
-
-        # Preserve depletion and transport result and input files
-        if not rebuild_saltproc_results:
-            depcode.preserve_simulation_files(step_idx)
-
-        del mats, waste_streams, waste_and_feed_streams, extracted_mass
-        gc.collect()
-        # Switch to another geometry?
-        if simulation.adjust_geo and simulation.read_k_eds_delta(step_idx):
-            depcode.switch_to_next_geometry()
-        print("\nTime at the end of current depletion step: %fd" %
-              simulation.burn_time)
-        print("Simulation succeeded.\n")
+    processing_plan = ProcessingPlan(process_file, dot_file)
+    # Keep the database open for the whole run
+    simulation.open_database()
+    try:
+        # Run sequence
+        # Start sequence
+        for step_idx in range(failed_step, len(msr.depletion_timesteps)):
+            print("\n\n\nStep #%i has been started" % (step_idx + 1))
+            simulation.sim_depcode.write_runtime_input(msr,
+                                                       step_idx,
+                                                       simulation.restart_flag)
+
+            if rebuild_saltproc_results:
+                simulation.sim_depcode.rebuild_simulation_files(step_idx)
+            else:
+                depcode.run_depletion_step(mpi_args, threads)
+            # First step
+            if step_idx == 0 and simulation.restart_flag is False:
+                # Read general simulation data which never changes
+                simulation.store_depcode_metadata()
+                # Parse and store data for initial state (beginning of
+                # step_idx)
+                mats = depcode.read_depleted_materials(False)
+                simulation.store_mat_data(mats, step_idx - 1, False)
+            # Finish of First step
+            # Main sequence
+            mats = depcode.read_depleted_materials(True)
+            simulation.store_mat_data(mats, step_idx, False)
+            simulation.store_step_neutronics_parameters()
+            simulation.store_step_metadata()
+
+            # Reprocessing here
+            if run_without_reprocessing:
+                waste_and_feed_streams = None
+                waste_streams = None
+                extracted_mass = None
+            else:
+                for key in mats.keys():
+                    print('\nMass and volume of '
+                          f'{key} before reproc: {mats[key].mass} g, ',
+                          f'{mats[key].volume} cm3')
+                reprocessing_start = time.perf_counter()
+                if processing_plan.update():
+                    plan_build_time = processing_plan.build_time
+                else:
+                    plan_build_time = 0.0
+                waste_streams, extracted_mass = \
+                    reprocess_materials(mats,
+                                        process_file,
+                                        dot_file,
+                                        processing_plan=processing_plan)
+                for key in mats.keys():
+                    print('\nMass and volume of '
+                          f'{key} after reproc: {mats[key].mass} g, ',
+                          f'{mats[key].volume} cm3')
+
+                waste_and_feed_streams = \
+                    refill_materials(mats,
+                                     extracted_mass,
+                                     waste_streams,
+                                     process_file,
+                                     processing_plan=processing_plan)
+                for key in mats.keys():
+                    print('\nMass and volume of '
+                          f'{key} after refill: {mats[key].mass} g, ',
+                          f'{mats[key].volume} cm3')
+
+                print("Removed mass [g]:", extracted_mass)
+                print('Reprocessing time: %f s (processing plan parse and '
+                      'build: %f s)' % (time.perf_counter() -
+                                        reprocessing_start,
+                                        plan_build_time))
+
+            # Store in DB after reprocessing and refill (right before next
+            # depl)
+            simulation.store_after_repr(mats, waste_and_feed_streams, step_idx)
+            depcode.update_depletable_materials(mats, simulation.burn_time)
+
+            # Preserve depletion and transport result and input files
+            if not rebuild_saltproc_results:
+                depcode.preserve_simulation_files(step_idx)
+
+            del mats, waste_streams, waste_and_feed_streams, extracted_mass
+            gc.collect()
+            # Switch to another geometry?
+            if simulation.adjust_geo and simulation.read_k_eds_delta(step_idx):
+                depcode.switch_to_next_geometry()
+            print("\nTime at the end of current depletion step: %fd" %
+                  simulation.burn_time)
+            print("Simulation succeeded.\n")
+            simulation.end_step()
+    finally:
+        # Write what an interrupted step stored and stop the depletion code
+        try:
+            simulation.close_database()
+        finally:
+            depcode.close_session()
 
 def parse_arguments():
     """Parses arguments from command line.
@@ -305,7 +335,15 @@ def _create_simulation_object(simulation_input, depcode):
         sim_depcode=depcode,
         restart_flag=simulation_input['restart_flag'],
         adjust_geo=simulation_input['adjust_geo'],
-        db_path=simulation_input['db_name'])
+        db_path=simulation_input['db_name'],
+        async_storage=simulation_input['async_storage'],
+        durability=simulation_input['durability'],
+        nuclide_axis=simulation_input['nuclide_axis'],
+        nuclide_headroom=simulation_input['nuclide_headroom'],
+        chunk_layout=simulation_input['chunk_layout'],
+        sparse_streams=simulation_input['sparse_streams'],
+        live_results=simulation_input['live_results'],
+        live_results_timeout=simulation_input['live_results_timeout'])
     return simulation
 
 
@@ -393,7 +431,329 @@ def _scale_depletion_timesteps(timestep_units, depletion_timesteps, codename):
 
     return depletion_timesteps
 
-def reprocess_materials(mats, process_file, dot_file):
+class ProcessingPlan():
+    """Reprocessing system described by the process and DOT input files,
+    parsed once and reused every depletion step.
+
+    The plan is rebuilt by :meth:`update` only when the modification time
+    and the content of one of the input files change.
+
+    Parameters
+    ----------
+    process_file : str
+        Path to the `.json` file describing the fuel reprocessing components.
+    dot_file : str
+        Path to the `.dot` describing the fuel reprocessing paths.
+
+    Attributes
+    ----------
+    extraction_processes : dict of str to dict
+        Output of :func:`get_extraction_processes`.
+    material_for_extraction : str
+        Name of burnable material which the reprocessing scheme applies to.
+    process_graph : networkx.DiGraph
+        Output of :func:`get_extraction_process_graph`.
+    process_order : list of str
+        Output of :func:`get_extraction_process_graph`.
+    transfers : dict of str to ReprocessingTransfer
+        Reprocessing system of `material_for_extraction` composed into
+        per-element transfer fractions.
+    feeds : dict of str to dict
+        Output of :func:`get_feeds`.
+    build_time : float
+        Wall time [s] spent parsing the input files and building the plan
+        the last time it was built.
+    n_builds : int
+        Number of times the plan has been built.
+
+    """
+
+    def __init__(self, process_file, dot_file):
+        self.process_file = process_file
+        self.dot_file = dot_file
+        self.build_time = 0.0
+        self.n_builds = 0
+        self._file_stats = None
+        self._file_hashes = None
+
+    def _input_files(self):
+        return (self.process_file, self.dot_file)
+
+    def update(self):
+        """Builds the plan if it has not been built yet, or if one of the
+        input files changed since the last build.
+
+        Returns
+        -------
+        rebuilt : bool
+            `True` if the plan was (re)built.
+
+        """
+        file_stats = []
+        for path in self._input_files():
+            stat = os.stat(path)
+            file_stats.append((stat.st_mtime_ns, stat.st_size))
+        if file_stats == self._file_stats:
+            return False
+
+        file_hashes = []
+        for path in self._input_files():
+            with open(path, 'rb') as f:
+                file_hashes.append(hashlib.sha256(f.read()).hexdigest())
+        self._file_stats = file_stats
+        if file_hashes == self._file_hashes:
+            # Modified time changed, but the content did not
+            return False
+        self._file_hashes = file_hashes
+
+        start = time.perf_counter()
+        self.extraction_processes = get_extraction_processes(self.process_file)
+        (self.material_for_extraction,
+         self.process_graph,
+         self.process_order) = get_extraction_process_graph(self.dot_file)
+        self.transfers = {}
+        if self.material_for_extraction in self.extraction_processes:
+            self.transfers[self.material_for_extraction] = \
+                ReprocessingTransfer(
+                    self.extraction_processes[self.material_for_extraction],
+                    self.process_graph,
+                    self.process_order)
+        self.feeds = get_feeds(self.process_file)
+        self.build_time = time.perf_counter() - start
+        self.n_builds += 1
+        return True
+
+
+class ReprocessingTransfer():
+    """Reprocessing system of a material composed into per-element transfer
+    fractions.
+
+    Each process removes a fixed fraction of every element it targets, so
+    the reprocessing system as a whole scales the mass of each element by a
+    constant factor. The fractions of the core outlet flow that leave
+    `core_inlet` and that end up in the waste stream of every process are
+    computed once by :meth:`compose`, and applying the reprocessing system
+    to a material reduces to multiplying its nuclide masses by them.
+
+    Parameters
+    ----------
+    processes : dict of str to Process
+        Extraction processes of the material.
+    process_graph : networkx.DiGraph
+        Processes between `core_outlet` and `core_inlet`.
+    process_order : list of str
+        Processes in `process_graph` in topological order.
+
+    Attributes
+    ----------
+    elements : list of str
+        Elements removed by at least one process. Element fraction arrays
+        have one more entry, which applies to all other elements.
+    thru_fractions : numpy.ndarray
+        Fraction of each element in the core outlet flow that leaves
+        `core_inlet`.
+    waste_fractions : dict of str to numpy.ndarray
+        Fraction of each element in the core outlet flow that ends up in
+        the waste stream of each process.
+    split_fractions : dict of str to list of tuple
+        Downstream processes of each process and the fraction of its thru
+        flow sent to them, which is the ratio of their mass flow rate to
+        the mass flow rate of `core_outlet`.
+    is_constant : bool
+        `False` if the efficiency of a process is a function, in which case
+        the fractions are recomputed every time :meth:`apply` is called.
+
+    """
+
+    def __init__(self, processes, process_graph, process_order):
+        self.processes = processes
+        self.process_graph = process_graph
+        self.process_order = process_order
+        self.is_constant = not any(
+            isinstance(eff, str)
+            for proc in process_order
+            for eff in processes[proc].efficiency.values())
+        self.compose()
+
+    def compose(self):
+        """Composes the processes into element transfer fractions."""
+        efficiencies = OrderedDict()
+        for proc in self.process_order:
+            process = self.processes[proc]
+            efficiencies[proc] = {
+                element: process.calculate_removal_efficiency(element)
+                for element in process.efficiency}
+        self.elements = sorted(set().union(*efficiencies.values()))
+        element_index = {element: i for i, element in enumerate(self.elements)}
+        n_elements = len(self.elements) + 1
+
+        self.waste_fractions = OrderedDict()
+        self.split_fractions = {}
+        self._process_elements = {}
+        inflow_fractions = {self.process_order[0]: np.ones(n_elements)}
+        for proc in self.process_order:
+            efficiency = np.zeros(n_elements)
+            process_elements = np.zeros(n_elements, dtype=bool)
+            for element, eff in efficiencies[proc].items():
+                efficiency[element_index[element]] = eff
+                process_elements[element_index[element]] = True
+            self._process_elements[proc] = process_elements
+
+            inflow_fraction = inflow_fractions.pop(proc)
+            self.waste_fractions[proc] = inflow_fraction * efficiency
+            thru_fraction = inflow_fraction * (1.0 - efficiency)
+
+            self.split_fractions[proc] = self._split(proc)
+            for child, fraction in self.split_fractions[proc]:
+                inflow_fractions[child] = \
+                    inflow_fractions.get(child, 0.0) + fraction * thru_fraction
+        self.thru_fractions = thru_fraction
+
+    def _split(self, proc):
+        """Fraction of the thru flow of `proc` sent to each downstream
+        process, based on their mass flow rates.
+
+        Raises
+        ------
+        ValueError
+            If `core_outlet` or a downstream process has no mass flow rate,
+            which would drop the flow through it.
+
+        """
+        core_outlet_flowrate = self.processes['core_outlet'].mass_flowrate
+        split = []
+        for child in self.process_graph.successors(proc):
+            mass_flowrate = self.processes[child].mass_flowrate
+            if mass_flowrate <= 0 or core_outlet_flowrate <= 0:
+                raise ValueError(
+                    f'Process {child} and core_outlet must have a positive '
+                    f'mass flow rate, but they have {mass_flowrate} and '
+                    f'{core_outlet_flowrate}')
+            split.append((child,
+                          float(mass_flowrate / core_outlet_flowrate)))
+        return split
+
+    def apply(self, material, waste_streams):
+        """Applies the reprocessing system to `material`.
+
+        Parameters
+        ----------
+        material : Materialflow
+            Material entering `core_outlet`.
+        waste_streams : dict of str to Materialflow
+            Dictionary the waste stream of every process is added to.
+
+        Returns
+        -------
+        outflow : Materialflow
+            Material leaving `core_inlet`.
+
+        """
+        if not self.is_constant:
+            self.compose()
+
+        positions = material.positions
+        masses = material.get_mass() * material.fractions
+        element_index = {element: i for i, element in enumerate(self.elements)}
+        elements, nuc_elements = np.unique(
+            material.nuclide_index.elements[positions], return_inverse=True)
+        element_slots = [element_index.get(element, len(self.elements))
+                         for element in elements]
+        nuc_elements = np.array(element_slots, dtype=int)[nuc_elements]
+
+        # Total mass, volume, mass flow rate, burnup, and void fraction of
+        # the flow entering each process. These follow the same arithmetic
+        # as Process.process_material() and the Materialflow operators.
+        inflows = {self.process_order[0]: (material.mass,
+                                           material.volume,
+                                           material.mass_flowrate,
+                                           material.burnup,
+                                           material.void_frac)}
+        for proc in self.process_order:
+            inflow = inflows.pop(proc)
+            mass, volume, mass_flowrate, burnup, void_frac = inflow
+
+            process_nucs = self._process_elements[proc][nuc_elements]
+            waste_mass = masses[process_nucs] * \
+                self.waste_fractions[proc][nuc_elements[process_nucs]]
+            total_waste_mass = np.sum(waste_mass)
+            if total_waste_mass > 0.0:
+                waste_stream = Materialflow.from_arrays(
+                    positions[process_nucs], waste_mass / total_waste_mass)
+            else:
+                # Nothing is removed, e.g. with a zero efficiency or
+                # without the target elements in the material
+                waste_stream = Materialflow()
+            waste_stream = _make_waste_stream(waste_stream, total_waste_mass)
+            waste_streams['waste_' + proc] = waste_stream
+
+            thru_mass = mass - total_waste_mass
+            if mass > 0.0:
+                thru_volume = (volume - waste_stream.volume) * thru_mass / mass
+            else:
+                thru_volume = 0.0
+            thru = (thru_mass, thru_volume, mass_flowrate, burnup, void_frac)
+            for child, fraction in self.split_fractions[proc]:
+                if fraction != 1.0:
+                    branch = (fraction * thru_mass,
+                              fraction * thru_volume,
+                              fraction * mass_flowrate,
+                              burnup,
+                              void_frac)
+                else:
+                    branch = thru
+                if child in inflows:
+                    inflows[child] = _merge_flows(inflows[child], branch)
+                else:
+                    inflows[child] = branch
+
+        thru_masses = masses * self.thru_fractions[nuc_elements]
+        if thru_mass > 0.0:
+            thru_fractions = thru_masses / thru_mass
+        else:
+            thru_fractions = np.zeros_like(thru_masses)
+        density = mass / volume if volume > 0.0 else 0.0
+        outflow = Materialflow.from_arrays(positions,
+                                           thru_fractions,
+                                           density=density,
+                                           volume=volume,
+                                           mass_flowrate=mass_flowrate,
+                                           void_frac=void_frac,
+                                           burnup=burnup)
+        outflow.volume = thru_volume
+        outflow.mass = thru_mass
+        return outflow
+
+
+def _merge_flows(x, y):
+    """Merges the total mass, volume, mass flow rate, burnup and void
+    fraction of two flows the same way :meth:`Materialflow.__add__` does."""
+    x_mass, x_volume, x_mass_flowrate, x_burnup, x_void_frac = x
+    y_mass, y_volume, y_mass_flowrate, y_burnup, y_void_frac = y
+    if (x_mass == 0.0 or x_volume == 0.0) \
+            and (y_mass == 0.0 or y_volume == 0.0):
+        # Neither flow carries material
+        return (x_mass + y_mass,
+                x_volume + y_volume,
+                x_mass_flowrate + y_mass_flowrate,
+                x_burnup,
+                x_void_frac)
+    elif (x_mass == 0.0 or x_volume == 0.0) \
+            and (y_mass != 0.0 and y_volume != 0.0):
+        return y
+    elif (x_mass != 0.0 and x_volume != 0.0) \
+            and (y_mass == 0.0 or y_volume == 0.0):
+        return x
+    mass = x_mass + y_mass
+    volume = mass / (x_mass / x_volume)
+    return (mass,
+            volume,
+            x_mass_flowrate + y_mass_flowrate,
+            (x_burnup * x_mass + y_burnup * y_mass) / mass,
+            (x_void_frac * x_volume + y_void_frac * y_volume) / volume)
+
+
+def reprocess_materials(mats, process_file, dot_file, processing_plan=None):
     """Applies extraction reprocessing scheme to burnable materials.
 
     Parameters
@@ -406,6 +766,10 @@ def reprocess_materials(mats, process_file, dot_file):
         Path to the `.json` file describing the fuel reprocessing components.
     dot_file : str
         Path to the `.dot` describing the fuel reprocessing paths.
+    processing_plan : ProcessingPlan, optional
+        Reprocessing system, which the caller brings up to date with
+        :meth:`ProcessingPlan.update`. If `None`, the reprocessing system is
+        parsed from `process_file` and `dot_file`.
 
     Returns
     -------
@@ -426,55 +790,35 @@ def reprocess_materials(mats, process_file, dot_file):
     inmass = {}
     extracted_mass = {}
     waste_streams = OrderedDict()
-    thru_flows = OrderedDict()
 
-    extraction_processes = get_extraction_processes(process_file)
-    material_for_extraction, extraction_process_paths = \
-        get_extraction_process_paths(dot_file)
+    if processing_plan is None:
+        processing_plan = ProcessingPlan(process_file, dot_file)
+        processing_plan.update()
+    extraction_processes = processing_plan.extraction_processes
+    material_for_extraction = processing_plan.material_for_extraction
 
     # iterate over materials
     for mat_name, processes in extraction_processes.items():
         initial_material = mats[mat_name]
         waste_streams[mat_name] = {}
-        thru_flows[mat_name] = []
 
         inmass[mat_name] = float(initial_material.mass)
         print(f"Mass of material '{mat_name}' before reprocessing: "
               f"{inmass[mat_name]} g")
 
         if mat_name == material_for_extraction:
-            for i, path in enumerate(extraction_process_paths):
-                thru_flows[mat_name].append(initial_material)
-
-                for proc in path:
-                    # Calculate fraction of the flow going to the process proc
-                    divisor = float(processes[proc].mass_flowrate /
-                                    processes['core_outlet'].mass_flowrate)
-
-                    # Calculate waste stream and thru flow on proccess proc
-                    thru_flow, waste_stream = \
-                        processes[proc].process_material(
-                            divisor * thru_flows[mat_name][i])
-
-                    waste_streams[mat_name]['waste_' + proc] = waste_stream
-                    thru_flows[mat_name][i] = thru_flow
-
-            # Sum thru flows from all paths together
-            mats[mat_name] = thru_flows[mat_name][0]
-            print(f'1 Materal mass on path 0: '
-                  f'{thru_flows[mat_name][0].mass}')
-            for idx in range(1, i + 1):
-                mats[mat_name] += thru_flows[mat_name][idx]
-                print(f'{i + 1} Materal mass on path {i}: '
-                      f'{thru_flows[mat_name][i].mass}')
+            transfer = processing_plan.transfers[mat_name]
+            mats[mat_name] = transfer.apply(initial_material,
+                                            waste_streams[mat_name])
+            print(f"Mass of material '{mat_name}' after reprocessing: "
+                  f"{mats[mat_name].mass} g")
 
         extracted_mass[mat_name] = \
             inmass[mat_name] - float(mats[mat_name].mass)
 
     # Clear memory
-    del extraction_processes, inmass, mat_name, processes, thru_flows
-    del material_for_extraction, extraction_process_paths, divisor
-    del thru_flow, waste_stream
+    del extraction_processes, inmass, mat_name, processes
+    del material_for_extraction
 
     return waste_streams, extracted_mass
 
@@ -525,9 +869,10 @@ def get_extraction_processes(process_file):
         return extraction_processes
 
 
-def get_extraction_process_paths(dot_file):
+def get_extraction_process_graph(dot_file):
     """Reads directed graph that describes fuel reprocessing system structure
-    from a `*.dot` file.
+    from a `*.dot` file, and keeps the processes that lie on a path between
+    `core_outlet` and `core_inlet`.
 
     Parameters
     ----------
@@ -538,24 +883,33 @@ def get_extraction_process_paths(dot_file):
     -------
     mat_name : str
         Name of burnable material which the reprocessing scheme applies to.
-    extraction_process_paths : list
-        List of lists containing all possible paths between `core_outlet` and
-        `core_inlet`.
+    process_graph : networkx.DiGraph
+        Subgraph of the reprocessing system containing the processes between
+        `core_outlet` and `core_inlet`.
+    process_order : list of str
+        Processes in `process_graph` in topological order, starting with
+        `core_outlet` and ending with `core_inlet`.
 
     """
-    digraph = nx.drawing.nx_pydot.read_dot(dot_file)
+    digraph = nx.DiGraph(nx.drawing.nx_pydot.read_dot(dot_file))
     mat_name = digraph.name
-    # Iterate over all possible paths between 'core_outlet' and 'core_inlet'
-    all_simple_paths = nx.all_simple_paths(digraph,
-                                           source='core_outlet',
-                                           target='core_inlet')
-    extraction_process_paths = []
-    for path in all_simple_paths:
-        extraction_process_paths.append(path)
-    return mat_name, extraction_process_paths
-
-
-def refill_materials(mats, extracted_mass, waste_streams, process_file):
+    flow_nodes = (nx.descendants(digraph, 'core_outlet') &
+                  nx.ancestors(digraph, 'core_inlet'))
+    flow_nodes |= {'core_outlet', 'core_inlet'}
+    process_graph = digraph.subgraph(flow_nodes)
+    try:
+        process_order = list(nx.topological_sort(process_graph))
+    except nx.NetworkXUnfeasible:
+        raise ValueError(f'The reprocessing system in {dot_file} contains '
+                         'a cycle between core_outlet and core_inlet')
+    return mat_name, process_graph, process_order
+
+
+def refill_materials(mats,
+                     extracted_mass,
+                     waste_streams,
+                     process_file,
+                     processing_plan=None):
     """Makes up material loss in removal processes by adding fresh fuel.
 
     Parameters
@@ -578,6 +932,10 @@ def refill_materials(mats, extracted_mass, waste_streams, process_file):
             waste streams.
     process_file : str
         Path to the `.json` file describing the fuel reprocessing components.
+    processing_plan : ProcessingPlan, optional
+        Reprocessing system, which the caller brings up to date with
+        :meth:`ProcessingPlan.update`. If `None`, the feeds are parsed from
+        `process_file`.
 
     Returns
     -------
@@ -587,7 +945,10 @@ def refill_materials(mats, extracted_mass, waste_streams, process_file):
         representing those material feed streams.
 
     """
-    feeds = get_feeds(process_file)
+    if processing_plan is None:
+        feeds = get_feeds(process_file)
+    else:
+        feeds = processing_plan.feeds
     refill_mats = OrderedDict()
     # Get feed group for each material
     for mat, mat_feeds in feeds.items():
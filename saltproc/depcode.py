@@ -151,6 +151,23 @@ class Depcode(ABC):
             raise RuntimeError('\n %s RUN FAILED\n see error message above'
                                % (self.codename))
 
+    def get_depletion_nuclides(self):
+        """Returns the names of the nuclides that the depletion code can
+        track, or `None` if they are not known.
+
+        Returns
+        -------
+        nuclides : list of str or None
+            Nuclide names (e.g. ``U235`` or ``Am242_m1``).
+
+        """
+        return None
+
+    def close_session(self):
+        """Shuts down a persistent depletion code session. Does nothing
+        for depletion codes that start a new process every depletion step.
+        """
+
     @abstractmethod
     def switch_to_next_geometry(self):
         """Changes the geometry used in the depletion code simulation to the
@@ -1,15 +1,21 @@
 """Materialflow module"""
-import copy
 import math
-from collections import Counter
+from copy import deepcopy
 
 import numpy as np
 
 from openmc import Material
+from openmc.data import AVOGADRO
 
-class Materialflow(Material):
-    """ Class contains information about burnable material flow. Child class of
-    :class:`openmc.Material`.
+from saltproc.nuclide_index import NuclideIndex
+
+
+class Materialflow():
+    """ Class contains information about burnable material flow.
+
+    The composition is stored as an array of mass fractions over positions
+    in :attr:`nuclide_index`, which is shared by all material flows. An
+    :class:`openmc.Material` is only built on request by :meth:`to_openmc`.
 
     Parameters
     ----------
@@ -31,6 +37,22 @@ class Materialflow(Material):
 
     """
 
+    __slots__ = ('_positions',
+                 '_fractions',
+                 '_comp',
+                 '_material_kwargs',
+                 'name',
+                 'temperature',
+                 'mass',
+                 'volume',
+                 'density',
+                 'density_units',
+                 'mass_flowrate',
+                 'void_frac',
+                 'burnup')
+
+    nuclide_index = NuclideIndex()
+
     def __init__(
             self,
             comp=None,
@@ -44,57 +66,141 @@ class Materialflow(Material):
         """ Initializes the Materialflow object.
 
         """
-        # initialize parent class attributes
-        super().__init__(**kwargs)
-
-        # initialize all object attributes
-        if volume is not None:
-            self.volume = volume
+        self._material_kwargs = kwargs
+        self.name = kwargs.get('name', '')
+        self.temperature = kwargs.get('temperature')
+        self.volume = volume
+        self.density = None
+        self.density_units = 'sum'
         if density is not None:
             self.set_density('g/cm3', density)
         self.mass_flowrate = mass_flowrate
         self.void_frac = void_frac
         self.burnup = burnup
+        self._set_composition(np.zeros(0, dtype=int), np.zeros(0))
 
         if bool(comp):
             self.replace_components(comp, comp_is_density)
         else:
             self.mass = 0.0
 
-    def replace_components(self, comp, comp_is_density=False):
-        """Replace and normalize the material composition
+    @classmethod
+    def from_arrays(cls, positions, fractions, comp_is_density=False,
+                    **kwargs):
+        """Creates a material flow from mass fractions over positions in
+        :attr:`nuclide_index`.
 
         Parameters
         ----------
-        comp : dict of str to float
-            Dictionary mapping element or nuclide names to their atom or weight
-            percent.
-        percent_type : {'wo', 'ao'}
-            'ao' for atom percenta nd 'wo' for weight percent.
+        positions : numpy.ndarray of int
+            Positions of the nuclides in :attr:`nuclide_index`.
+        fractions : numpy.ndarray of float
+            Mass fraction of each nuclide.
+        comp_is_density : bool, optional
+            If `True`, `fractions` are mass densities [g/cm3].
+        kwargs : dict
+            Key-word arguments for :class:`Materialflow`.
+
+        """
+        result = cls(**kwargs)
+        result.replace_arrays(np.array(positions, dtype=int),
+                               np.array(fractions, dtype=float),
+                               comp_is_density)
+        return result
+
+    @property
+    def positions(self):
+        """Positions of the nuclides in :attr:`nuclide_index`."""
+        return self._positions
+
+    @property
+    def fractions(self):
+        """Mass fraction of each nuclide in :attr:`positions`."""
+        return self._fractions
+
+    @property
+    def comp(self):
+        """Dictionary mapping nuclide names to their mass fraction."""
+        if self._comp is None:
+            self._comp = dict(zip(
+                self.nuclide_index.names_at(self._positions),
+                self._fractions))
+        return self._comp
+
+    @comp.setter
+    def comp(self, comp):
+        self._set_composition(self.nuclide_index.positions(list(comp.keys())),
+                              np.array(list(comp.values()), dtype=float))
+
+    def _set_composition(self, positions, fractions):
+        positions.flags.writeable = False
+        fractions.flags.writeable = False
+        self._positions = positions
+        self._fractions = fractions
+        self._comp = None
+
+    def replace_arrays(self, positions, fractions, comp_is_density=False):
+        """Replace the material composition with mass fractions over
+        positions in :attr:`nuclide_index`. The arrays are stored without a
+        copy and made read-only.
+
+        Parameters
+        ----------
+        positions : numpy.ndarray of int
+            Positions of the nuclides in :attr:`nuclide_index`.
+        fractions : numpy.ndarray of float
+            Mass fraction of each nuclide.
+        comp_is_density : bool, optional
+            If `True`, `fractions` are mass densities [g/cm3].
 
         """
-        for nuclide in self.get_nuclides():
-            self.remove_nuclide(nuclide)
-
-        nucs = np.array(list(comp.keys()))
-        nonzeros = np.array(list(comp.values()))
-        if len(nucs) > 0:
-            comp = dict(zip(nucs, nonzeros))
-            super().add_components(comp, percent_type='wo')
+        self._set_composition(positions, fractions)
+        if len(positions) > 0:
             density = self.get_density()
             # mass dens to wt-%
             if comp_is_density:
-                for nuc in nucs:
-                    super().remove_nuclide(nuc)
-                    comp[nuc] = comp[nuc] / density
-                    super().add_nuclide(nuc, comp[nuc], percent_type='wo')
+                self._set_composition(positions, fractions / density)
                 self.set_density('g/cm3', density)
             self.mass = density * self.volume
-            self.comp = comp
         else:
-            self.comp = comp
             self.mass = 0.0
 
+    def replace_components(self, comp, comp_is_density=False):
+        """Replace and normalize the material composition
+
+        Parameters
+        ----------
+        comp : dict of str to float
+            Dictionary mapping element or nuclide names to their atom or weight
+            percent.
+        percent_type : {'wo', 'ao'}
+            'ao' for atom percenta nd 'wo' for weight percent.
+
+        """
+        self.replace_arrays(
+            self.nuclide_index.positions(list(comp.keys())),
+            np.array(list(comp.values()), dtype=float),
+            comp_is_density)
+
+    def set_density(self, units, density=None):
+        """Sets the density of the material flow.
+
+        Parameters
+        ----------
+        units : {'g/cm3', 'kg/m3', 'sum'}
+            Physical units of density.
+        density : float, optional
+            Value of the density. Must be specified unless units is given
+            as 'sum'.
+
+        """
+        self.density_units = units
+        self.density = density
+
+    def get_nuclides(self):
+        """Returns the names of the nuclides in the material flow."""
+        return list(self.comp.keys())
+
     def get_mass(self, nuc=None, openmc=False):
         if not openmc:
             if bool(nuc):
@@ -102,9 +208,26 @@ class Materialflow(Material):
             else:
                 mass = self.mass
         else:
-            mass = super().get_mass(nuc)
+            mass = self.to_openmc().get_mass(nuc)
         return mass
 
+    def get_mass_density(self):
+        """Returns the mass density [g/cm3] of the material flow.
+
+        Without a density set, the weight fractions are read as a density in
+        [atom/b-cm] the same way :meth:`openmc.Material.get_mass_density`
+        does for ``'sum'`` density units.
+
+        """
+        if self.density_units == 'g/cm3':
+            return self.density
+        elif self.density_units == 'kg/m3':
+            return self.density * 1.e-3
+        total_fraction = np.sum(self._fractions)
+        average_molar_mass = total_fraction / np.sum(
+            self._fractions / self.nuclide_index.atomic_masses(self._positions))
+        return 1.e24 / AVOGADRO * total_fraction * average_molar_mass
+
     def get_density(self):
         if self.density_units != 'g/cm3':
             density = self.get_mass_density()
@@ -112,12 +235,32 @@ class Materialflow(Material):
             density = self.density
         return density
 
+    def to_openmc(self):
+        """Builds an :class:`openmc.Material` with the composition, density,
+        and volume of the material flow.
+
+        Returns
+        -------
+        material : openmc.Material
+
+        """
+        material = Material(**self._material_kwargs)
+        if len(self._positions) > 0:
+            material.add_components(self.comp, percent_type='wo')
+        if self.density_units != 'sum':
+            material.set_density(self.density_units, self.density)
+        material.volume = self.volume
+        return material
+
     def print_attr(self):
         """Prints various attributes of Materialflow object.
         """
         print("Volume %f cm3" % self.volume)
         print("Mass %f g" % self.mass)
-        print("Density %f g/cm3" % self.density)
+        if self.density is None:
+            print("Density not set")
+        else:
+            print("Density %f %s" % (self.density, self.density_units))
         print("Mass flowrate %f g/s" % self.mass_flowrate)
         print("Void fraction %f " % self.void_frac)
         print("Burnup %f MWd/kgU" % self.burnup)
@@ -165,12 +308,13 @@ class Materialflow(Material):
 
         """
         cls = self.__class__
-        result = cls(comp=self.comp.copy(),
-                     density=self.mass / self.volume,
-                     volume=self.volume,
-                     mass_flowrate=self.mass_flowrate,
-                     void_frac=self.void_frac,
-                     burnup=self.burnup)
+        result = cls.__new__(cls)
+        memo[id(self)] = result
+        # Composition arrays are read-only, so they are shared with the copy
+        for slot in self.__slots__:
+            setattr(result, slot, getattr(self, slot))
+        result._comp = None
+        result._material_kwargs = deepcopy(self._material_kwargs, memo)
         return result
 
     def __eq__(self, other):
@@ -227,31 +371,21 @@ class Materialflow(Material):
                 and (y.mass == 0.0 or y.volume == 0.0):
             return x
         else:
-            cls = x.__class__
-            result = cls.__new__(cls)
-
             result_mass = x.mass + y.mass
 
-            x_density = x.mass / x.volume
-            y_density = y.mass / y.volume
+            result_density = x.mass / x.volume
+            result_volume = result_mass / result_density
 
-            result_density = x_density
+            # Sum the nuclide masses over the shared index, keeping the
+            # nuclides of `x` first
+            masses = np.zeros(len(x.nuclide_index))
+            masses[x._positions] += x.get_mass() * x._fractions
+            masses[y._positions] += y.get_mass() * y._fractions
+            y_only = ~np.isin(y._positions, x._positions)
+            positions = np.concatenate((x._positions, y._positions[y_only]))
 
-            result_volume = result_mass / result_density
             result = Materialflow(density=result_density, volume=result_volume)
-
-            def get_mass_dict(matflow):
-                nuclides = list(matflow.comp.keys())
-                masses = matflow.get_mass() * np.array(list(matflow.comp.values()))
-                return dict(zip(nuclides, masses))
-
-            x_mass_dict = Counter(get_mass_dict(x))
-            y_mass_dict = Counter(get_mass_dict(y))
-            x_mass_dict.update(y_mass_dict)
-            x_mass_dict = dict(x_mass_dict)
-            masses = np.array(list(x_mass_dict.values())) / result_mass
-            result_comp = dict(zip(x_mass_dict.keys(), masses))
-            result.replace_components(result_comp)
+            result.replace_arrays(positions, masses[positions] / result_mass)
             result.mass_flowrate = x.mass_flowrate + y.mass_flowrate
             # Burnup is simply averaged by should be renormalized by heavy metal
             # use self.fissionable_mass?
@@ -276,11 +410,11 @@ class Materialflow(Material):
 
         """
         if isinstance(scaling_factor, (int, float)):
-            result = copy.deepcopy(self)
+            result = self.__deepcopy__({})
             if scaling_factor != 1.0 or scaling_factor != 1:
                 result.volume = scaling_factor * self.volume
-                result.mass = result.volume * result.get_density()
+                result.mass = scaling_factor * self.mass
                 result.mass_flowrate = scaling_factor * self.mass_flowrate
             return result
         else:
-            NotImplemented
+            return NotImplemented
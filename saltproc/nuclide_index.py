@@ -0,0 +1,213 @@
+"""NuclideIndex module"""
+import threading
+
+import numpy as np
+
+import openmc.data
+
+_ZAID_CONVENTIONS = ('mcnp', 'nndc', 'serpent')
+
+
+def _nuclide_codes(Z, A, m, zaid_convention):
+    """Returns the ZA nuclide codes of nuclides in a ZAID convention."""
+    if zaid_convention == 'serpent':
+        offset = np.where(Z > 76, 100, 200) * (m > 0)
+    else:
+        offset = np.where(m > 0, 300 + 100 * m, 0)
+    nuclide_codes = 1000 * Z + A + offset
+    if zaid_convention == 'nndc':
+        am242 = nuclide_codes == 95242
+        am242m = nuclide_codes == 95642
+        nuclide_codes[am242] = 95642
+        nuclide_codes[am242m] = 95242
+    return nuclide_codes
+
+
+class NuclideIndex():
+    """Index of nuclides shared by the depletion code interfaces, the
+    reprocessing system, and the results storage.
+
+    Every nuclide gets a fixed position the first time it is seen, and its
+    ZAM, element, atomic mass, and nuclide codes are stored in arrays at
+    that position, so per-step work reduces to array lookups. Nuclides
+    passed to the constructor are placed in ZAM order.
+
+    Positions are not kept in ZAM order as nuclides are added. Material
+    flows, waste streams, and the storage layer hold position arrays, which
+    would all have to be remapped whenever a nuclide is inserted, while
+    other threads may be reading them. Positions are therefore append-only,
+    and consumers that need ZAM order, such as the results database, sort
+    with :meth:`zam_order`.
+
+    Parameters
+    ----------
+    names : iterable of str, optional
+        Nuclide names (e.g. ``U235`` or ``Am242_m1``) to add to the index.
+
+    Attributes
+    ----------
+    names : list of str
+        Nuclide name at each position.
+    Z : numpy.ndarray of int
+        Atomic number at each position.
+    A : numpy.ndarray of int
+        Mass number at each position.
+    m : numpy.ndarray of int
+        Metastable state at each position.
+    zam : numpy.ndarray of int
+        ZAM code (``10000 * Z + 10 * A + m``) at each position.
+    elements : numpy.ndarray of str
+        Element symbol at each position.
+
+    """
+
+    def __init__(self, names=()):
+        self._lock = threading.Lock()
+        self.names = []
+        self._positions = {}
+        self._zam_positions = {}
+        self.Z = np.zeros(0, dtype=int)
+        self.A = np.zeros(0, dtype=int)
+        self.m = np.zeros(0, dtype=int)
+        self.zam = np.zeros(0, dtype=int)
+        self.elements = np.zeros(0, dtype='<U2')
+        self._nuclide_codes = {zaid_convention: np.zeros(0, dtype=int)
+                               for zaid_convention in _ZAID_CONVENTIONS}
+        self._atomic_masses = np.zeros(0)
+        names = list(names)
+        zams = [openmc.data.zam(name) for name in names]
+        self._add(*zip(*sorted(zip(zams, names))))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._positions
+
+    def _add(self, zams=(), names=()):
+        """Appends nuclides that are not in the index yet."""
+        if len(names) == 0:
+            return
+        Z, A, m = np.array(zams, dtype=int).reshape(-1, 3).T
+        # Extend the arrays before publishing the new positions, so readers
+        # in other threads never see a position without its data
+        self.Z = np.concatenate((self.Z, Z))
+        self.A = np.concatenate((self.A, A))
+        self.m = np.concatenate((self.m, m))
+        self.zam = np.concatenate((self.zam, 10000 * Z + 10 * A + m))
+        self.elements = np.concatenate(
+            (self.elements,
+             [openmc.data.ATOMIC_SYMBOL[z] for z in Z])).astype('<U2')
+        self._nuclide_codes = {
+            zaid_convention: np.concatenate(
+                (codes, _nuclide_codes(Z, A, m, zaid_convention)))
+            for zaid_convention, codes in self._nuclide_codes.items()}
+        for name, zam in zip(names, 10000 * Z + 10 * A + m):
+            position = len(self.names)
+            self.names.append(name)
+            self._zam_positions[int(zam)] = position
+            self._positions[name] = position
+
+    def positions(self, names):
+        """Returns the positions of nuclides, adding unknown nuclides to
+        the index.
+
+        Parameters
+        ----------
+        names : list of str
+            Nuclide names.
+
+        Returns
+        -------
+        positions : numpy.ndarray of int
+
+        """
+        new_names = [name for name in dict.fromkeys(names)
+                     if name not in self._positions]
+        if new_names:
+            with self._lock:
+                new_names = [name for name in new_names
+                             if name not in self._positions]
+                self._add([openmc.data.zam(name) for name in new_names],
+                          new_names)
+        positions = self._positions
+        return np.array([positions[name] for name in names], dtype=int)
+
+    def zam_positions(self, zams):
+        """Returns the positions of nuclides given by their ZAM codes,
+        adding unknown nuclides to the index.
+
+        Parameters
+        ----------
+        zams : iterable of int
+            ZAM codes (``10000 * Z + 10 * A + m``), which are the decay
+            nuclide codes used by Serpent2.
+
+        Returns
+        -------
+        positions : numpy.ndarray of int
+
+        """
+        zams = np.asarray(zams, dtype=int)
+        new_zams = [zam for zam in dict.fromkeys(zams.tolist())
+                    if zam not in self._zam_positions]
+        if new_zams:
+            with self._lock:
+                new_zams = [(zam // 10000, (zam // 10) % 1000, zam % 10)
+                            for zam in new_zams
+                            if zam not in self._zam_positions]
+                new_names = [openmc.data.gnds_name(Z, A, m)
+                             for Z, A, m in new_zams]
+                self._add(new_zams, new_names)
+        positions = self._zam_positions
+        return np.array([positions[zam] for zam in zams.tolist()], dtype=int)
+
+    def names_at(self, positions):
+        """Returns the names of the nuclides at `positions`."""
+        names = self.names
+        return [names[i] for i in positions]
+
+    def zam_order(self, positions):
+        """Returns the indices that sort `positions` by ZAM."""
+        return np.argsort(self.zam[positions], kind='stable')
+
+    def atomic_masses(self, positions):
+        """Returns the atomic masses [g/mol] of the nuclides at `positions`.
+
+        Atomic masses are looked up the first time they are needed.
+
+        """
+        n_known = len(self._atomic_masses)
+        if n_known < len(self.names):
+            with self._lock:
+                n_known = len(self._atomic_masses)
+                new_masses = [openmc.data.atomic_mass(name)
+                              for name in self.names[n_known:]]
+                self._atomic_masses = np.concatenate((self._atomic_masses,
+                                                      new_masses))
+        return self._atomic_masses[positions]
+
+    def nuclide_codes(self, positions, zaid_convention='mcnp'):
+        """Returns the ZA nuclide codes of the nuclides at `positions`.
+
+        Parameters
+        ----------
+        positions : numpy.ndarray of int
+            Nuclide positions.
+        zaid_convention : {'mcnp', 'nndc', 'serpent'}
+            Naming convention for the ZA of metastable states. ``mcnp``
+            adds 300 + 100 * m to the mass number, ``nndc`` additionally
+            swaps the codes of Am242 and Am242m1, and ``serpent`` adds 100
+            to the mass number for Z > 76 and 200 otherwise.
+
+        Returns
+        -------
+        nuclide_codes : numpy.ndarray of int
+
+        """
+        try:
+            nuclide_codes = self._nuclide_codes[zaid_convention]
+        except KeyError:
+            raise ValueError(f'{zaid_convention} is not a valid ZAID '
+                             'convention') from None
+        return nuclide_codes[positions]
@@ -2,6 +2,8 @@ import subprocess
 import os
 import re
 import json
+import time
+from multiprocessing.connection import Client
 from pathlib import Path
 import numpy as np
 
@@ -10,10 +12,11 @@ import openmc
 
 from saltproc import Materialflow
 from saltproc.depcode import Depcode
+from saltproc.openmc_deplete import _SESSION_AUTHKEY_VARIABLE
 from openmc.deplete.abc import _SECONDS_PER_DAY
 from openmc.deplete import Results, Chain
 from openmc.mgxs import Beta, DecayRate, EnergyGroups
-from openmc.data import atomic_mass, DataLibrary, JOULE_PER_EV
+from openmc.data import DataLibrary, JOULE_PER_EV
 
 
 _FISSILE_NUCLIDES = ['U233', 'U235', 'Pu239', 'Pu241']
@@ -22,6 +25,7 @@ _KG_PER_G = 1e-3
 _MW_PER_W = 1e-6
 _DELAYED_ENERGY_BOUNDS = (0,20e7) # eV
 _N_DELAYED_GROUPS = 6
+_SESSION_ADDRESS_FILE = 'depletion_session.json'
 
 class OpenMCDepcode(Depcode):
     """Interface for running depletion steps in OpenMC, as well as obtaining
@@ -46,6 +50,12 @@ class OpenMCDepcode(Depcode):
          Keyword arguments to pass to :func:`openmc.model.deplete()`.
      chain_file_path : str
          Path to depletion chain file
+    persistent_session : bool, optional
+        If `True`, keep a single OpenMC depletion process alive for the
+        whole simulation instead of starting a new one every depletion
+        step. Cross section data and geometry are then loaded only once,
+        and each depletion step only sends the reprocessed depletable
+        materials, the timestep, and the power to that process.
 
     Attributes
     ----------
@@ -79,7 +89,8 @@ class OpenMCDepcode(Depcode):
                  template_input_file_path,
                  geo_file_paths,
                  depletion_settings,
-                 chain_file_path
+                 chain_file_path,
+                 persistent_session=False
                  ):
         """Initialize a OpenMCDepcode object.
 
@@ -93,6 +104,9 @@ class OpenMCDepcode(Depcode):
 
         self.depletion_settings = depletion_settings
         self.chain_file_path = chain_file_path
+        self.persistent_session = persistent_session
+        self._session = None
+        self._session_materials = {}
 
         super().__init__("openmc",
                          output_path,
@@ -337,13 +351,10 @@ class OpenMCDepcode(Depcode):
         -------
             mass_dict : dict of int to float
         """
-        percents = np.zeros(len(mat.nuclides))
-        nucs = []
-        at_mass = np.zeros(len(mat.nuclides))
-        for i, (nuc, pt, tp) in enumerate(mat.nuclides):
-            nucs.append(nuc)
-            percents[i] = pt
-            at_mass[i] = atomic_mass(nuc)
+        nucs = [nuc for nuc, pt, tp in mat.nuclides]
+        percents = np.array([pt for nuc, pt, tp in mat.nuclides], dtype=float)
+        nuclide_index = Materialflow.nuclide_index
+        at_mass = nuclide_index.atomic_masses(nuclide_index.positions(nucs))
 
         if percent_type == 'ao':
             mass_percents = percents*at_mass / np.dot(percents, at_mass)
@@ -398,7 +409,94 @@ class OpenMCDepcode(Depcode):
         if mpi_args is not None:
             args = mpi_args + args
 
-        super().run_depletion_step(mpi_args, args)
+        if self.persistent_session:
+            self._run_session_step(args)
+        else:
+            super().run_depletion_step(mpi_args, args)
+
+    def _start_session(self, args):
+        """Launch the persistent OpenMC depletion process and connect to it.
+
+        Parameters
+        ----------
+        args : list of str
+            Arguments for running the depletion script.
+
+        """
+        address_file = self.output_path / _SESSION_ADDRESS_FILE
+        address_file.unlink(missing_ok=True)
+        authkey = os.urandom(32)
+        env = os.environ.copy()
+        env[_SESSION_AUTHKEY_VARIABLE] = authkey.hex()
+        process = subprocess.Popen(
+            args + ['--session', str(address_file)],
+            cwd=self.output_path,
+            stdout=None,
+            stderr=subprocess.STDOUT,
+            env=env)
+
+        while not address_file.exists():
+            if process.poll() is not None:
+                raise RuntimeError('\n %s SESSION FAILED TO START\n see error '
+                                   'message above' % (self.codename))
+            time.sleep(0.1)
+        with open(address_file) as f:
+            address = tuple(json.load(f))
+        connection = Client(address, authkey=authkey)
+        self._session = (process, connection)
+
+    def _run_session_step(self, args):
+        """Runs a depletion step in the persistent OpenMC depletion process,
+        starting the process if needed.
+
+        Parameters
+        ----------
+        args : list of str
+            Arguments for running the depletion script.
+
+        """
+        print('Running %s' % (self.codename))
+        if self._session is None:
+            self._start_session(args)
+        process, connection = self._session
+
+        connection.send(
+            {'command': 'deplete',
+             'materials': self._session_materials,
+             'timesteps': self.depletion_settings['timesteps'],
+             'integrator_kwargs': self.depletion_settings['integrator_kwargs']})
+        self._session_materials = {}
+
+        while not connection.poll(1.0):
+            if process.poll() is not None:
+                self._session = None
+                connection.close()
+                raise RuntimeError('\n %s RUN FAILED\n see error message above'
+                                   % (self.codename))
+        reply = connection.recv()
+        if reply['status'] != 'ok':
+            print(reply['traceback'])
+            raise RuntimeError('\n %s RUN FAILED\n see error message above'
+                               % (self.codename))
+        print(f'Finished {self.codename.upper()} Run')
+
+    def close_session(self):
+        """Shuts down the persistent OpenMC depletion process, if it is
+        running."""
+        if self._session is None:
+            return
+        process, connection = self._session
+        self._session = None
+        try:
+            connection.send({'command': 'close'})
+        except OSError:
+            pass
+        connection.close()
+        try:
+            process.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
 
     def switch_to_next_geometry(self):
         """Switches the geometry file for the OpenMC depletion simulation to
@@ -411,6 +509,8 @@ class OpenMCDepcode(Depcode):
             materials=mats)
         next_geometry.export_to_xml(path=self.runtime_inputfile['geometry'])
         del mats, next_geometry
+        # The depletion session holds the old geometry in memory
+        self.close_session()
 
     def write_runtime_input(self, reactor, depletion_step, restart):
         """Write OpenMC runtime input files for running depletion step.
@@ -528,6 +628,11 @@ class OpenMCDepcode(Depcode):
                 for element in material.get_elements():
                     material.remove_element(element)
                 material.add_components(components, percent_type='wo')
+                if self.persistent_session:
+                    self._session_materials[material.name] = {
+                        'density': mats[material.name].density,
+                        'volume': mats[material.name].volume,
+                        'comp': components}
 
         runtime_materials.export_to_xml(path=self.runtime_matfile)
         del runtime_materials
@@ -594,6 +699,18 @@ class OpenMCDepcode(Depcode):
         self.runtime_inputfile['tallies'] = self.output_path / 'tallies.xml'
         tallies.export_to_xml(self.runtime_inputfile['tallies'])
 
+    def get_depletion_nuclides(self):
+        """Returns the names of the nuclides in the depletion chain.
+
+        Returns
+        -------
+        nuclides : list of str
+            Nuclide names (e.g. ``U235`` or ``Am242_m1``).
+
+        """
+        chain = Chain.from_xml(self.chain_file_path)
+        return [nuc.name for nuc in chain.nuclides]
+
     def _get_fissile_fertile_nuclides(self):
         nuclides_with_data = set()
         data_lib = DataLibrary.from_xml()
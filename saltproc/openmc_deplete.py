@@ -1,9 +1,14 @@
 import argparse
 import json
+import os
+import traceback
+from multiprocessing.connection import Listener
 
 import openmc
 import openmc.deplete as od
 
+_SESSION_AUTHKEY_VARIABLE = 'SALTPROC_SESSION_AUTHKEY'
+
 
 def parse_arguments():
     """Parses arguments from command line.
@@ -22,6 +27,10 @@ def parse_arguments():
         Directory to write the XML files to.
     depletion_settings : str
         Path to the OpenMCDepcode depletion_settings file
+    session : str
+        Path to the file the session address is written to. If present,
+        the script stays alive and runs one depletion step per request
+        received from SaltProc.
 
     """
     parser = argparse.ArgumentParser()
@@ -45,34 +54,145 @@ def parse_arguments():
                         type=str,
                         default=None,
                         help='path to output directory')
+    parser.add_argument('--session',
+                        type=str,
+                        default=None,
+                        help='path to session address file')
     args = parser.parse_args()
     return args
 
 
-args = parse_arguments()
+def build_model(args):
+    """Initialize an OpenMC model from the runtime input files"""
+    materials = openmc.Materials.from_xml(path=args.materials)
+    geometry = openmc.Geometry.from_xml(path=args.geometry,
+                                        materials=materials)
+    settings = openmc.Settings.from_xml(args.settings)
+    tallies = openmc.Tallies.from_xml(args.tallies)
+    model = openmc.model.Model(materials=materials,
+                               geometry=geometry,
+                               settings=settings,
+                               tallies=tallies)
+    return model
+
+
+def read_depletion_settings(directory):
+    """Read the depletion settings written by
+    :meth:`OpenMCDepcode.write_depletion_settings`"""
+    with open(f'{directory}/depletion_settings.json') as f:
+        depletion_settings = json.load(f)
+
+    fission_q = depletion_settings['operator_kwargs']['fission_q']
+    if not(fission_q is None):
+        with open(fission_q, 'r') as f:
+            fission_q = json.load(f)
+
+        depletion_settings['operator_kwargs']['fission_q'] = fission_q
+    return depletion_settings
+
+
+def deplete(model, depletion_settings):
+    """Run a single depletion step"""
+    depletion_settings = dict(depletion_settings)
+    timesteps = depletion_settings.pop('timesteps')
+    integrator_kwargs = depletion_settings.pop('integrator_kwargs')
+    model.deplete(timesteps, **depletion_settings, **integrator_kwargs)
+
+
+def update_materials(model, materials):
+    """Replace the depletable material compositions in `model`
+    with the reprocessed compositions sent by SaltProc.
+
+    Parameters
+    ----------
+    model : openmc.model.Model
+        Model used by the depletion session.
+    materials : dict of str to dict
+        Material names are keys, and dictionaries with ``density``
+        (g/cm3), ``volume`` (cm3) and ``comp`` (mass fractions) are
+        values.
+
+    """
+    for material in model.materials:
+        if material.name in materials:
+            material_data = materials[material.name]
+            material.set_density('g/cm3', material_data['density'])
+            material.volume = material_data['volume']
+            for element in material.get_elements():
+                material.remove_element(element)
+            material.add_components(material_data['comp'], percent_type='wo')
+
+
+def run_session(model, depletion_settings, address_file):
+    """Keep the OpenMC shared library loaded between depletion steps.
+
+    The cross section data and geometry are loaded once. Afterwards, each
+    request sent by SaltProc only carries the reprocessed depletable
+    materials, the timestep, and the power.
+
+    Parameters
+    ----------
+    model : openmc.model.Model
+        Model used by the depletion session.
+    depletion_settings : dict
+        Depletion settings of the first depletion step.
+    address_file : str
+        Path to the file the session address is written to.
+
+    """
+    comm = od.comm
+    connection = None
+    if comm.rank == 0:
+        authkey = bytes.fromhex(os.environ[_SESSION_AUTHKEY_VARIABLE])
+        listener = Listener(('localhost', 0), authkey=authkey)
+        # Write to a temporary file first so SaltProc never reads a
+        # partially written address
+        with open(f'{address_file}.tmp', 'w') as f:
+            json.dump(listener.address, f)
+        os.replace(f'{address_file}.tmp', address_file)
+        connection = listener.accept()
+        listener.close()
+
+    model.init_lib(output=depletion_settings['output'], intracomm=comm)
+    while True:
+        request = None
+        if comm.rank == 0:
+            try:
+                request = connection.recv()
+            except EOFError:
+                # SaltProc exited without closing the session
+                request = {'command': 'close'}
+        request = comm.bcast(request)
+        if request['command'] == 'close':
+            break
 
-# Initalize OpenMC objects
-materials = openmc.Materials.from_xml(path=args.materials)
-geometry = openmc.Geometry.from_xml(path=args.geometry, materials=materials)
-settings = openmc.Settings.from_xml(args.settings)
-tallies = openmc.Tallies.from_xml(args.tallies)
-model = openmc.model.Model(materials=materials,
-                           geometry=geometry,
-                           settings=settings,
-                           tallies=tallies)
+        reply = {'status': 'ok'}
+        try:
+            update_materials(model, request['materials'])
+            depletion_settings['timesteps'] = request['timesteps']
+            depletion_settings['integrator_kwargs'].update(
+                request['integrator_kwargs'])
+            deplete(model, depletion_settings)
+        except Exception:
+            reply = {'status': 'error', 'traceback': traceback.format_exc()}
+        if comm.rank == 0:
+            connection.send(reply)
 
-with open(f'{args.directory}/depletion_settings.json') as f:
-    depletion_settings = json.load(f)
+    model.finalize_lib()
+    if comm.rank == 0:
+        connection.close()
 
-timesteps = depletion_settings.pop('timesteps')
-fission_q = depletion_settings['operator_kwargs']['fission_q']
-if not(fission_q is None):
-    with open(fission_q, 'r') as f:
-        fission_q = json.load(f)
 
-    depletion_settings['operator_kwargs']['fission_q'] = fission_q
+def main():
+    args = parse_arguments()
+    model = build_model(args)
+    depletion_settings = read_depletion_settings(args.directory)
+    if args.session is None:
+        deplete(model, depletion_settings)
+    else:
+        run_session(model, depletion_settings, args.session)
+    del model
 
-integrator_kwargs = depletion_settings.pop('integrator_kwargs')
-model.deplete(timesteps, **depletion_settings, **integrator_kwargs)
 
-del materials, geometry, settings, tallies, model
+if __name__ == '__main__':
+    main()
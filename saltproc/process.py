@@ -1,11 +1,21 @@
 """Process module"""
-import re
 from copy import deepcopy
 from math import exp
 import numpy as np
 
 from saltproc import Materialflow
 
+def _make_waste_stream(waste_stream, total_waste_mass):
+    """Sets the volume and mass of the waste stream of a process from the
+    waste stream normalized composition and total mass."""
+    fractions = waste_stream.fractions
+    if len(fractions) > 0 and np.max(fractions) > 0.0:
+        waste_stream.volume = total_waste_mass / waste_stream.mass
+        waste_stream.mass = total_waste_mass
+    else:
+        waste_stream.volume = 0.0
+    return waste_stream
+
 
 class Process():
     """Represents an aribtrary processing component that extracts nuclides from
@@ -99,65 +109,59 @@ class Process():
             reprocessing system component.
 
         """
-        waste_mass = {}
-        thru_mass = {}
-
+        positions = inflow.positions
+        nuc_masses = inflow.get_mass() * inflow.fractions
         total_waste_mass = 0.0
         total_thru_mass = 0.0
 
         if bool(self.efficiency):
             process_elements = list(self.efficiency.keys())
-            process_nucs = [nuc for nuc in inflow.comp.keys() \
-                            if re.match(r"([A-Z]+)([0-9]+)", nuc, re.I).groups()[0] \
-                            in process_elements]
-            thru_nucs = list(set(inflow.comp.keys()).difference(set(process_nucs)))
-
             efficiency = [self.calculate_removal_efficiency(elem) \
                           for elem in process_elements]
             efficiency = dict(zip(process_elements, efficiency))
 
-            nuc_efficiency = {}
-            for nuc in process_nucs:
-                elem = re.match(r"([A-Z]+)([0-9]+)", nuc, re.I).groups()[0]
-                nuc_efficiency[nuc] = efficiency[elem]
+            nuc_elements = inflow.nuclide_index.elements[positions]
+            process_nucs = np.isin(nuc_elements, process_elements)
+            elements, nuc_element_idx = np.unique(nuc_elements[process_nucs],
+                                                  return_inverse=True)
+            nuc_efficiency = np.array([efficiency[elem] for elem in elements],
+                                      dtype=float)[nuc_element_idx]
 
-            thru_mass = np.array([inflow.get_mass(nuc) * \
-                                  (1.0 - nuc_efficiency[nuc]) \
-                                  for nuc in process_nucs])
-            waste_mass = np.array([inflow.get_mass(nuc) * \
-                                   nuc_efficiency[nuc] \
-                                   for nuc in process_nucs])
+            thru_mass = nuc_masses[process_nucs] * (1.0 - nuc_efficiency)
+            waste_mass = nuc_masses[process_nucs] * nuc_efficiency
 
             total_waste_mass = np.sum(waste_mass)
             total_thru_mass = inflow.mass - total_waste_mass
 
-            waste_mass = dict(zip(process_nucs, waste_mass / total_waste_mass))
-
-            thru_mass_1 = np.array([inflow.get_mass(nuc) for nuc in thru_nucs])
-
-            thru_mass_1 = dict(zip(thru_nucs, thru_mass_1 / total_thru_mass))
-            thru_mass = dict(zip(process_nucs, thru_mass / total_thru_mass))
-            thru_mass.update(thru_mass_1)
+            if total_waste_mass > 0.0:
+                waste_stream = Materialflow.from_arrays(
+                    positions[process_nucs], waste_mass / total_waste_mass)
+            else:
+                # Nothing is removed, e.g. with a zero efficiency or
+                # without the target elements in the material
+                waste_stream = Materialflow()
+
+            if total_thru_mass > 0.0:
+                thru_fractions = nuc_masses / total_thru_mass
+                thru_fractions[process_nucs] = thru_mass / total_thru_mass
+            else:
+                thru_fractions = np.zeros_like(nuc_masses)
         else:
             total_thru_mass = inflow.mass
-            thru_mass = inflow.comp.copy()
+            waste_stream = Materialflow()
+            thru_fractions = inflow.fractions
 
-        waste_stream = Materialflow(comp=waste_mass)
-        if bool(waste_mass) and np.max(list(waste_mass.values())) > 0.0:
-            waste_stream.volume = total_waste_mass / waste_stream.mass
-            waste_stream.mass = total_waste_mass
-        else:
-            waste_stream.volume = 0.0
+        waste_stream = _make_waste_stream(waste_stream, total_waste_mass)
         # preserve inflow attributes
         thru_flow = deepcopy(inflow)
-        thru_flow.replace_components(thru_mass)
+        thru_flow.replace_arrays(positions, thru_fractions)
         # initial guess
         thru_flow.volume = inflow.volume - waste_stream.volume
         # correction
-        thru_flow.volume = thru_flow.volume * \
-            total_thru_mass / thru_flow.get_mass()
+        if inflow.mass > 0.0:
+            thru_flow.volume = thru_flow.volume * total_thru_mass / inflow.mass
+        else:
+            thru_flow.volume = 0.0
         thru_flow.mass = total_thru_mass
 
-        del thru_mass, waste_mass
-
         return thru_flow, waste_stream
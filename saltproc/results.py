@@ -1,17 +1,300 @@
+from collections.abc import Mapping
+from contextlib import contextmanager
+from functools import lru_cache
+
 import tables as tb
 import numpy as np
 import pandas as pd
 import uncertainties.unumpy as unp
 
+import openmc.data
+from openmc.data import AVOGADRO, JOULE_PER_EV
+
+from saltproc.materialflow import Materialflow
+
+try:
+    import xarray as xr
+except ImportError:
+    xr = None
+
+try:
+    import dask.array as da
+except ImportError:
+    da = None
+
+
+class SparseStreamComposition(Mapping):
+    """Waste or feed stream composition history stored in compressed sparse
+    row format. Behaves like a dictionary mapping nuclide names to the
+    nuclide mass [g] at each depletion step, which is only densified when a
+    nuclide is accessed.
+
+    Parameters
+    ----------
+    nuclide_idx : dict of str to int
+        A dictionary mapping nuclide name to index.
+    indptr : numpy.ndarray of int
+        Offset of each depletion step in `indices` and `values`.
+    indices : numpy.ndarray of int
+        Nuclide index of each stored mass.
+    values : numpy.ndarray of float
+        Stored nuclide masses [g].
+
+    """
+
+    def __init__(self, nuclide_idx, indptr, indices, values):
+        self.nuclide_idx = nuclide_idx
+        self.indptr = indptr
+        self.indices = indices
+        self.values = values
+        self._rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+
+    def __getitem__(self, nuclide):
+        nuclide_mass = np.zeros(len(self.indptr) - 1)
+        entries = self.indices == self.nuclide_idx[nuclide]
+        nuclide_mass[self._rows[entries]] = self.values[entries]
+        return nuclide_mass
+
+    def __iter__(self):
+        return iter(self.nuclide_idx)
+
+    def __len__(self):
+        return len(self.nuclide_idx)
+
+    def to_dense(self):
+        """Returns the composition history as an array with the mass of
+        each nuclide in :attr:`nuclide_idx` (rows) at each depletion step
+        (columns)."""
+        comp = np.zeros((len(self.nuclide_idx), len(self.indptr) - 1))
+        comp[self.indices, self._rows] = self.values
+        return comp
+
+
+def _interleave(before, after):
+    """Returns the initial value, then the values before and after
+    reprocessing at each depletion step, along the first axis.
+
+    Parameters
+    ----------
+    before : numpy.ndarray
+        Values at the initial state and before reprocessing at each
+        depletion step.
+    after : numpy.ndarray
+        Values after reprocessing at each depletion step.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``before[0], before[1], after[0], before[2], after[1], ...``
+
+    """
+    n_pairs = max(0, min(len(before) - 1, len(after)))
+    values = np.empty((2 * n_pairs + 1,) + before.shape[1:],
+                      dtype=np.result_type(before, after))
+    values[0] = before[0]
+    values[1::2] = before[1:n_pairs + 1]
+    values[2::2] = after[:n_pairs]
+    return values
+
+
+def _moments(n_steps):
+    """Returns the moment of each time in :attr:`Results.time_total`."""
+    return np.array(['before'] + ['before', 'after'] * n_steps)
+
+
+def _union_nuclide_map(nuc_maps):
+    """Returns a map of nuclide name to index for the union of the
+    nuclides in `nuc_maps`."""
+    nucs = list(dict.fromkeys(nuc for nuc_map in nuc_maps
+                              for nuc in nuc_map))
+    return dict(zip(nucs, range(len(nucs))))
+
+
+def _read_nuclide_map(node):
+    """Returns the map of nuclide name to array index stored in
+    `node`."""
+    nuclides = map(bytes.decode, node.nuclide_map.col('nuclide'))
+    return dict(zip(nuclides, node.nuclide_map.col('index').tolist()))
+
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+@lru_cache(maxsize=None)
+def _element_matrix(nuclides):
+    """Returns the elements of `nuclides` in order of atomic number, and the
+    matrix that sums nuclide values (columns) into element values (rows).
+
+    Parameters
+    ----------
+    nuclides : tuple of str
+        Nuclide names.
+
+    """
+    index = Materialflow.nuclide_index
+    positions = index.positions(list(nuclides))
+    _, first, element_rows = np.unique(index.Z[positions], return_index=True,
+                                       return_inverse=True)
+    matrix = np.zeros((len(first), len(nuclides)))
+    matrix[element_rows, np.arange(len(nuclides))] = 1.0
+    return index.elements[positions[first]].tolist(), _read_only(matrix)
+
+
+@lru_cache(maxsize=None)
+def _actinide_vector(nuclides):
+    """Returns 1 for the actinides (Z >= 89) in `nuclides` and 0 for the
+    other nuclides."""
+    index = Materialflow.nuclide_index
+    Z = index.Z[index.positions(list(nuclides))]
+    return _read_only((Z >= 89).astype(float))
+
+
+@lru_cache(maxsize=None)
+def _openmc_decay_constants(nuclides):
+    """Returns the decay constants [1/s] of `nuclides` read with
+    :func:`openmc.data.decay_constant`."""
+    return _read_only(np.array([openmc.data.decay_constant(nuc)
+                                for nuc in nuclides], dtype=float))
+
+
+@lru_cache(maxsize=None)
+def _openmc_decay_energies(nuclides):
+    """Returns the decay energies [eV] of `nuclides` read with
+    :func:`openmc.data.decay_energy`."""
+    return _read_only(np.array([openmc.data.decay_energy(nuc)
+                                for nuc in nuclides], dtype=float))
+
+
+def _nuclide_vector(nuclides, values, read_openmc):
+    """Returns the values of `nuclides` in the dictionary `values`, with 0
+    for missing nuclides, or ``read_openmc(nuclides)`` if `values` is
+    `None`."""
+    if values is None:
+        return read_openmc(nuclides)
+    return np.array([values.get(nuc, 0.0) for nuc in nuclides], dtype=float)
+
+
+def _specific_activity(nuclides, decay_constants=None):
+    """Returns the activity per unit mass [Bq/g] of `nuclides`."""
+    index = Materialflow.nuclide_index
+    atomic_masses = index.atomic_masses(index.positions(list(nuclides)))
+    return _nuclide_vector(nuclides, decay_constants,
+                           _openmc_decay_constants) * AVOGADRO / atomic_masses
+
+
+def _specific_decay_heat(nuclides, decay_constants=None,
+                         decay_energies=None):
+    """Returns the decay heat per unit mass [W/g] of `nuclides`."""
+    return (_specific_activity(nuclides, decay_constants) *
+            _nuclide_vector(nuclides, decay_energies,
+                            _openmc_decay_energies) * JOULE_PER_EV)
+
+
+class _CompositionReader():
+    """Array-like view of the interleaved composition history of a
+    material in a results file, with times as rows and nuclides as
+    columns. Indexing only reads the requested times, so it can back a
+    chunked :mod:`dask` array.
+
+    Parameters
+    ----------
+    path : str
+        Path of results file
+    material : str
+        Material name
+    nuclide_idx : dict of str to int
+        A dictionary mapping nuclide name to column index.
+    n_steps : int
+        Number of depletion steps.
+
+    """
+
+    def __init__(self, path, material, nuclide_idx, n_steps):
+        self.path = path
+        self.material = material
+        self.nuclide_idx = nuclide_idx
+        self.shape = (2 * n_steps + 1, len(nuclide_idx))
+        self.dtype = np.dtype(float)
+        self.ndim = 2
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),) * (2 - len(key))
+        times = np.arange(self.shape[0])[key[0]]
+        scalar_time = np.ndim(times) == 0
+        times = np.atleast_1d(times)
+        # Row of each time in the before or after reprocessing array
+        before = (times % 2 == 1) | (times == 0)
+        rows = np.where(before, (times + 1) // 2, times // 2 - 1)
+        comp = np.zeros((len(times), self.shape[1]))
+        with tb.open_file(self.path, mode='r') as f:
+            material = f.root.materials[self.material]
+            for node, selected in ((material.before_reproc, before),
+                                   (material.after_reproc, ~before)):
+                if not selected.any():
+                    continue
+                node_rows = rows[selected]
+                start, stop = int(node_rows.min()), int(node_rows.max()) + 1
+                stored = np.asarray(node.comp.read(start, stop), dtype=float)
+                stored = stored.reshape(stop - start, node.comp.shape[1])
+                node_map = _read_nuclide_map(node)
+                columns = [self.nuclide_idx[nuc] for nuc in node_map]
+                comp[np.ix_(np.flatnonzero(selected), columns)] = \
+                    stored[node_rows - start][:, list(node_map.values())]
+        comp = comp[:, key[1]]
+        if scalar_time:
+            comp = comp[0]
+        return comp
+
+
+class _ResultsMapping(Mapping):
+    """Read-only dictionary view whose values are read from the results
+    file by `load` when they are accessed."""
+
+    def __init__(self, keys, load):
+        self._keys = keys
+        self._load = load
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        return self._load(key)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({list(self._keys)})'
+
+
 class Results():
     """Interface class for reading SaltProc results.
 
+    Data is read from the results file when it is first accessed, and then
+    cached. Only the nodes and table columns that are needed are read, so
+    accessing :attr:`keff` does not read any material compositions.
+
     Parameters
     ----------
     path : str
         Path of results file
     load_in_out_streams : bool
         Switch on whether or not to load waste streams.
+    live : bool, optional
+        If `True`, the results file may belong to a running simulation.
+        Only depletion steps that the simulation committed are read, and
+        :meth:`refresh` reads the steps committed since the last call.
+        Opening a results file that is being written to is not an error;
+        the data is read by a later :meth:`refresh`.
+    preload : bool, optional
+        If `True`, all data is read when the results file is opened and by
+        every :meth:`refresh`, instead of when it is first accessed.
 
     Attributes
     ----------
@@ -38,6 +321,12 @@ class Results():
         Depletion code metadata, such as depletion code name, version, etc.
     depletion_step_metadata : dict of str to object
         Depletion step metadata, such as step runtime, memory usage, etc.
+    layout_version : int
+        Storage layout version of the results file. Version 1 files have
+        composition arrays with exactly the stored nuclides, and version 2
+        files have composition arrays with a fixed nuclide axis.
+    n_steps : int
+        Number of depletion steps read.
     nuclide_idx : dict of str to int
         A dictionary mapping nuclide name as a string to index.
     material_composition : dict of str to numpy.ndarray
@@ -49,61 +338,325 @@ class Results():
     waste_streams : dict of str to dict
         A dictionary mapping material name as a string to a dictionary mapping
         waste stream names as a string to the waste streams mass [g] as a
-        timeseries.
+        timeseries. Streams stored in compressed sparse row format are
+        :class:`SparseStreamComposition` objects.
+
+    Notes
+    -----
+    The material and waste stream dictionaries are read-only views that
+    read a material or stream when it is accessed. In live mode, data that
+    was already accessed is updated by :meth:`refresh`. Data accessed for
+    the first time is read right away, which fails while the simulation
+    holds the results file; use ``preload=True`` to read everything at
+    every refresh.
 
     """
-    def __init__(self, path, load_in_out_streams=True):
-        f = tb.open_file(path, mode='r')
+    def __init__(self, path, load_in_out_streams=True, live=False,
+                 preload=False):
+        self.path = path
+        self.load_in_out_streams = load_in_out_streams
+        self.live = live
+        self.preload = preload
+        self._clear()
+        self.refresh()
+
+    def _clear(self):
+        self.layout_version = 1
+        self.n_steps = 0
+        self._file = None
+        # Material name to parameter names and waste stream names
+        self._materials = {}
+        # Values read by the _load_* methods
+        self._cache = {}
+        # Rows read from each node in live mode, and nuclides of each
+        # composition array
+        self._rows = {}
+        self._nuclides = {}
+
+    def refresh(self):
+        """Read the depletion steps stored since the results file was last
+        read.
+
+        Returns
+        -------
+        bool
+            `True` if new depletion steps were read. In live mode, `False`
+            is also returned if the results file could not be opened
+            because the simulation is writing to it.
+
+        """
+        try:
+            f = tb.open_file(self.path, mode='r')
+        except (OSError, ValueError, tb.exceptions.HDF5ExtError):
+            # The file is locked by the simulation, or already open for
+            # writing in this process
+            if not self.live:
+                raise
+            return False
+        n_steps = self.n_steps
+        self._file = f
+        try:
+            self._collect(f)
+        finally:
+            self._file = None
+            f.close()
+        return self.n_steps > n_steps
+
+    def _collect(self, f):
         root = f.root
-        sim_params = root.simulation_parameters
-        self.time_at_eds = sim_params.col('cumulative_time_at_eds')
-        time_total = [[t1, t2] for (t1, t2) in zip (self.time_at_eds,
-                                                    self.time_at_eds)]
-        time_total = np.array(time_total).flatten()
-        self.time_total = np.append(np.array([0]), time_total)
-
-        self.keff = self._collect_eds_bds_params(sim_params, 'keff', errors=True)
-        self.fission_mass = self._collect_eds_bds_params(sim_params, 'fission_mass')
-        self.breeding_ratio = self._collect_eds_bds_params(sim_params, 'breeding_ratio', errors=True)
-        self.power_level = sim_params.col('power_level')
-        self.beta_eff = self._collect_eds_bds_params(sim_params, 'beta_eff', errors=True, multidim=True)
-        self.lambda_eff = self._collect_eds_bds_params(sim_params, 'delayed_neutrons_lambda', errors=True, multidim=True)
-
-        # metadata
-        self.depcode_metadata = self._collect_metadata(f, 'depcode_metadata')
-        self.depletion_step_metadata = self._collect_metadata(f, 'depletion_step_metadata', array=True)
-
-        # Materials
-        materials = root.materials
-        nuclide_idx, material_composition, material_parameters, waste_streams = self._collect_material_params(materials, load_in_out_streams)
-        self.nuclide_idx = nuclide_idx
-        self.material_composition = material_composition
-        self.material_parameters = material_parameters
-        self.waste_streams = waste_streams
-        f.close()
-
-    def _collect_eds_bds_params(self, sim_params, col, errors=False, multidim=False):
-        col_eds = sim_params.col(f'{col}_eds').tolist()
-        col_bds = sim_params.col(f'{col}_bds').tolist()
-        col = [col_bds[0], col_eds[0]]
-        for (k1, k2) in zip(col_bds[1:], col_eds[1:]):
-            col += [k1]
-            col += [k2]
-        col = np.array(col)
-        if errors:
-            if multidim:
-                new_col = []
-                for c in col:
-                    c = np.array(c)
-                    new_col += [unp.uarray(c[:,0], c[:,1]).tolist()]
-                col = np.array(new_col)
+        attrs = root._v_attrs
+        if 'layout_version' in attrs:
+            self.layout_version = int(attrs.layout_version)
+        if 'simulation_parameters' not in root:
+            if self.live:
+                return
+            raise tb.NoSuchNodeError('Results file has no simulation '
+                                     'parameters')
+        n_steps = root.simulation_parameters.nrows
+        if self.live and 'committed_steps' in attrs:
+            n_steps = min(n_steps, int(attrs.committed_steps))
+        self.n_steps = n_steps
+
+        self._materials = {}
+        for mat_name, material in root.materials._v_groups.items():
+            if 'before_reproc' not in material:
+                # Nothing was stored for this material yet
+                continue
+            streams = []
+            if self.load_in_out_streams and 'in_out_streams' in material:
+                streams = [
+                    stream_name for stream_name, waste_stream in
+                    material.in_out_streams._v_groups.items()
+                    if len(waste_stream._v_children) > 0]
+            self._materials[mat_name] = (
+                material.before_reproc.parameters.colnames, streams)
+
+        # Read the data that was accessed before again
+        keys = self._preload_keys() if self.preload else list(self._cache)
+        self._cache = {}
+        for key in keys:
+            self._get(key)
+
+    def _preload_keys(self):
+        keys = [(name,) for name in ('time_at_eds', 'time_total', 'keff',
+                                     'fission_mass', 'breeding_ratio',
+                                     'power_level', 'beta_eff', 'lambda_eff',
+                                     'depcode_metadata',
+                                     'depletion_step_metadata')]
+        for mat_name, (parameters, streams) in self._materials.items():
+            keys += [('material_comp', mat_name)]
+            keys += [('material_parameter', mat_name, property_name)
+                     for property_name in parameters]
+            keys += [('waste_stream', mat_name, stream_name)
+                     for stream_name in streams]
+        return keys
+
+    @contextmanager
+    def _open(self):
+        """Returns the open results file, or opens it for the duration of
+        the ``with`` block."""
+        if self._file is not None:
+            yield self._file
+        else:
+            self._file = tb.open_file(self.path, mode='r')
+            try:
+                yield self._file
+            finally:
+                self._file.close()
+                self._file = None
+
+    def _get(self, key):
+        """Returns the value read by ``_load_<key[0]>(root, *key[1:])``,
+        reading it only the first time."""
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        with self._open() as f:
+            value = getattr(self, '_load_' + key[0])(f.root, *key[1:])
+        self._cache[key] = value
+        return value
+
+    @property
+    def time_at_eds(self):
+        return self._get(('time_at_eds',))
+
+    @property
+    def time_total(self):
+        return self._get(('time_total',))
+
+    @property
+    def keff(self):
+        return self._get(('keff',))
+
+    @property
+    def fission_mass(self):
+        return self._get(('fission_mass',))
+
+    @property
+    def breeding_ratio(self):
+        return self._get(('breeding_ratio',))
+
+    @property
+    def power_level(self):
+        return self._get(('power_level',))
+
+    @property
+    def beta_eff(self):
+        return self._get(('beta_eff',))
+
+    @property
+    def lambda_eff(self):
+        return self._get(('lambda_eff',))
+
+    @property
+    def depcode_metadata(self):
+        return self._get(('depcode_metadata',))
+
+    @property
+    def depletion_step_metadata(self):
+        return self._get(('depletion_step_metadata',))
+
+    @property
+    def nuclide_idx(self):
+        return _ResultsMapping(
+            self._materials,
+            lambda mat_name: self._get(('material_comp', mat_name))[0])
+
+    @property
+    def material_composition(self):
+        return _ResultsMapping(
+            self._materials,
+            lambda mat_name: self._get(('material_comp', mat_name))[1])
+
+    @property
+    def material_parameters(self):
+        return _ResultsMapping(self._materials,
+                               self._material_parameters)
+
+    @property
+    def waste_streams(self):
+        return _ResultsMapping(self._materials, self._waste_streams)
+
+    def _material_parameters(self, mat_name):
+        return _ResultsMapping(
+            self._materials[mat_name][0],
+            lambda property_name: self._get(
+                ('material_parameter', mat_name, property_name)))
+
+    def _waste_streams(self, mat_name):
+        return _ResultsMapping(
+            self._materials[mat_name][1],
+            lambda stream_name: self._get(
+                ('waste_stream', mat_name, stream_name)))
+
+    def _read_rows(self, node, n_rows, field=None):
+        """Returns the first `n_rows` rows of `node`, or of the `field`
+        column of a table. In live mode, the rows are kept, so a refresh
+        only reads the rows that were not read before. Otherwise, only the
+        values built from them are kept."""
+        key = (node._v_pathname, field)
+        rows = self._rows.get(key)
+        n_read = 0 if rows is None else len(rows)
+        n_rows = min(n_rows, node.nrows)
+        if n_rows > n_read:
+            if field is not None:
+                new_rows = node.read(n_read, n_rows, field=field)
             else:
-                col = unp.uarray(col[:,0], col[:,1])
+                new_rows = node.read(n_read, n_rows)
+            if not isinstance(node, tb.Table):
+                new_rows = np.asarray(new_rows, dtype=node.atom.dtype)
+                new_rows = new_rows.reshape((n_rows - n_read,) + node.shape[1:])
+            if rows is not None:
+                new_rows = np.concatenate((rows, new_rows))
+            rows = new_rows
+            if self.live:
+                self._rows[key] = rows
+        return rows[:n_rows]
+
+    def _read_comp(self, node, n_rows):
+        """Returns the nuclide map and the first `n_rows` compositions stored
+        in the `comp` array of `node`.
+
+        Stored compositions are reused if new nuclides were only appended to
+        the nuclide map. Otherwise, the composition array was rewritten and
+        is read again.
+
+        """
+        nuc_map = _read_nuclide_map(node)
+        nuclides = list(nuc_map)
+        key = (node.comp._v_pathname, None)
+        read_nuclides = self._nuclides.get(key)
+        rows = self._rows.get(key)
+        if read_nuclides is not None \
+                and nuclides[:len(read_nuclides)] != read_nuclides:
+            del self._rows[key]
+        elif rows is not None and rows.shape[1] < node.comp.shape[1]:
+            self._rows[key] = np.pad(
+                rows, ((0, 0), (0, node.comp.shape[1] - rows.shape[1])))
+        self._nuclides[key] = nuclides
+        return nuc_map, self._read_rows(node.comp, n_rows)
+
+    def _sim_param_column(self, root, col):
+        if self.n_steps == 0:
+            return np.array([])
+        return self._read_rows(root.simulation_parameters, self.n_steps, col)
+
+    def _load_time_at_eds(self, root):
+        return self._sim_param_column(root, 'cumulative_time_at_eds')
+
+    def _load_time_total(self, root):
+        return np.concatenate(([0.0], np.repeat(self.time_at_eds, 2)))
+
+    def _load_keff(self, root):
+        return self._collect_eds_bds_params(root, 'keff', errors=True)
+
+    def _load_fission_mass(self, root):
+        return self._collect_eds_bds_params(root, 'fission_mass')
+
+    def _load_breeding_ratio(self, root):
+        return self._collect_eds_bds_params(root, 'breeding_ratio',
+                                            errors=True)
+
+    def _load_power_level(self, root):
+        return self._sim_param_column(root, 'power_level')
+
+    def _load_beta_eff(self, root):
+        return self._collect_eds_bds_params(root, 'beta_eff', errors=True,
+                                            multidim=True)
+
+    def _load_lambda_eff(self, root):
+        return self._collect_eds_bds_params(root, 'delayed_neutrons_lambda',
+                                            errors=True, multidim=True)
+
+    def _load_depcode_metadata(self, root):
+        if 'depcode_metadata' not in root:
+            return {}
+        return self._collect_metadata(root.depcode_metadata[:])
+
+    def _load_depletion_step_metadata(self, root):
+        if self.n_steps == 0:
+            return {}
+        return self._collect_metadata(
+            self._read_rows(root.depletion_step_metadata, self.n_steps),
+            array=True)
+
+    def _collect_eds_bds_params(self, root, col, errors=False, multidim=False):
+        if self.n_steps == 0:
+            return np.array([])
+        col_eds = self._sim_param_column(root, f'{col}_eds')
+        col_bds = self._sim_param_column(root, f'{col}_bds')
+        # Values at the beginning and end of each depletion step
+        col = np.empty((2 * len(col_bds),) + col_bds.shape[1:])
+        col[0::2] = col_bds
+        col[1::2] = col_eds
+        if errors:
+            # Values and errors are stored along the last axis
+            col = unp.uarray(col[..., 0], col[..., 1])
         return col
 
-    def _collect_metadata(self, f, nodename, array=False):
-        metadata = f.root[nodename]
-        metadata = pd.DataFrame.from_records(metadata[:]).to_dict()
+    def _collect_metadata(self, metadata, array=False):
+        metadata = pd.DataFrame.from_records(metadata).to_dict()
         for key, value in metadata.items():
             if array:
                 metadata[key] = list(value.values())
@@ -111,74 +664,277 @@ class Results():
                 metadata[key] = value[0]
         return metadata
 
-    def _collect_material_params(self, materials, load_in_out_streams):
-        nuclide_idx = {}
-        material_composition = {}
-        material_parameters = {}
-        waste_streams = {}
-        for mat_name in materials._v_groups.keys():
-            material = materials[mat_name]
-
-            # main material composition
-            nuclide_idx[mat_name], material_composition[mat_name] = self._collect_material_comp(material)
-
-            # material parameters
-            material_parameters[mat_name] = {}
-            for property_name in material.before_reproc.parameters.colnames:
-                material_parameters[mat_name][property_name] = \
-                    self._collect_material_properties(material, property_name)
-
-            # in and out streams
-            waste_streams[mat_name] = {}
-            if load_in_out_streams:
-                for stream_name in material.in_out_streams._v_groups.keys():
-                    waste_stream = material.in_out_streams[stream_name]
-                    if len(waste_stream._v_children) > 0:
-                        waste_streams[mat_name][stream_name] = \
-                            self._collect_waste_streams(waste_stream, stream_name)
-
-        return nuclide_idx, material_composition, material_parameters, waste_streams
-
-    # MAKE THIS COLLECT IT INTO A TABLE/2D ARRAY
-    def _collect_material_comp(self, material):
-        nuc_map = material.before_reproc.nuclide_map
-        nucs = list(map(bytes.decode, nuc_map.col('nuclide')))
-        nuc_map = dict(zip(nucs, nuc_map.col('index')))
-        arr_dim = (len(nuc_map), len(material.before_reproc.comp) + \
-                   len(material.after_reproc.comp))
-        material_comp = np.empty(arr_dim)
-        for nuc in nucs:
-            nuc_comp_br = material.before_reproc.comp[:, nuc_map[nuc]]
-            nuc_comp_ar = material.after_reproc.comp[:, nuc_map[nuc]]
-            nuc_comp_0 = nuc_comp_br.pop(0)
-            nuc_comp = []
-            for c1, c2 in zip(nuc_comp_br, nuc_comp_ar):
-                nuc_comp = nuc_comp + [c1, c2]
-            nuc_comp = [nuc_comp_0] + nuc_comp
-            material_comp[nuc_map[nuc], :] = nuc_comp
-        return nuc_map, material_comp
-
-    def _collect_material_properties(self, material, col):
-        col_br = material.before_reproc.parameters.col(col).tolist()
-        col_ar = material.after_reproc.parameters.col(col).tolist()
-        col_0 = col_br.pop(0)
-        col_values = []
-        for c1, c2 in zip(col_br, col_ar):
-            col_values = col_values + [c1, c2]
-        col_values = [col_0] + col_values
-        return col_values
+    def _load_material_comp(self, root, mat_name):
+        material = root.materials[mat_name]
+        # The initial composition is stored before the first step
+        return self._collect_material_comp(
+            self._read_comp(material.before_reproc, self.n_steps + 1),
+            self._read_comp(material.after_reproc, self.n_steps))
+
+    def _collect_material_comp(self, before, after):
+        """Interleave the compositions before and after reprocessing.
+
+        Parameters
+        ----------
+        before, after : tuple
+            Nuclide map and compositions before and after reprocessing.
+
+        Returns
+        -------
+        nuc_map : dict of str to int
+            Map of nuclide name to row index in `material_comp`.
+        material_comp : numpy.ndarray
+            Nuclide mass at the initial state, and before and after
+            reprocessing at each depletion step.
+
+        """
+        nuc_maps = (before[0], after[0])
+        nuc_map = _union_nuclide_map(nuc_maps)
+        comp_br, comp_ar = [self._align_comp(nuc_map, node_map, stored)
+                            for node_map, stored in zip(nuc_maps,
+                                                        (before[1], after[1]))]
+        # Transposed, so nuclides are rows and times are columns
+        material_comp = _interleave(comp_br, comp_ar).T
+        return nuc_map, np.ascontiguousarray(material_comp)
 
+    def _align_comp(self, nuc_map, node_map, stored):
+        """Returns the compositions `stored` with the columns of the
+        nuclides in `node_map` moved to their index in `nuc_map`."""
+        columns = list(node_map.values())
+        if list(node_map) == list(nuc_map) \
+                and columns == list(range(len(columns))):
+            # The stored columns are already in order
+            return stored[:, :len(nuc_map)]
+        comp = np.zeros((len(stored), len(nuc_map)))
+        comp[:, [nuc_map[nuc] for nuc in node_map]] = stored[:, columns]
+        return comp
+
+    def _load_material_parameter(self, root, mat_name, col):
+        material = root.materials[mat_name]
+        col_br = self._read_rows(material.before_reproc.parameters,
+                                 self.n_steps + 1, col)
+        col_ar = self._read_rows(material.after_reproc.parameters,
+                                 self.n_steps, col)
+        return _interleave(col_br, col_ar).tolist()
+
+    def _load_waste_stream(self, root, mat_name, stream_name):
+        waste_stream = root.materials[mat_name].in_out_streams[stream_name]
+        return self._collect_waste_streams(waste_stream, stream_name)
 
     def _collect_waste_streams(self, waste_stream, stream_name):
         nuc_map = waste_stream.nuclide_map
         nucs = list(map(bytes.decode, nuc_map.col('nuclide')))
         nuc_map = dict(zip(nucs, nuc_map.col('index')))
+        if 'indptr' in waste_stream:
+            return SparseStreamComposition(
+                nuc_map,
+                self._read_rows(waste_stream.indptr,
+                                waste_stream.indptr.nrows),
+                self._read_rows(waste_stream.indices,
+                                waste_stream.indices.nrows),
+                self._read_rows(waste_stream.values,
+                                waste_stream.values.nrows))
+        nuc_map, comp = self._read_comp(waste_stream, waste_stream.comp.nrows)
         waste_stream_comp = {}
         for nuc in nucs:
-            nuc_comp = waste_stream.comp[:, nuc_map[nuc]]
-            waste_stream_comp[nuc] = nuc_comp
+            waste_stream_comp[nuc] = comp[:, nuc_map[nuc]]
         return waste_stream_comp
 
+    def to_xarray(self, material, chunks=None):
+        """Returns the composition history of a material as a labeled
+        array. Requires :mod:`xarray`.
+
+        Parameters
+        ----------
+        material : str
+            Material name
+        chunks : int, tuple, or str, optional
+            If given, the array is backed by a :mod:`dask` array with these
+            chunks, which reads the requested times from the results file
+            when it is computed, so it can be larger than the available
+            memory. Otherwise, the array wraps
+            :attr:`material_composition` without a copy.
+
+        Returns
+        -------
+        composition : xarray.DataArray
+            Nuclide mass [g] with ``time`` and ``nuclide`` dimensions. The
+            ``time`` coordinate is :attr:`time_total`, and the ``moment``
+            coordinate along ``time`` is ``before`` or ``after``
+            reprocessing.
+
+        """
+        if xr is None:
+            raise ImportError('Results.to_xarray() requires xarray')
+        if chunks is None:
+            nuclide_idx = self.nuclide_idx[material]
+            data = self.material_composition[material].T
+        else:
+            if da is None:
+                raise ImportError('Chunked Results.to_xarray() requires '
+                                  'dask')
+            with self._open() as f:
+                material_node = f.root.materials[material]
+                nuclide_idx = _union_nuclide_map(
+                    (_read_nuclide_map(material_node.before_reproc),
+                     _read_nuclide_map(material_node.after_reproc)))
+            data = da.from_array(
+                _CompositionReader(self.path, material, nuclide_idx,
+                                   self.n_steps),
+                chunks=chunks)
+        return xr.DataArray(
+            data,
+            dims=('time', 'nuclide'),
+            coords={'time': self.time_total,
+                    'moment': ('time', _moments(self.n_steps)),
+                    'nuclide': list(nuclide_idx)},
+            name=material,
+            attrs={'units': 'g'})
+
+    def to_dataframe(self, material):
+        """Returns the composition history of a material as a
+        :class:`pandas.DataFrame`, which wraps :attr:`material_composition`
+        without a copy.
+
+        Parameters
+        ----------
+        material : str
+            Material name
+
+        Returns
+        -------
+        composition : pandas.DataFrame
+            Nuclide mass [g] with a column for each nuclide. Rows are
+            indexed by ``time`` (:attr:`time_total`) and ``moment``
+            (``before`` or ``after`` reprocessing).
+
+        """
+        index = pd.MultiIndex.from_arrays(
+            [self.time_total, _moments(self.n_steps)],
+            names=['time', 'moment'])
+        return pd.DataFrame(self.material_composition[material].T,
+                            index=index,
+                            columns=list(self.nuclide_idx[material]),
+                            copy=False)
+
+    def _material_comp(self, mat_name):
+        """Returns the nuclides and the composition history of a
+        material."""
+        nuc_map, comp = self._get(('material_comp', mat_name))
+        # Nuclide map indices are the rows of the composition history
+        return tuple(nuc_map), comp
+
+    def _derive(self, material, derive):
+        """Returns ``derive(nuclides, comp)`` for a material, or a
+        dictionary of its value for every material if `material` is
+        `None`."""
+        if material is None:
+            return {mat_name: derive(*self._material_comp(mat_name))
+                    for mat_name in self._materials}
+        return derive(*self._material_comp(material))
+
+    def element_mass(self, material=None):
+        """Get element masses as timeseries.
+
+        Parameters
+        ----------
+        material : str, optional
+            Material name. If `None`, return the element masses of every
+            material.
+
+        Returns
+        -------
+        element_mass : dict of str to numpy.ndarray
+            A dictionary mapping element symbols, in order of atomic
+            number, to the element mass [g] at each time in
+            :attr:`time_total`. If `material` is `None`, a dictionary
+            mapping material names to these dictionaries.
+
+        """
+        def derive(nuclides, comp):
+            elements, matrix = _element_matrix(nuclides)
+            return dict(zip(elements, matrix @ comp))
+        return self._derive(material, derive)
+
+    def actinide_mass(self, material=None):
+        """Get the total mass of actinides (Z >= 89) as a timeseries.
+
+        Parameters
+        ----------
+        material : str, optional
+            Material name. If `None`, return the actinide mass of every
+            material.
+
+        Returns
+        -------
+        actinide_mass : numpy.ndarray or dict of str to numpy.ndarray
+            Actinide mass [g] at each time in :attr:`time_total`. If
+            `material` is `None`, a dictionary mapping material names to
+            actinide masses.
+
+        """
+        return self._derive(
+            material,
+            lambda nuclides, comp: _actinide_vector(nuclides) @ comp)
+
+    def activity(self, material=None, decay_constants=None):
+        """Get the activity as a timeseries.
+
+        Parameters
+        ----------
+        material : str, optional
+            Material name. If `None`, return the activity of every
+            material.
+        decay_constants : dict of str to float, optional
+            Dictionary mapping nuclide names to their decay constant [1/s].
+            Nuclides that are not in the dictionary are stable. If `None`,
+            decay constants are read with :func:`openmc.data.decay_constant`.
+
+        Returns
+        -------
+        activity : numpy.ndarray or dict of str to numpy.ndarray
+            Activity [Bq] at each time in :attr:`time_total`. If `material`
+            is `None`, a dictionary mapping material names to activities.
+
+        """
+        return self._derive(
+            material,
+            lambda nuclides, comp:
+                _specific_activity(nuclides, decay_constants) @ comp)
+
+    def decay_heat(self, material=None, decay_constants=None,
+                   decay_energies=None):
+        """Get the decay heat as a timeseries.
+
+        Parameters
+        ----------
+        material : str, optional
+            Material name. If `None`, return the decay heat of every
+            material.
+        decay_constants : dict of str to float, optional
+            Dictionary mapping nuclide names to their decay constant [1/s].
+            Nuclides that are not in the dictionary are stable. If `None`,
+            decay constants are read with :func:`openmc.data.decay_constant`.
+        decay_energies : dict of str to float, optional
+            Dictionary mapping nuclide names to their decay energy [eV].
+            Nuclides that are not in the dictionary release no energy. If
+            `None`, decay energies are read with
+            :func:`openmc.data.decay_energy`, which requires a depletion
+            chain in ``openmc.config['chain_file']``.
+
+        Returns
+        -------
+        decay_heat : numpy.ndarray or dict of str to numpy.ndarray
+            Decay heat [W] at each time in :attr:`time_total`. If
+            `material` is `None`, a dictionary mapping material names to
+            decay heats.
+
+        """
+        return self._derive(
+            material,
+            lambda nuclides, comp: _specific_decay_heat(
+                nuclides, decay_constants, decay_energies) @ comp)
+
     # methods to get timeseries of various values
     def get_nuclide_mass(self, material, nuclide, timestep=None):
         """Get nuclide mass as a timeseries. If :attr:`timestep` is `None`,
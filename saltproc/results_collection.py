@@ -0,0 +1,328 @@
+"""ResultsCollection module"""
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+
+import numpy as np
+import pandas as pd
+import tables as tb
+
+from saltproc.results import _CompositionReader, _read_nuclide_map, \
+    _union_nuclide_map
+
+
+def _committed_steps(db):
+    """Returns the number of completed depletion steps in a results file."""
+    root = db.root
+    if 'simulation_parameters' not in root:
+        return 0
+    n_steps = int(root.simulation_parameters.nrows)
+    if 'committed_steps' in root._v_attrs:
+        n_steps = min(n_steps, int(root._v_attrs.committed_steps))
+    return n_steps
+
+
+def _index_results_file(path):
+    """Returns the number of depletion steps, the cumulative time at the
+    end of each depletion step, and the materials in a results file."""
+    with tb.open_file(path, mode='r') as db:
+        n_steps = _committed_steps(db)
+        time_at_eds = []
+        if n_steps > 0:
+            time_at_eds = db.root.simulation_parameters.read(
+                0, n_steps, field='cumulative_time_at_eds').tolist()
+        materials = []
+        if 'materials' in db.root:
+            materials = list(db.root.materials._v_groups)
+    return {'n_steps': n_steps,
+            'time_at_eds': time_at_eds,
+            'materials': materials}
+
+
+def _keff(path, step, moment, error):
+    """Returns :math:`k_\\text{eff}`, or its uncertainty, at the beginning
+    (``bds``) or end (``eds``) of a depletion step."""
+    with tb.open_file(path, mode='r') as db:
+        n_steps = _committed_steps(db)
+        step = range(n_steps)[step]
+        keff = db.root.simulation_parameters.read(
+            step, step + 1, field=f'keff_{moment}')[0]
+    return float(keff[int(error)])
+
+
+def _nuclide_mass(path, material, nuclide, time_total):
+    """Returns the mass [g] of a nuclide in a material at the last stored
+    time at or before `time_total`."""
+    with tb.open_file(path, mode='r') as db:
+        n_steps = _committed_steps(db)
+        time_at_eds = db.root.simulation_parameters.read(
+            0, n_steps, field='cumulative_time_at_eds')
+        material_node = db.root.materials[material]
+        nuclide_idx = _union_nuclide_map(
+            (_read_nuclide_map(material_node.before_reproc),
+             _read_nuclide_map(material_node.after_reproc)))
+    if nuclide not in nuclide_idx:
+        return 0.0
+    times = np.concatenate(([0.0], np.repeat(time_at_eds, 2)))
+    time_index = np.searchsorted(times, time_total, side='right') - 1
+    if time_index < 0:
+        return np.nan
+    reader = _CompositionReader(path, material, nuclide_idx, n_steps)
+    return float(reader[time_index, nuclide_idx[nuclide]])
+
+
+def _run_query(args):
+    """Runs a query on one results file in a worker process. Files that
+    cannot be read give `None`."""
+    function, path, query_args = args
+    try:
+        return function(path, *query_args)
+    except (OSError, KeyError, IndexError, ValueError,
+            tb.exceptions.HDF5ExtError, tb.NoSuchNodeError):
+        return None
+
+
+class ResultsCollection():
+    """Collection of SaltProc results files, such as the runs of a
+    sensitivity study, that reads quantities from all results files in
+    parallel.
+
+    The collection keeps an index of the results files and the values of
+    past queries in a cache file in `directory`. Entries are keyed by the
+    size and modification time of each results file, so repeated queries
+    only read results files that changed. Results files that cannot be
+    read, e.g. because they are still being written, are not cached and are
+    read again by the next query.
+
+    Parameters
+    ----------
+    directory : str
+        Directory containing the results files.
+    pattern : str, optional
+        Glob pattern of the results files, relative to `directory`.
+    parameters : str or callable, optional
+        Run parameters of each results file. Either a regular expression
+        with named groups, which is searched for in the path of the results
+        file relative to `directory`, or a function that maps the path of a
+        results file to a dictionary of parameter names to values.
+        Numeric regular expression groups are converted to `float`. If
+        `None`, runs are keyed by their relative path.
+    processes : int, optional
+        Number of worker processes. If `None`, the number of CPUs is used.
+        With one process, results files are read in the calling process.
+    cache_file : str, optional
+        Path of the cache file. Defaults to
+        ``<directory>/.saltproc_results_cache.json``.
+
+    Attributes
+    ----------
+    paths : list of str
+        Paths of the results files, relative to `directory`.
+    parameters : pandas.DataFrame
+        Run parameters of each results file, indexed by the relative path.
+    index : pandas.DataFrame
+        Number of depletion steps, cumulative time at the end of the last
+        depletion step, and materials of each results file.
+
+    """
+
+    CACHE_VERSION = 1
+
+    def __init__(self, directory, pattern='**/*.h5', parameters=None,
+                 processes=None, cache_file=None):
+        self.directory = directory
+        self.pattern = pattern
+        self.processes = processes
+        if cache_file is None:
+            cache_file = os.path.join(directory,
+                                      '.saltproc_results_cache.json')
+        self.cache_file = cache_file
+        self.paths = sorted(
+            os.path.relpath(path, directory)
+            for path in glob(os.path.join(directory, pattern),
+                             recursive=True))
+        self.parameters = pd.DataFrame(
+            [self._run_parameters(path, parameters) for path in self.paths],
+            index=pd.Index(self.paths, name='path'))
+        self._cache = self._read_cache()
+        # Results files whose index could not be read are not cached
+        self._failed = set()
+        self._update_index()
+
+    def _run_parameters(self, path, parameters):
+        if parameters is None:
+            return {}
+        if callable(parameters):
+            return dict(parameters(path))
+        match = re.search(parameters, path)
+        if match is None:
+            return {}
+        values = {}
+        for name, value in match.groupdict().items():
+            try:
+                values[name] = float(value)
+            except (TypeError, ValueError):
+                values[name] = value
+        return values
+
+    def _stamp(self, path):
+        stat = os.stat(os.path.join(self.directory, path))
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _read_cache(self):
+        """Returns the cache entries of results files that did not change
+        since they were cached."""
+        try:
+            with open(self.cache_file) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if cache.get('version') != self.CACHE_VERSION:
+            return {}
+        entries = cache.get('files', {})
+        return {path: entries[path] for path in self.paths
+                if path in entries
+                and entries[path]['stamp'] == self._stamp(path)}
+
+    def _write_cache(self):
+        # Write to a temporary file first, so readers never see a partial
+        # cache
+        tmp_file = self.cache_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({'version': self.CACHE_VERSION,
+                       'files': {path: entry
+                                 for path, entry in self._cache.items()
+                                 if path not in self._failed}},
+                      f)
+        os.replace(tmp_file, self.cache_file)
+
+    def _map(self, function, paths, *args):
+        """Returns ``function(path, *args)`` for each path, computed by the
+        worker processes."""
+        tasks = [(function, os.path.join(self.directory, path), args)
+                 for path in paths]
+        if self.processes == 1 or len(tasks) <= 1:
+            return [_run_query(task) for task in tasks]
+        processes = self.processes or os.cpu_count() or 1
+        chunksize = max(1, len(tasks) // (4 * processes))
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            return list(executor.map(_run_query, tasks, chunksize=chunksize))
+
+    def _update_index(self):
+        new_paths = [path for path in self.paths
+                     if path not in self._cache or path in self._failed]
+        if new_paths:
+            for path, entry in zip(new_paths,
+                                   self._map(_index_results_file, new_paths)):
+                if entry is None:
+                    self._failed.add(path)
+                    entry = {'n_steps': 0, 'time_at_eds': [], 'materials': []}
+                else:
+                    self._failed.discard(path)
+                entry.update(stamp=self._stamp(path), queries={})
+                self._cache[path] = entry
+            self._write_cache()
+        self.index = pd.DataFrame(
+            {'n_steps': [self._cache[path]['n_steps']
+                         for path in self.paths],
+             'time': [(self._cache[path]['time_at_eds'] or [0.0])[-1]
+                      for path in self.paths],
+             'materials': [self._cache[path]['materials']
+                           for path in self.paths]},
+            index=pd.Index(self.paths, name='path'))
+
+    def query(self, function, *args, name=None):
+        """Returns ``function(path, *args)`` for each results file.
+
+        Parameters
+        ----------
+        function : callable
+            Module-level function (so it can be sent to the worker
+            processes) of the path of a results file and `args`, returning
+            a number.
+        args : tuple
+            JSON serializable arguments of `function`.
+        name : str, optional
+            Name of the returned series.
+
+        Returns
+        -------
+        values : pandas.Series
+            Value for each results file, indexed by the run parameters.
+            Results files that could not be read give `NaN`, and are read
+            again by the next query.
+
+        """
+        if self._failed:
+            self._update_index()
+        key = json.dumps([function.__module__, function.__qualname__,
+                          list(args)])
+        missing = [path for path in self.paths
+                   if key not in self._cache[path]['queries']]
+        failed = set()
+        if missing:
+            for path, value in zip(missing,
+                                   self._map(function, missing, *args)):
+                if value is None:
+                    failed.add(path)
+                else:
+                    self._cache[path]['queries'][key] = value
+            self._write_cache()
+        values = np.array([np.nan if path in failed
+                           else self._cache[path]['queries'][key]
+                           for path in self.paths], dtype=float)
+        return pd.Series(values, index=self._index(), name=name)
+
+    def _index(self):
+        if self.parameters.shape[1] == 0:
+            return self.parameters.index
+        return pd.MultiIndex.from_frame(self.parameters)
+
+    def keff(self, step=-1, moment='eds', error=False):
+        """Returns :math:`k_\\text{eff}` at a depletion step of each run.
+
+        Parameters
+        ----------
+        step : int, optional
+            Depletion step index. The default is the last depletion step
+            (end of life).
+        moment : {'eds', 'bds'}, optional
+            End or beginning of the depletion step.
+        error : bool, optional
+            If `True`, return the uncertainty instead.
+
+        Returns
+        -------
+        keff : pandas.Series
+            Value for each run, indexed by the run parameters.
+
+        """
+        if moment not in ('eds', 'bds'):
+            raise ValueError(f'{moment} is not a valid moment. Valid '
+                             'options are: eds, bds')
+        return self.query(_keff, step, moment, error, name='keff')
+
+    def nuclide_mass(self, material, nuclide, time):
+        """Returns the mass [g] of a nuclide in a material at a time for
+        each run. The mass is taken at the last stored time at or before
+        `time`, after reprocessing if reprocessing happened at that time.
+
+        Parameters
+        ----------
+        material : str
+            Material name
+        nuclide : str
+            Nuclide name (e.g. 'U235')
+        time : float
+            Cumulative depletion time [d].
+
+        Returns
+        -------
+        nuclide_mass : pandas.Series
+            Value for each run, indexed by the run parameters.
+
+        """
+        return self.query(_nuclide_mass, material, nuclide, time,
+                          name=nuclide)
@@ -1,17 +1,129 @@
 from pathlib import Path
+import json
 import os
 import shutil
+import signal
+import subprocess
+import time
 import re
 
+from functools import lru_cache
+
 import serpentTools
 import openmc
 import openmc.data
-from math import floor
 import numpy as np
 
 from saltproc import Materialflow
 from saltproc.depcode import Depcode
 
+_COMFILE_IN_NAME = 'runtime_input.serpent.comin'
+_COMFILE_OUT_NAME = 'runtime_input.serpent.comout'
+
+# Largest atomic number in the nuclide code translation tables
+_MAX_Z = 120
+
+
+@lru_cache(maxsize=None)
+def _za_to_zam_table(zaid_convention):
+    """Returns the table mapping every ZA nuclide code (``1000 * Z + A``
+    plus the metastable state offset of `zaid_convention`) to its ZAM code
+    (``10000 * Z + 10 * A + m``).
+
+    Parameters
+    ----------
+    zaid_convention : {'serpent', 'mcnp', 'nndc'}
+        Naming convention for the ZA of metastable states.
+
+    Returns
+    -------
+    table : numpy.ndarray of int
+        ZAM code at the index of each ZA nuclide code.
+
+    """
+    Z, A = np.divmod(np.arange(1000 * _MAX_Z), 1000)
+    if zaid_convention == 'serpent':
+        m = (A > 300).astype(int)
+        A = A - np.where(Z > 76, 100, 200) * m
+    elif zaid_convention in ('mcnp', 'nndc'):
+        # Assumes only m=1 metastable states
+        m = (A > 400).astype(int)
+        A = A - 400 * m
+    else:
+        raise ValueError(f'{zaid_convention} is not a valid ZAID convention')
+    table = 10000 * Z + 10 * A + m
+    if zaid_convention == 'nndc':
+        table[[95242, 95642]] = table[[95642, 95242]]
+    table.flags.writeable = False
+    return table
+
+
+# Arrays of the `*_dep.m` file read by SaltProc
+_DEP_ARRAY = re.compile(r'(ZAI|BU|DAYS|MAT_(.+)_(MDENS|VOLUME))\s*=\s*\[')
+
+
+def _read_dep_file(dep_file):
+    """Reads the arrays SaltProc needs from a Serpent2 `*_dep.m` file.
+
+    The file is scanned once, and all other arrays are skipped without
+    being parsed.
+
+    Parameters
+    ----------
+    dep_file : str
+        Path to the `*_dep.m` file.
+
+    Returns
+    -------
+    dep : dict of str to object
+        ``zai``, the ZAM code of each nuclide, ``burnup`` [MWd/kgU] and
+        ``days`` at each moment, and ``materials``, a dictionary mapping
+        burnable material names to their ``volume`` [cm^3] at each moment
+        and ``mdens``, the mass density [g/cm^3] of each nuclide (rows) at
+        each moment (columns), followed by the lost and total mass
+        densities.
+
+    """
+    arrays = {}
+    with open(dep_file) as f:
+        for line in f:
+            if '[' not in line:
+                continue
+            match = _DEP_ARRAY.match(line)
+            rest = line[match.end():] if match else line
+            if ']' in rest:
+                lines = [rest.partition(']')[0]]
+            elif match is None:
+                for line in f:
+                    if line.startswith(']'):
+                        break
+                continue
+            else:
+                lines = []
+                for line in f:
+                    if line.startswith(']'):
+                        break
+                    # Drop the nuclide name comments
+                    lines.append(line.partition('%')[0])
+            if match is not None:
+                arrays[match.group(2), match.group(3) or match.group(1)] = \
+                    lines
+
+    def to_array(lines, dtype=float):
+        values = np.fromstring(' '.join(lines), dtype=dtype, sep=' ')
+        return values.reshape(len(lines), -1) if len(lines) > 1 else values
+
+    materials = {}
+    for (material_name, name), lines in arrays.items():
+        if material_name is not None:
+            materials.setdefault(material_name, {})[name.lower()] = \
+                to_array(lines)
+    return {'zai': to_array(arrays[None, 'ZAI'], dtype=int).ravel(),
+            'burnup': to_array(arrays[None, 'BU']),
+            'days': to_array(arrays[None, 'DAYS']),
+            'materials': materials}
+
+
 class SerpentDepcode(Depcode):
     """Interface for running depletion steps in Serpent, as well as obtaining
     depletion step results.
@@ -39,6 +151,21 @@ class SerpentDepcode(Depcode):
 
         'nndc' - Identical to 'mcnp', except Am242m1 is 95242 and Am242
         is 95642
+    persistent_session : bool, optional
+        If `True`, keep one Serpent2 process resident for the whole
+        simulation. SaltProc and Serpent2 communicate through the coupled
+        calculation files declared with ``set comfile``: Serpent2 signals
+        the end of each depletion interval on the output file, and
+        SaltProc signals the start of the next interval (``SIGUSR2``), or
+        the end of the simulation (``SIGTERM``), on the input file. The
+        resident executable must reload the burnable material file
+        written by :meth:`update_depletable_materials` and run the next
+        depletion interval when it receives ``SIGUSR2``. Stock Serpent2
+        does not, so only enable this for an executable that does. If the
+        depletion time in the output does not advance after an interval,
+        a :class:`RuntimeError` is raised. The session is restarted
+        whenever the power or the depletion step length changes, or the
+        geometry is switched.
 
     Attributes
     ----------
@@ -71,7 +198,8 @@ class SerpentDepcode(Depcode):
                  exec_path,
                  template_input_file_path,
                  geo_file_paths,
-                 zaid_convention):
+                 zaid_convention,
+                 persistent_session=False):
         """Initialize a SerpentDepcode object.
 
         """
@@ -84,6 +212,18 @@ class SerpentDepcode(Depcode):
                          str((output_path / 'runtime_input.serpent').resolve())
         self.runtime_matfile = str((output_path / 'runtime_mat.ini').resolve())
         self.zaid_convention = zaid_convention
+        self.persistent_session = persistent_session
+        self._session = None
+        self._session_power_card = None
+        # Depletion time [d] at the end of the last interval of the session
+        self._session_days = None
+        # Output file suffix to the key and contents of the last file read
+        self._output_files = {}
+        # Nuclide names to Serpent2 nuclide codes, persisted in
+        # `nuclide_code_map_file`
+        self._nuc_code_map = None
+        self.nuclide_code_map_file = \
+            self.runtime_inputfile + '_nuclide_codes.json'
         self._OUTPUTFILE_NAMES = ('runtime_input.serpent_res.m', 'runtime_input.serpent_dep.m',
                                  'runtime_input.serpent.seed', 'runtime_input.serpent.out',
                                  'runtime_input.serpent.dep')
@@ -195,70 +335,73 @@ class SerpentDepcode(Depcode):
             Symbolic nuclide name (`Am242_m1`).
 
         """
+        return self.nuclide_codes_to_names([nuc_code])[0]
 
-        if '.' in str(nuc_code):
-            nuc_code = int(nuc_code.split('.')[0])
-            if self.zaid_convention == 'nndc' and nuc_code in (95242, 95642):
-               if nuc_code == 95242:
-                  nuc_code = 95642
-               else:
-                  nuc_code = 95242
-            Z, a, m = self._nuclide_code_to_zam(nuc_code)
-        else:
-            Z, a, m = self._decay_code_to_zam(nuc_code)
+    def nuclide_codes_to_names(self, nuc_codes):
+        """Converts Serpent2 nuclide codes to symbolic nuclide names.
 
-        nucname = openmc.data.gnds_name(Z, a, m=m)
-        if m != 0:
-            nucname = nucname[:-3] + f'_m{m}'
-        return nucname
+        Parameters
+        ----------
+        nuc_codes : list of str
+            Nuclide codes in Serpent2 format, with a library suffix for
+            nuclides with cross section data (`47310.09c`) or as decay
+            codes (`471101`).
+
+        Returns
+        -------
+        nuc_names : list of str
+            Symbolic nuclide names (`Ag110_m1`).
+
+        """
+        index = Materialflow.nuclide_index
+        return index.names_at(
+            index.zam_positions(self._nuclide_codes_to_zams(nuc_codes)))
+
+    def _nuclide_codes_to_zams(self, nuc_codes):
+        """Returns the ZAM codes of Serpent2 nuclide codes. Codes with a
+        library suffix are ZA codes in :attr:`zaid_convention`, and codes
+        without one are decay codes, which are ZAM codes."""
+        nuc_codes = np.asarray(nuc_codes, dtype=str)
+        codes, suffix, _ = np.moveaxis(np.char.partition(nuc_codes, '.'),
+                                       -1, 0)
+        zams = codes.astype(int)
+        is_za = suffix == '.'
+        zams[is_za] = _za_to_zam_table(self.zaid_convention)[zams[is_za]]
+        return zams
 
     def _decay_code_to_zam(self, nuc_code):
-        m = int(str(nuc_code)[-1])
-        nuc_code = int(str(nuc_code)[:-1])
-        Z = floor(nuc_code * 1e-3)
-        a = nuc_code % 1000
-        return Z, a, m
+        Z, a = divmod(int(nuc_code) // 10, 1000)
+        return Z, a, int(nuc_code) % 10
 
     def _nuclide_code_to_zam(self, nuc_code):
-        if '.' in str(nuc_code):
-            nuc_code = int(nuc_code.split('.')[0])
-
-        Z = floor(nuc_code * 1e-3)
-        a = nuc_code % 1000
-        m = 0
-        if self.zaid_convention == 'serpent':
-            if a > 300:
-                m = 1
-                if Z > 76:
-                    a = a - 100
-                else:
-                    a = a - 200
-        else:
-            # Assumes only m=1 metastable states
-            if a > 400:
-                a -= 400
-                m = 1
-        return Z, a, m
+        zam = int(_za_to_zam_table(self.zaid_convention)[
+            int(str(nuc_code).split('.')[0])])
+        Z, a = divmod(zam // 10, 1000)
+        return Z, a, zam % 10
 
     def name_to_nuclide_code(self, nucname):
-        Z, a, m = openmc.data.zam(nucname)
-        nuc_code = self._zam_to_nuclide_code(Z, a, m)
-        return nuc_code
-
-    def _zam_to_nuclide_code(self, Z, a, m):
-        nuc_code = Z * 1000
-        if m != 0:
-            if self.zaid_convention == 'serpent':
-                nuc_code += int(((a / 100) - 3) * 100)
-            else:
-                nuc_code += 300 + 100 * m
-                if self.zaid_convention == 'nndc' and nuc_code in (95242, 95642):
-                   if nuc_code == 95242:
-                      nuc_code = 95642
-                   else:
-                      nuc_code = 95242
-        return nuc_code
+        """Converts a symbolic nuclide name to its ZA nuclide code in
+        :attr:`zaid_convention`."""
+        return int(self.names_to_nuclide_codes([nucname])[0])
 
+    def names_to_nuclide_codes(self, nucnames):
+        """Converts symbolic nuclide names to ZA nuclide codes.
+
+        Parameters
+        ----------
+        nucnames : list of str
+            Symbolic nuclide names (`Ag110_m1`).
+
+        Returns
+        -------
+        nuc_codes : numpy.ndarray of int
+            ZA nuclide codes in :attr:`zaid_convention` (`47310` in the
+            ``serpent`` convention).
+
+        """
+        index = Materialflow.nuclide_index
+        return index.nuclide_codes(index.positions(nucnames),
+                                   self.zaid_convention)
 
     def map_nuclide_name_to_serpent_name(self):
         """Creates a dictionary mapping nuclide codes in `zzaaam` format
@@ -278,7 +421,7 @@ class SerpentDepcode(Depcode):
                 nuclide with cross section data or 982510 for a decay-only nuclide.
 
         """
-        nuc_code_map = {}
+        nuc_codes = []
         # Construct path to the *.out File
         out_file = os.path.join('%s.out' % self.runtime_inputfile)
         with open(out_file, 'r') as f:
@@ -291,12 +434,86 @@ class SerpentDepcode(Depcode):
                 if end in line:
                     break
                 if 'c  TRA' in line or 'c  DEC' in line:
-                    line = line.split()
-                    nuc_code = line[2]
-                    nuc_name = self.nuclide_code_to_name(nuc_code)
-                    nuc_code_map.update({nuc_name: nuc_code})
+                    nuc_codes.append(line.split()[2])
+        if not nuc_codes:
+            return {}
+        return dict(zip(self.nuclide_codes_to_names(nuc_codes), nuc_codes))
+
+    def get_nuclide_code_map(self, nuclides=()):
+        """Returns the map of nuclide names to Serpent2 nuclide codes.
+
+        The map is built from the Serpent2 output file the first time it is
+        needed, and saved to :attr:`nuclide_code_map_file` so restarted
+        simulations do not rebuild it. The output file is only scanned
+        again when one of `nuclides` is not in the map, and the nuclides it
+        adds are saved.
+
+        Parameters
+        ----------
+        nuclides : iterable of str, optional
+            Nuclide names that must be in the map.
+
+        Returns
+        -------
+        nuc_code_map : dict of str to str
+            Maps nuclide names (e.g. ``U235``) to Serpent2 nuclide codes
+            (e.g. ``92235.09c``).
+
+        """
+        if self._nuc_code_map is None:
+            self._nuc_code_map = self._read_nuclide_code_map()
+        nuc_code_map = self._nuc_code_map
+        if not nuc_code_map or \
+                any(nuc not in nuc_code_map for nuc in nuclides):
+            nuc_code_map.update(self.map_nuclide_name_to_serpent_name())
+            self._write_nuclide_code_map()
         return nuc_code_map
 
+    def _nuclide_code_map_key(self):
+        """Returns the settings the nuclide codes depend on: the ZAID
+        convention and the cross section libraries of the template input
+        file."""
+        acelib = [line.strip() for line in
+                  self.read_plaintext_file(self.template_input_file_path)
+                  if line.startswith('set acelib')]
+        return {'zaid_convention': self.zaid_convention, 'acelib': acelib}
+
+    def _read_nuclide_code_map(self):
+        """Reads the saved nuclide code map, or returns an empty map if
+        there is none or it was built with other settings."""
+        try:
+            with open(self.nuclide_code_map_file) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if saved.get('key') != self._nuclide_code_map_key():
+            return {}
+        return saved['nuclide_codes']
+
+    def _write_nuclide_code_map(self):
+        # Write to a temporary file first, so a restart never reads a
+        # partial map
+        tmp_file = self.nuclide_code_map_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({'key': self._nuclide_code_map_key(),
+                       'nuclide_codes': self._nuc_code_map}, f)
+        os.replace(tmp_file, self.nuclide_code_map_file)
+
+    def get_depletion_nuclides(self):
+        """Returns the names of the nuclides with transport or decay data
+        listed in the Serpent2 output file, or `None` if no depletion step
+        has been run yet.
+
+        Returns
+        -------
+        nuclides : list of str or None
+            Nuclide names (e.g. ``U235`` or ``Am242_m1``).
+
+        """
+        if not os.path.exists('%s.out' % self.runtime_inputfile):
+            return None
+        return list(self.get_nuclide_code_map().keys())
+
     def resolve_include_paths(self, lines):
         """Resolves relative paths in runtime input file into
         absolute paths.
@@ -365,39 +582,79 @@ class SerpentDepcode(Depcode):
                 :class:`Materialflow` object holding material composition and properties.
 
         """
-        # Determine moment in depletion step to read data from
+        # Determine moment in depletion step to read data from. A resident
+        # Serpent2 process keeps the earlier intervals in the output, so the
+        # step is read from the last two moments.
         if read_at_end:
-            moment = 1
+            moment = -1
         else:
-            moment = 0
+            moment = -2
 
         openmc.reset_auto_ids()
-        results_file = os.path.join('%s_dep.m' % self.runtime_inputfile)
-        results = serpentTools.read(results_file)
-        self.days = results.days[moment]
-
-        # Get material names
-        mat_names = []
+        # Both moments are read from one scan of the file
+        results = self._read_depletion_output()
+        self.days = results['days'][moment]
+
+        # ZAI codes in the _dep.m file are ZAM codes. The last two codes are
+        # for the lost and total data.
+        positions = Materialflow.nuclide_index.zam_positions(
+            results['zai'][:-2])
         depleted_materials = {}
-        for material_name, material in results.materials.items():
-            if material_name != 'total':
-                nuclide_names = list(map(self.nuclide_code_to_name, material.zai[:-2]))
-                comp = dict(zip(nuclide_names, material.mdens[:-2, moment]))
-                volume = material.volume[moment]
-                density = material.mdens[-1, moment]
-                depleted_materials[material_name] = Materialflow(comp=comp,
-                                                                 comp_is_density=True,
-                                                                 density=density,
-                                                                 volume=volume,
-                                                                 burnup=results.burnup[moment])
+        for material_name, material in results['materials'].items():
+            volume = material['volume'][moment]
+            density = material['mdens'][-1, moment]
+            depleted_materials[material_name] = Materialflow.from_arrays(
+                positions,
+                material['mdens'][:-2, moment],
+                comp_is_density=True,
+                density=density,
+                volume=volume,
+                burnup=results['burnup'][moment])
         return depleted_materials
 
+    def _read_depletion_output(self):
+        """Returns the parsed `*_dep.m` file of the depletion step."""
+        return self._read_output_file("_dep.m", _read_dep_file)
+
+    def _read_output_file(self, suffix, read):
+        """Returns ``read(path)`` for a Serpent2 output file of the depletion
+        step.
+
+        Each output file is read once per depletion step. The contents are
+        keyed by the path, modification time, and size of the file, so they
+        are replaced when the next depletion step writes a new file.
+
+        Parameters
+        ----------
+        suffix : str
+            Suffix of the output file after :attr:`runtime_inputfile`.
+        read : callable
+            Function that reads the output file.
+
+        """
+        path = self.runtime_inputfile + suffix
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        cached_key, contents = self._output_files.get(suffix, (None, None))
+        if key != cached_key:
+            # Drop the previous step's contents before reading the new ones
+            self._output_files.pop(suffix, None)
+            contents = read(path)
+            self._output_files[suffix] = (key, contents)
+        return contents
+
+    def _read_res_file(self):
+        """Returns the parsed Serpent2 `*_res.m` file of the depletion step,
+        shared by :meth:`read_depcode_metadata`, :meth:`read_step_metadata`,
+        and :meth:`read_neutronics_parameters`."""
+        return self._read_output_file("_res.m", serpentTools.read)
+
     def read_depcode_metadata(self):
         """Reads Serpent2 metadata and stores it in the
         :class:`SerpentDepcode` object's :attr:`depcode_metadata` attribute.
         """
 
-        res = serpentTools.read(self.runtime_inputfile + "_res.m")
+        res = self._read_res_file()
         depcode_name, depcode_ver = res.metadata['version'].split()
         self.depcode_metadata['depcode_name'] = depcode_name
         self.depcode_metadata['depcode_version'] = depcode_ver
@@ -414,7 +671,7 @@ class SerpentDepcode(Depcode):
         """Reads Serpent2 depletion step metadata and stores it in the
         :class:`SerpentDepcode` object's :attr:`step_metadata` attribute.
         """
-        res = serpentTools.read(self.runtime_inputfile + "_res.m")
+        res = self._read_res_file()
         self.step_metadata['OMP_threads'] = res.metadata['ompThreads']
         self.step_metadata['MPI_tasks'] = res.metadata['mpiTasks']
         self.step_metadata['memory_optimization_mode'] = res.metadata['optimizationMode']
@@ -428,7 +685,7 @@ class SerpentDepcode(Depcode):
         in :class:`SerpentDepcode` object's :attr:`neutronics_parameters`
         attribute.
         """
-        res = serpentTools.read(self.runtime_inputfile + "_res.m")
+        res = self._read_res_file()
         self.neutronics_parameters['keff_bds'] = res.resdata['impKeff'][0]
         self.neutronics_parameters['keff_eds'] = res.resdata['impKeff'][1]
         self.neutronics_parameters['breeding_ratio_bds'] = \
@@ -519,7 +776,124 @@ i       Parameters
 
         args = args + [self.runtime_inputfile]
 
-        super().run_depletion_step(mpi_args, args)
+        if self.persistent_session:
+            self._run_session_step(args)
+        else:
+            super().run_depletion_step(mpi_args, args)
+
+    def _run_session_step(self, args):
+        """Runs a depletion step in the resident Serpent2 process, starting
+        the process if needed.
+
+        Parameters
+        ----------
+        args : list of str
+            Arguments for running Serpent2.
+
+        """
+        print('Running %s' % (self.codename))
+        power_card = [line for line in
+                      self.read_plaintext_file(self.runtime_inputfile)
+                      if line.startswith('set    power   ')][0]
+        # Serpent2 only reads the power and depletion step at startup
+        if power_card != self._session_power_card:
+            self.close_session()
+
+        if self._session is None:
+            for comfile in (_COMFILE_IN_NAME, _COMFILE_OUT_NAME):
+                (Path(self.output_path) / comfile).unlink(missing_ok=True)
+            self._session = subprocess.Popen(
+                args,
+                cwd=self.output_path,
+                stdout=None,
+                stderr=subprocess.STDOUT)
+            self._session_power_card = power_card
+            self._session_days = None
+        else:
+            self._send_session_signal(signal.SIGUSR2)
+        self._wait_for_session_signal()
+        self._check_session_progress()
+        print(f'Finished {self.codename.upper()} Run')
+
+    def _check_session_progress(self):
+        """Checks that the resident Serpent2 process depleted the materials
+        over a new interval, instead of repeating the previous one."""
+        days = self._read_depletion_output()['days'][-1]
+        if self._session_days is not None and days <= self._session_days:
+            self.close_session()
+            raise RuntimeError(
+                f'{self.codename} did not advance the depletion time past '
+                f'{days} days. The resident {self.codename} executable must '
+                'reload the material file and run the next depletion '
+                'interval on SIGUSR2, which stock Serpent2 does not do. '
+                'Disable persistent_session for this executable.')
+        self._session_days = days
+
+    def _send_session_signal(self, sig):
+        """Writes a signal to the resident Serpent2 process' input
+        communication file."""
+        comfile_in = Path(self.output_path) / _COMFILE_IN_NAME
+        tmp_file = comfile_in.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
+            f.write(f'{int(sig)}\n')
+        os.replace(tmp_file, comfile_in)
+
+    def _wait_for_session_signal(self):
+        """Waits until the resident Serpent2 process signals that the
+        current depletion interval is finished."""
+        comfile_out = Path(self.output_path) / _COMFILE_OUT_NAME
+        while True:
+            if comfile_out.exists():
+                sig = comfile_out.read_text().strip()
+                if sig:
+                    comfile_out.unlink()
+                    return int(sig)
+            if self._session.poll() is not None:
+                self._session = None
+                self._session_power_card = None
+                raise RuntimeError('\n %s RUN FAILED\n see error message above'
+                                   % (self.codename))
+            time.sleep(0.1)
+
+    def close_session(self):
+        """Ends the resident Serpent2 process, if it is running."""
+        if self._session is None:
+            return
+        process = self._session
+        self._session = None
+        self._session_power_card = None
+        self._session_days = None
+        if process.poll() is None:
+            self._send_session_signal(signal.SIGTERM)
+            try:
+                process.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    def set_comfile(self, file_lines):
+        """Declare the coupled calculation communication files used by a
+        resident Serpent2 process.
+
+        Parameters
+        ----------
+        file_lines : list of str
+            Serpent2 runtime input file.
+
+        Returns
+        -------
+        file_lines : list of str
+            Serpent2 runtime input file with a ``set comfile`` card.
+
+        """
+        if any(line.startswith('set comfile') for line in file_lines):
+            return file_lines
+        comfile_in = (Path(self.output_path) / _COMFILE_IN_NAME).resolve()
+        comfile_out = (Path(self.output_path) / _COMFILE_OUT_NAME).resolve()
+        if file_lines and not file_lines[-1].endswith('\n'):
+            file_lines[-1] += '\n'
+        file_lines.append(f'set comfile \"{comfile_in}\" \"{comfile_out}\"\n')
+        return file_lines
 
     def switch_to_next_geometry(self):
         """Inserts line with path to next Serpent geometry file at the
@@ -544,6 +918,8 @@ i       Parameters
 
         with open(self.runtime_inputfile, 'w') as f:
             f.writelines(new_lines)
+        # The resident Serpent2 process holds the old geometry in memory
+        self.close_session()
 
     def write_runtime_input(self, reactor, dep_step, restart):
         """Write Serpent2 runtime input file for running depletion step
@@ -570,6 +946,8 @@ i       Parameters
 
         self.get_neutron_settings(lines)
         lines = self.set_power_load(lines, reactor, dep_step)
+        if self.persistent_session:
+            lines = self.set_comfile(lines)
 
         with open(self.runtime_inputfile, 'w') as out_file:
             out_file.writelines(lines)
@@ -594,7 +972,8 @@ i       Parameters
         with open(self.runtime_matfile, 'w') as f:
             f.write('%% Material compositions (after %f days)\n\n'
                     % dep_end_time)
-            nuc_code_map = self.map_nuclide_name_to_serpent_name()
+            nuc_code_map = self.get_nuclide_code_map(
+                nuc for mat in mats.values() for nuc in mat.comp)
             if not(hasattr(self, '_burnable_material_card_data')):
                 lines = self.read_plaintext_file(self.template_input_file_path)
                 _, abs_src_matfile = self._get_burnable_materials_file(lines)
@@ -1,7 +1,92 @@
 import numpy as np
 import tables as tb
 import os
+import atexit
+import queue
+import threading
+import time
+import warnings
 from collections import OrderedDict
+from contextlib import contextmanager
+
+from saltproc import Materialflow
+
+# Size [bytes] of the blocks used to copy composition arrays
+_COPY_BUFFER_SIZE = 64 * 1024 ** 2
+# Chunk shape (steps, nuclides) of nuclide-major composition arrays
+_NUCLIDE_MAJOR_CHUNKSHAPE = (512, 16)
+# Initial and maximum time [s] between attempts to open a live results
+# database locked by a reader
+_LOCK_RETRY_INTERVAL = 0.1
+_LOCK_MAX_RETRY_INTERVAL = 5.0
+# Time [s] after which waiting for a reader to release the database is
+# reported
+_LOCK_WARNING_TIME = 60.0
+
+
+def _is_lock_error(error):
+    """Returns `True` if `error` was raised because another process holds
+    the HDF5 file lock."""
+    return 'unable to lock file' in str(error)
+
+
+class _DatabaseWriter():
+    """Executes database write requests in a background thread, in the
+    order they were submitted.
+
+    If a write request fails, the remaining requests are skipped and the
+    error is raised by the next call to :meth:`submit` or :meth:`flush`.
+
+    """
+
+    def __init__(self):
+        self._requests = queue.Queue()
+        self._error = None
+        self._thread = threading.Thread(target=self._run,
+                                        name='saltproc-database-writer',
+                                        daemon=True)
+        self._thread.start()
+        # Make sure queued data reaches the database if SaltProc exits
+        atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            try:
+                if request is None:
+                    return
+                if self._error is None:
+                    write_function, args = request
+                    write_function(*args)
+            except BaseException as error:
+                self._error = error
+            finally:
+                self._requests.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError('Writing to the database failed') \
+                from self._error
+
+    def submit(self, write_function, *args):
+        """Queue ``write_function(*args)`` for execution. Raises the error
+        of a failed write request, since the request would be skipped."""
+        if not self._thread.is_alive():
+            raise RuntimeError('The database writer is closed')
+        self._raise_error()
+        self._requests.put((write_function, args))
+
+    def flush(self):
+        """Block until all queued write requests are finished."""
+        self._requests.join()
+        self._raise_error()
+
+    def close(self):
+        """Finish the queued write requests and stop the thread."""
+        if self._thread.is_alive():
+            self._requests.put(None)
+            self._thread.join()
+        atexit.unregister(self.close)
 
 
 class Simulation():
@@ -35,9 +120,76 @@ class Simulation():
         drops below 1.0
     compression_params : Pytables filter object
         Compression parameters for HDF5 database.
+    async_storage : bool, optional
+        If `True`, database writes are executed by a background thread so
+        that they overlap with the next depletion step. The data to write
+        is copied when a `store_*` method is called. Use :meth:`flush` to
+        wait until everything has been written. If a write fails, the error
+        is raised by the next `store_*` call, :meth:`end_step`, or
+        :meth:`flush`. :meth:`end_step` queues the end of step flush
+        without waiting for it, so the writes of a depletion step overlap
+        with the next depletion step.
+    durability : {'close', 'step', 'fsync'}, optional
+        Controls when data written during a database session reaches the
+        disk. ``close`` flushes the HDF5 buffers only when the session is
+        closed, ``step`` also flushes them at the end of every depletion
+        step, and ``fsync`` additionally asks the operating system to write
+        the file to disk at the end of every depletion step.
+    nuclide_axis : {'dynamic', 'fixed'}, optional
+        Storage layout of the nuclide axis of the composition arrays.
+        ``dynamic`` arrays hold exactly the nuclides stored so far, and are
+        rewritten when a new nuclide appears. ``fixed`` arrays are created
+        with a column for every nuclide the depletion code can track (see
+        :meth:`Depcode.get_depletion_nuclides`), plus `nuclide_headroom`
+        empty columns, and new nuclides are assigned to empty columns. A
+        `RuntimeError` is raised when data is stored if the depletion code
+        cannot list its nuclides.
+        Existing databases keep the layout they were created with.
+    nuclide_headroom : int, optional
+        Number of empty columns reserved for new nuclides in ``fixed``
+        composition arrays.
+    chunk_layout : {'step', 'nuclide'}, optional
+        Chunk layout of the composition arrays. ``step`` chunks hold a few
+        complete depletion steps, which suits reading whole compositions.
+        ``nuclide`` chunks hold up to 512 depletion steps of 16 nuclides,
+        so reading the history of a single nuclide only touches a few
+        chunks.
+    sparse_streams : bool, optional
+        If `True`, waste and feed stream compositions are stored in
+        compressed sparse row format: the ``indptr`` array holds the offset
+        of each depletion step in the ``indices`` and ``values`` arrays,
+        which hold the nuclide map index and mass of the nonzero entries.
+        Streams without a composition get an empty row. Existing streams
+        keep the format they were created with.
+    live_results : bool, optional
+        If `True`, the database can be read by :class:`saltproc.Results`
+        with ``live=True`` while the simulation is running. At the end of
+        every depletion step, the number of completed depletion steps is
+        written to the ``committed_steps`` root attribute and the database
+        is closed, so readers can open it during the next depletion step.
+    live_results_timeout : float, optional
+        Maximum time [s] to wait for readers to release a live results
+        database before the simulation fails with a `TimeoutError`.
+
+    Notes
+    -----
+    Using a `Simulation` object as a context manager opens a database
+    session: the database is opened once, node references are cached, and
+    the file stays open until the session is closed. Outside of a session
+    the database is opened and closed by every read and write.
+
+    The state the depletion step loop depends on (the cumulative depletion
+    time, the :math:`k_\\text{eff}` history, the storage layout version,
+    and the nuclide map of every composition array) is kept in memory. It
+    is read from the database once, when the database is first used, so
+    the database is only written to during a run.
 
     """
 
+    DURABILITY_POLICIES = ('close', 'step', 'fsync')
+    NUCLIDE_AXIS_LAYOUTS = {'dynamic': 1, 'fixed': 2}
+    CHUNK_LAYOUTS = ('step', 'nuclide')
+
     def __init__(
             self,
             sim_name="default",
@@ -48,6 +200,14 @@ class Simulation():
             compression_params=tb.Filters(complevel=9,
                                           complib='blosc',
                                           fletcher32=True),
+            async_storage=False,
+            durability='step',
+            nuclide_axis='dynamic',
+            nuclide_headroom=64,
+            chunk_layout='step',
+            sparse_streams=False,
+            live_results=False,
+            live_results_timeout=600.0
     ):
         """Initializes the Simulation object.
 
@@ -61,6 +221,220 @@ class Simulation():
         self.compression_params = compression_params
         self.nuclide_indices_dtype = np.dtype([('nuclide', 'S9'),
                                           ('index', int)])
+        self.async_storage = async_storage
+        if async_storage:
+            self._writer = _DatabaseWriter()
+        else:
+            self._writer = None
+        if durability not in self.DURABILITY_POLICIES:
+            raise ValueError(f'{durability} is not a valid durability '
+                             'policy. Valid options are: '
+                             f'{", ".join(self.DURABILITY_POLICIES)}')
+        self.durability = durability
+        if nuclide_axis not in self.NUCLIDE_AXIS_LAYOUTS:
+            raise ValueError(f'{nuclide_axis} is not a valid nuclide axis '
+                             'layout. Valid options are: '
+                             f'{", ".join(self.NUCLIDE_AXIS_LAYOUTS)}')
+        self.nuclide_axis = nuclide_axis
+        self.nuclide_headroom = nuclide_headroom
+        if chunk_layout not in self.CHUNK_LAYOUTS:
+            raise ValueError(f'{chunk_layout} is not a valid chunk layout. '
+                             'Valid options are: '
+                             f'{", ".join(self.CHUNK_LAYOUTS)}')
+        self.chunk_layout = chunk_layout
+        self.sparse_streams = sparse_streams
+        self.live_results = live_results
+        self.live_results_timeout = live_results_timeout
+        self._depletion_nuclides = None
+        self._session = False
+        self._db = None
+        self._nodes = {}
+        # In-memory run state, see _load_run_state()
+        self._run_state_key = None
+        self._burn_time = 0.0
+        self._keff_eds = []
+        self._db_layout_version = None
+        self._columns = {}
+
+    def __enter__(self):
+        self.open_database()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close_database()
+
+    def open_database(self):
+        """Start a database session. The database is opened by the first
+        read or write, and stays open until :meth:`close_database` is
+        called."""
+        self._session = True
+
+    def close_database(self):
+        """Wait for pending writes, then close the database session."""
+        try:
+            self.flush()
+        finally:
+            self._session = False
+            self._close_db()
+
+    def _close_db(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        self._nodes.clear()
+
+    @contextmanager
+    def _database(self, mode='a'):
+        """Returns the handle of the database session, or opens the
+        database in `mode` for the duration of the ``with`` block if there
+        is no session."""
+        if self._session:
+            if self._db is None:
+                self._db = self._open_db('a')
+            yield self._db
+        else:
+            self._db = self._open_db(mode)
+            try:
+                yield self._db
+            finally:
+                self._close_db()
+
+    def _open_db(self, mode):
+        """Opens the database in `mode`. With `live_results`, the database
+        may be locked by a reader. Opening it is then retried with
+        increasing intervals until the reader releases it, a warning is
+        issued once the wait exceeds ``_LOCK_WARNING_TIME``, and a
+        `TimeoutError` is raised once it exceeds `live_results_timeout`.
+        Other errors are raised immediately."""
+        start = time.monotonic()
+        retry_interval = _LOCK_RETRY_INTERVAL
+        warned = False
+        while True:
+            try:
+                return tb.open_file(self.db_path,
+                                    mode=mode,
+                                    filters=self.compression_params)
+            except tb.exceptions.HDF5ExtError as error:
+                if not self.live_results or not _is_lock_error(error):
+                    raise
+                waited = time.monotonic() - start
+                if waited >= self.live_results_timeout:
+                    raise TimeoutError(
+                        f'{self.db_path} was locked by a reader for more '
+                        f'than {self.live_results_timeout:g} s') from error
+            if not warned and waited >= _LOCK_WARNING_TIME:
+                warnings.warn(f'{self.db_path} has been locked by a reader '
+                              f'for {waited:.0f} s. Waiting until the '
+                              'reader closes it.')
+                warned = True
+            time.sleep(min(retry_interval,
+                           self.live_results_timeout - waited))
+            retry_interval = min(2 * retry_interval, _LOCK_MAX_RETRY_INTERVAL)
+
+    def _get_node(self, db, path):
+        """Returns the node at `path` using the node cache, or `None` if
+        the node does not exist."""
+        node = self._nodes.get(path)
+        if node is None and path in db:
+            node = db.get_node(path)
+            self._nodes[path] = node
+        return node
+
+    def _require_group(self, db, where, name, title=''):
+        """Returns the group `name` in `where`, creating it if it does not
+        exist."""
+        path = where.rstrip('/') + '/' + name
+        group = self._get_node(db, path)
+        if group is None:
+            group = db.create_group(where, name, title)
+            self._nodes[path] = group
+        return group
+
+    def end_step(self, wait=False):
+        """Mark the end of a depletion step, flushing the database session
+        according to :attr:`durability`, and committing the step for live
+        readers if `live_results` is enabled. With `async_storage`, the
+        flush is done by the background writer.
+
+        Parameters
+        ----------
+        wait : bool, optional
+            If `True`, return once the depletion step is written to the
+            database. Otherwise, the background writer finishes the step
+            while the next depletion step runs, and the writes are waited
+            for by the next read of the database, :meth:`flush`, or
+            :meth:`close_database`.
+
+        """
+        if self.durability != 'close' or self.live_results:
+            self._submit(self._sync_database)
+        if wait:
+            self.flush()
+
+    def _sync_database(self):
+        if self.live_results:
+            with self._database() as db:
+                if '/simulation_parameters' in db:
+                    db.root._v_attrs.committed_steps = \
+                        db.root.simulation_parameters.nrows
+        if self._db is None:
+            return
+        self._db.flush()
+        if self.durability == 'fsync':
+            os.fsync(self._db.fileno())
+        if self.live_results:
+            # Release the file lock until the next write
+            self._close_db()
+
+    def _submit(self, write_function, *args):
+        """Execute ``write_function(*args)`` now, or queue it in the
+        background database writer if `async_storage` is enabled."""
+        if self._writer is None:
+            write_function(*args)
+        else:
+            self._writer.submit(write_function, *args)
+
+    def flush(self):
+        """Wait until all data passed to the `store_*` methods has been
+        written to the database. Does nothing if `async_storage` is not
+        enabled."""
+        if self._writer is not None:
+            self._writer.flush()
+
+    def _database_key(self):
+        """Identifies the database file, so the run state is reloaded if
+        the file is replaced."""
+        try:
+            return self.db_path, os.stat(self.db_path).st_ino
+        except OSError:
+            return self.db_path, None
+
+    def _load_run_state(self):
+        """Load the in-memory run state from the database, unless it was
+        already loaded for the file at :attr:`db_path`.
+
+        The run state is the cumulative depletion time, the
+        :math:`k_\\text{eff}` history, the storage layout version, and the
+        nuclide map of every composition array. Nuclide maps are loaded
+        for each array the first time it is written to.
+
+        """
+        if self._run_state_key == self._database_key():
+            return
+        self.flush()
+        self._run_state_key = self._database_key()
+        self._burn_time = 0.0
+        self._keff_eds = []
+        self._db_layout_version = None
+        self._columns = {}
+        if not os.path.exists(self.db_path):
+            return
+        with self._database('r') as db:
+            step_info_table = self._get_node(db, '/simulation_parameters')
+            if step_info_table is not None and step_info_table.nrows > 0:
+                self._burn_time = float(
+                    step_info_table.col('cumulative_time_at_eds')[-1])
+                self._keff_eds = step_info_table.col('keff_eds')[:, 0].tolist()
 
     def check_restart(self):
         """If the user set `restart_flag`
@@ -79,6 +453,9 @@ class Simulation():
         """
         if not self.restart_flag:
             failed_step = 0
+            self.flush()
+            self._close_db()
+            self._run_state_key = None
             try:
                 os.remove(self.db_path)
                 os.remove(self.sim_depcode.runtime_matfile)
@@ -90,12 +467,10 @@ class Simulation():
                 print("Previous run output files were deleted.")
             except OSError as e:
                 pass
+            self._load_run_state()
         else:
-            db = tb.open_file(
-                self.db_path,
-                mode='r')
-            failed_step = len(db.root.simulation_parameters.col('keff_eds'))
-            db.close()
+            self._load_run_state()
+            failed_step = len(self._keff_eds)
         return failed_step
 
 
@@ -122,62 +497,342 @@ class Simulation():
 
         """
         if waste_dict is not None:
-            streams_description = 'in_out_streams'
-            db = tb.open_file(
-                self.db_path,
-                mode='a',
-                filters=self.compression_params)
+            self._load_run_state()
+            self._read_depletion_nuclides()
+            streams = {}
             for material_name in waste_dict.keys():  # iterate over materials
-                mat_node = getattr(db.root.materials, material_name)
-                if not hasattr(mat_node, streams_description):
-                    waste_group = db.create_group(
-                        mat_node,
-                        streams_description,
-                        'Waste stream compositions for each process')
-                else:
-                    waste_group = getattr(mat_node, streams_description)
+                streams[material_name] = {}
                 for proc in waste_dict[material_name].keys():
-                    if not hasattr(waste_group, proc):
-                        proc_node = db.create_group(waste_group, proc)
-                    else:
-                        proc_node = getattr(waste_group, proc)
-                    nuclide_indices = []
-                    iso_wt_frac = []
-                    coun = 0
-                    if hasattr(waste_dict[material_name][proc], 'comp'):
+                    stream = waste_dict[material_name][proc]
+                    if stream.comp:
                         # Read isotopes from Materialflow
-                        for nuc, wt_frac in waste_dict[material_name][proc].comp.items():
-                            # Dictonary in format {isotope_name : index(int)}
-                            nuclide_indices.append((nuc, coun))
-                            # Convert wt% to absolute [user units]
-                            iso_wt_frac.append(wt_frac * waste_dict[material_name][proc].mass)
-                            coun += 1
-                        # Try to open EArray and table and if not exist - create
-                        nuclide_indices_array = np.array(nuclide_indices, dtype=self.nuclide_indices_dtype)
-                        if hasattr(proc_node, 'comp'):
-                            earr = db.get_node(proc_node, 'comp')
-                        else:
-                            earr = db.create_earray(
-                                proc_node,
-                                'comp',
-                                atom=tb.Float64Atom(),
-                                shape=(0, len(nuclide_indices_array)),
-                                title="Isotopic composition for %s" % proc)
-                            # Save isotope indexes map and units in EArray attributes
-                            earr.flavor = 'python'
-                        if not hasattr(proc_node, 'nuclide_map'):
-                            db.create_table(proc_node,
-                                           'nuclide_map',
-                                            description=nuclide_indices_array)
-
-                        earr, iso_wt_frac = self._fix_nuclide_discrepancy(db, earr, nuclide_indices, iso_wt_frac)
-
-                        earr.append(np.asarray([iso_wt_frac], dtype=np.float64))
-                        del iso_wt_frac, nuclide_indices
-            db.close()
+                        # Dictonary in format {isotope_name : index(int)}
+                        nuclide_indices = [
+                            (nuc, coun) for coun, nuc in enumerate(stream.comp.keys())]
+                        # Convert wt% to absolute [user units]
+                        iso_wt_frac = [
+                            wt_frac * stream.mass for wt_frac in stream.comp.values()]
+                        streams[material_name][proc] = (nuclide_indices, iso_wt_frac)
+                    else:
+                        streams[material_name][proc] = None
+            self._submit(self._write_streams, streams)
         # Also save materials AFTER reprocessing and refill here
         self.store_mat_data(after_mats, dep_step, True)
 
+    def _write_streams(self, streams):
+        """Write waste and feed stream compositions to the database.
+
+        Parameters
+        ----------
+        streams : dict of str to dict
+            Material names are keys, and dictionaries mapping stream names
+            to ``(nuclide_indices, iso_wt_frac)`` tuples, or `None` for
+            streams without a composition, are values.
+
+        """
+        streams_description = 'in_out_streams'
+        with self._database() as db:
+            layout_version = self._layout_version(db)
+            for material_name in streams.keys():  # iterate over materials
+                waste_group = self._require_group(
+                    db,
+                    '/materials/' + material_name,
+                    streams_description,
+                    'Waste stream compositions for each process')
+                waste_path = waste_group._v_pathname
+                for proc in streams[material_name].keys():
+                    proc_node = self._require_group(db, waste_path, proc)
+                    proc_path = proc_node._v_pathname
+                    if self._is_sparse_stream(db, proc_path):
+                        self._append_sparse_comp(db,
+                                                 proc_path,
+                                                 streams[material_name][proc])
+                    elif streams[material_name][proc] is not None:
+                        nuclide_indices, iso_wt_frac = \
+                            streams[material_name][proc]
+                        # Try to open EArray and table and if not exist - create
+                        earr = self._get_node(db, proc_path + '/comp')
+                        if earr is None:
+                            earr = self._create_comp(
+                                db,
+                                proc_path,
+                                "Isotopic composition for %s" % proc,
+                                nuclide_indices,
+                                layout_version)
+
+                        self._append_comp(db, earr, nuclide_indices,
+                                          iso_wt_frac, layout_version)
+                        del iso_wt_frac, nuclide_indices
+
+    def _is_sparse_stream(self, db, where):
+        """Returns `True` if the stream composition in `where` is, or will
+        be, stored in compressed sparse row format."""
+        if self._get_node(db, where + '/indptr') is not None:
+            return True
+        elif self._get_node(db, where + '/comp') is not None:
+            return False
+        return self.sparse_streams
+
+    def _append_sparse_comp(self, db, where, stream):
+        """Append a stream composition in compressed sparse row format.
+
+        Parameters
+        ----------
+        db : tables.File
+            The SaltProc results database
+        where : str
+            Path of the stream group.
+        stream : tuple or None
+            ``(nuclide_indices, iso_wt_frac)`` tuple, or `None` for a stream
+            without a composition.
+
+        """
+        indptr = self._get_node(db, where + '/indptr')
+        if indptr is None:
+            self._nodes[where + '/nuclide_map'] = db.create_table(
+                where,
+                'nuclide_map',
+                description=np.empty(0, dtype=self.nuclide_indices_dtype))
+            for name, atom, title in (
+                    ('indices', tb.Int32Atom(), 'Nuclide map index'),
+                    ('values', tb.Float64Atom(), 'Nuclide mass'),
+                    ('indptr', tb.Int64Atom(), 'Depletion step offsets')):
+                self._nodes[where + '/' + name] = db.create_earray(
+                    where, name, atom=atom, shape=(0,), title=title)
+            indptr = self._get_node(db, where + '/indptr')
+            indptr.append(np.zeros(1, dtype=np.int64))
+        values = self._get_node(db, where + '/values')
+        if stream is not None:
+            nuclide_indices, iso_wt_frac = stream
+            step_values = np.asarray(iso_wt_frac, dtype=np.float64)[
+                [idx for _, idx in nuclide_indices]]
+            nonzero = np.flatnonzero(step_values)
+            columns, _ = self._nuclide_columns(
+                db, where, [nuclide_indices[i][0] for i in nonzero])
+            self._get_node(db, where + '/indices').append(
+                np.asarray(columns, dtype=np.int32))
+            values.append(step_values[nonzero])
+        indptr.append(np.array([len(values)], dtype=np.int64))
+
+    def _layout_version(self, db):
+        """Returns the storage layout version of the database. New databases
+        get the version of the :attr:`nuclide_axis` layout."""
+        if self._db_layout_version is None:
+            self._db_layout_version = self._read_layout_version(db)
+        return self._db_layout_version
+
+    def _read_layout_version(self, db):
+        attrs = db.root._v_attrs
+        if 'layout_version' not in attrs:
+            if '/materials' in db:
+                # Databases written before the layout version was recorded
+                attrs.layout_version = 1
+            else:
+                attrs.layout_version = \
+                    self.NUCLIDE_AXIS_LAYOUTS[self.nuclide_axis]
+        return int(attrs.layout_version)
+
+    def _comp_chunkshape(self, n_columns):
+        """Returns the chunk shape of a composition EArray with
+        `n_columns` columns, or `None` to let PyTables choose one."""
+        if self.chunk_layout == 'step':
+            return None
+        n_steps, n_nuclides = _NUCLIDE_MAJOR_CHUNKSHAPE
+        return (n_steps, max(1, min(n_nuclides, n_columns)))
+
+    def _create_comp(self, db, where, title, nuclide_indices, layout_version):
+        """Create the composition EArray and nuclide map table of a material
+        or stream.
+
+        Parameters
+        ----------
+        db : tables.File
+            The SaltProc results database
+        where : str
+            Path of the group to create the nodes in.
+        title : str
+            Title of the composition EArray.
+        nuclide_indices : list of tuple
+            ``(nuclide_name, index)`` pairs of the first composition to
+            store.
+        layout_version : int
+            Storage layout version of the database.
+
+        Returns
+        -------
+        earr : tables.EArray
+            Array storing nuclide material mass compositions.
+
+        """
+        nuclides = [nuc for nuc, _ in nuclide_indices]
+        n_columns = len(nuclides)
+        if layout_version > 1:
+            # Reserve a column for every nuclide we expect to see
+            nuclides = list(dict.fromkeys(
+                (self._depletion_nuclides or []) + nuclides))
+            positions = Materialflow.nuclide_index.positions(nuclides)
+            positions = positions[
+                Materialflow.nuclide_index.zam_order(positions)]
+            nuclides = Materialflow.nuclide_index.names_at(positions)
+            n_columns = len(nuclides) + self.nuclide_headroom
+        earr = db.create_earray(
+            where,
+            'comp',
+            atom=tb.Float64Atom(),
+            shape=(0, n_columns),
+            title=title,
+            chunkshape=self._comp_chunkshape(n_columns))
+        # Save isotope indexes map and units in EArray attributes
+        earr.flavor = 'python'
+        nuclide_indices_array = np.array(
+            list(zip(nuclides, range(len(nuclides)))),
+            dtype=self.nuclide_indices_dtype)
+        self._nodes[where + '/comp'] = earr
+        self._nodes[where + '/nuclide_map'] = db.create_table(
+            where,
+            'nuclide_map',
+            description=nuclide_indices_array)
+        self._columns[where] = dict(zip(nuclides, range(len(nuclides))))
+        return earr
+
+    def _append_comp(self, db, earr, nuclide_indices, iso_wt_frac,
+                     layout_version):
+        """Append a composition to the composition EArray of a material or
+        stream.
+
+        Parameters
+        ----------
+        db : tables.File
+            The SaltProc results database
+        earr : tables.EArray
+            Array storing nuclide material mass compositions from previously
+            completed depletion steps
+        nuclide_indices : list of tuple
+            ``(nuclide_name, index)`` pairs mapping nuclides to their
+            position in `iso_wt_frac`.
+        iso_wt_frac : list of float
+            List storing nuclide material mass compositions for current
+            depletion step.
+        layout_version : int
+            Storage layout version of the database.
+
+        """
+        if layout_version == 1:
+            earr, iso_wt_frac = self._fix_nuclide_discrepancy(
+                db, earr, nuclide_indices, iso_wt_frac)
+            earr.append(np.asarray([iso_wt_frac], dtype=np.float64))
+            return
+
+        nuclides = [nuc for nuc, _ in nuclide_indices]
+        columns, n_columns = self._nuclide_columns(
+            db, earr._v_parent._v_pathname, nuclides)
+        if n_columns > earr.shape[1]:
+            # New nuclides are assigned to empty columns, and the array is
+            # only rewritten once the headroom is used up
+            earr = self._copy_comp(db,
+                                   earr,
+                                   n_columns + self.nuclide_headroom,
+                                   np.arange(earr.shape[1]))
+        row = np.zeros((1, earr.shape[1]))
+        row[0, columns] = \
+            np.asarray(iso_wt_frac)[[idx for _, idx in nuclide_indices]]
+        earr.append(row)
+
+    def _nuclide_columns(self, db, where, nuclides):
+        """Returns the array indices of nuclides in the nuclide map table in
+        `where`, appending the nuclides that are not in the table yet.
+
+        Parameters
+        ----------
+        db : tables.File
+            The SaltProc results database
+        where : str
+            Path of the group holding the nuclide map table.
+        nuclides : list of str
+            Nuclide names.
+
+        Returns
+        -------
+        columns : list of int
+            Array index of each nuclide.
+        n_columns : int
+            Number of nuclides in the nuclide map table.
+
+        """
+        columns = self._nuclide_map(db, where)
+        new_nuclides = [nuc for nuc in dict.fromkeys(nuclides)
+                        if nuc not in columns]
+        if new_nuclides:
+            new_indices = list(zip(
+                new_nuclides,
+                range(len(columns), len(columns) + len(new_nuclides))))
+            self._get_node(db, where + '/nuclide_map').append(
+                np.array(new_indices, dtype=self.nuclide_indices_dtype))
+            columns.update(new_indices)
+        return [columns[nuc] for nuc in nuclides], len(columns)
+
+    def _nuclide_map(self, db, where):
+        """Returns the in-memory map of nuclide name to array index of the
+        nuclide map table in `where`, reading the table the first time."""
+        columns = self._columns.get(where)
+        if columns is None:
+            nuclide_map = self._get_node(db, where + '/nuclide_map')
+            columns = dict(zip(map(bytes.decode, nuclide_map.col('nuclide')),
+                               nuclide_map.col('index').tolist()))
+            self._columns[where] = columns
+        return columns
+
+    def _copy_comp(self, db, earr, n_columns, columns):
+        """Copy a composition EArray into a new EArray with `n_columns`
+        columns, moving column ``i`` of `earr` to column ``columns[i]``.
+
+        The data is copied in blocks of at most ``_COPY_BUFFER_SIZE`` bytes,
+        so composition histories larger than the available memory can be
+        copied.
+
+        Parameters
+        ----------
+        db : tables.File
+            The SaltProc results database
+        earr : tables.EArray
+            Array storing nuclide material mass compositions.
+        n_columns : int
+            Number of columns of the new array.
+        columns : numpy.ndarray of int
+            New column of each column of `earr`.
+
+        Returns
+        -------
+        earr : tables.EArray
+            The new array, which replaces `earr` in the database.
+
+        """
+        parent_node = earr._v_parent
+        node_name = earr.name
+        new_earr = db.create_earray(
+            parent_node,
+            node_name + '_copy',
+            atom=tb.Float64Atom(),
+            shape=(0, n_columns),
+            title=earr.title,
+            chunkshape=self._comp_chunkshape(n_columns))
+        # Read blocks as numpy arrays; the original array is removed after
+        # the copy
+        earr.flavor = 'numpy'
+        n_rows = len(earr)
+        block_rows = max(1, _COPY_BUFFER_SIZE // (8 * n_columns))
+        block = np.zeros((min(block_rows, n_rows), n_columns))
+        for start in range(0, n_rows, block_rows):
+            stop = min(start + block_rows, n_rows)
+            block[:stop - start, columns] = earr.read(start, stop)
+            new_earr.append(block[:stop - start])
+        db.remove_node(earr)
+        db.rename_node(new_earr, node_name)
+        # Save isotope indexes map and units in EArray attributes
+        new_earr.flavor = 'python'
+        self._nodes[new_earr._v_pathname] = new_earr
+        return new_earr
+
     def _fix_nuclide_discrepancy(self, db, earr, nuclide_indices, iso_wt_frac):
         """Fix discrepancies between nuclide keys present in stored results and
         nuclides keys stored in results for the current depletion step
@@ -208,47 +863,44 @@ class Simulation():
         """
 
         parent_node = earr._v_parent
-        base_nucs = set(map(bytes.decode, parent_node.nuclide_map.col('nuclide')))
+        base_map = self._nuclide_map(db, parent_node._v_pathname)
+        base_nucs = set(base_map)
         iso_idx = dict(nuclide_indices)
         step_nucs = set(iso_idx.keys())
-        forward_difference = base_nucs.difference(step_nucs)
         backward_difference = step_nucs.difference(base_nucs)
 
-        if len(backward_difference) > 0 or len(forward_difference) > 0:
-            combined_nucs, combined_map, combined_earr, combined_step_arr = \
-                self._add_missing_nuclides(base_nucs, step_nucs, earr, iso_idx, iso_wt_frac)
-
-            node_name = earr.name
-            node_title = earr.title
-            parent_node = earr._v_parent
-            # We have to rewrite all the data because EArrays are only extensible in one dimension
-            db.remove_node(earr)
-            earr = db.create_earray(
-                        parent_node,
-                        node_name,
-                        atom=tb.Float64Atom(),
-                        shape=(0, len(combined_nucs)),
-                        title=node_title)
-            # Save isotope indexes map and units in EArray attributes
-            earr.flavor = 'python'
-            #earr.attrs.iso_map = combined_map
-            earr_len = len(combined_earr)
-            for i in range(earr_len):
-                earr.append(np.array([combined_earr[i]]))
+        if len(backward_difference) == 0:
+            # No new nuclides, so the stored compositions are kept as they
+            # are. The values are placed by nuclide name even if the nuclide
+            # sets are equal, since databases written by older versions
+            # order the columns differently.
+            combined_step_arr = np.zeros(earr.shape[1])
+            combined_step_arr[[base_map[nuc] for nuc in iso_idx]] = \
+                np.asarray(iso_wt_frac)[list(iso_idx.values())]
+        elif len(backward_difference) > 0:
+            combined_nucs, combined_map, base_columns, combined_step_arr = \
+                self._add_missing_nuclides(base_nucs, step_nucs, base_map,
+                                           iso_idx, iso_wt_frac)
+
+            # We have to rewrite all the data because EArrays are only
+            # extensible in one dimension
+            earr = self._copy_comp(db, earr, len(combined_nucs), base_columns)
 
             # Reform nuclide_map
             nuclide_indices = list(zip(combined_map.keys(), combined_map.values()))
             nuclide_indices_array = np.array(nuclide_indices, dtype=self.nuclide_indices_dtype)
-            db.remove_node(parent_node.nuclide_map)
-            db.create_table(parent_node,
-                            'nuclide_map',
-                            description=nuclide_indices_array)
-        else:
-            combined_step_arr = iso_wt_frac
+            nuclide_map_path = parent_node._v_pathname + '/nuclide_map'
+            db.remove_node(nuclide_map_path)
+            self._nodes[nuclide_map_path] = db.create_table(
+                parent_node,
+                'nuclide_map',
+                description=nuclide_indices_array)
+            self._columns[parent_node._v_pathname] = dict(combined_map)
 
         return earr, combined_step_arr
 
-    def _add_missing_nuclides(self, base_nucs, step_nucs, earr, iso_idx, iso_wt_frac):
+    def _add_missing_nuclides(self, base_nucs, step_nucs, base_map,
+                              iso_idx, iso_wt_frac):
         """Add missing nuclides to stored results and the results for the
         current depletion step
 
@@ -258,9 +910,9 @@ class Simulation():
             Nuclides present in previous depletion steps
         step_nucs : set
             Nuclides present in current depletion step
-        earr : tables.EArray
-            Array storing nuclide material mass compositions from previously
-            completed depletion steps
+        base_map : dict of str to int
+            Map of nuclide names to array index of the compositions from
+            previously completed depletion steps
         iso_idx : OrderedDict
             Map of nuclide name to array index
         iso_wt_frac : list of float
@@ -269,48 +921,35 @@ class Simulation():
 
         Returns
         -------
-        combined_nucs : numpy.ndarray
+        combined_nucs : list of str
             Nuclide-code sorted union of base_nucs and step_nucs
         combined_map : OrderedDict
             Map of nuclide names to array index
-        combined_earr : numpy.ndarray
-            Array storing nuclide material mass compositions from
-            previously completed depletion steps with additional
-            rows for nuclides introduces in iso_wt_frac
+        base_columns : numpy.ndarray of int
+            Array index in `combined_map` of each array index in
+            `nuclide_map`.
         combined_step_arr : numpy.ndarray
             Array storing nuclide material mass compositions for current
             depletion step with additional entries for nuclides not present
             in the current depletion step that are stored in earr.
         """
-        parent_node = earr._v_parent
-        _nuclides = list(map(bytes.decode, parent_node.nuclide_map.col('nuclide')))
-        _indices = parent_node.nuclide_map.col('index')
-        base_nuclide_map = dict(zip(_nuclides, _indices))
+        _nuclides = list(base_map.keys())
+        _indices = list(base_map.values())
         combined_nucs = list(base_nucs.union(step_nucs))
         # Sort the nucnames by ZAM
-        nuclide_codes = list(map(self.sim_depcode.name_to_nuclide_code, combined_nucs))
-        combined_nucs = [nucname for nuclide_code, nucname in sorted(zip(nuclide_codes,combined_nucs))]
+        combined_positions = Materialflow.nuclide_index.positions(combined_nucs)
+        combined_positions = combined_positions[
+            Materialflow.nuclide_index.zam_order(combined_positions)]
+        combined_nucs = Materialflow.nuclide_index.names_at(combined_positions)
 
         combined_values = np.arange(0, len(combined_nucs), 1).tolist()
         combined_map = OrderedDict(zip(combined_nucs,combined_values))
-        combined_earr = np.zeros((len(earr), len(combined_map)))
+        base_columns = np.zeros(len(_indices), dtype=int)
+        base_columns[_indices] = [combined_map[nuc] for nuc in _nuclides]
         combined_step_arr = np.zeros(len(combined_map))
-        earr_len = len(earr)
-        # not efficient, but can't come up with a better way right now
-        for nuc, idx in combined_map.items():
-            if nuc in base_nucs:
-                for i in range(earr_len):
-                    combined_earr[i,idx] = earr[i][base_nuclide_map[nuc]]
-                if nuc in step_nucs:
-                    combined_step_arr[idx] = iso_wt_frac[iso_idx[nuc]]
-                else:
-                    combined_step_arr[idx] = 0.0
-
-            elif nuc in step_nucs:
-                for i in range(earr_len):
-                    combined_earr[i,idx] = 0.0
-                combined_step_arr[idx] = iso_wt_frac[iso_idx[nuc]]
-        return combined_nucs, combined_map, combined_earr, combined_step_arr
+        combined_step_arr[[combined_map[nuc] for nuc in iso_idx]] = \
+            np.asarray(iso_wt_frac)[list(iso_idx.values())]
+        return combined_nucs, combined_map, base_columns, combined_step_arr
 
     def store_mat_data(self, mats, dep_step, store_at_end=False):
         """Initialize the HDF5/Pytables database (if it doesn't exist) or
@@ -335,6 +974,68 @@ class Simulation():
             depletion step. Otherwise, the function stores data from the
             beginning of the depletion step.
 
+        """
+        print(
+            '\nStoring material data for depletion step #%i.' %
+            (dep_step + 1))
+        self._load_run_state()
+        self._read_depletion_nuclides()
+        materials = {}
+        for key, value in mats.items():
+            # Order the nucnames by ZAM
+            order = value.nuclide_index.zam_order(value.positions)
+            ordered_nucs = value.nuclide_index.names_at(value.positions[order])
+            # Dictonary in format {isotope_name : index(int)}
+            nuclide_indices = [
+                (nuc, coun) for coun, nuc in enumerate(ordered_nucs)]
+            # Convert wt% to total mass [g]
+            iso_wt_frac = (value.fractions[order] * value.mass).tolist()
+            # Store information about material properties in new array row
+            mpar_row = (
+                value.mass,
+                value.get_density(),
+                value.volume,
+                value.mass_flowrate,
+                value.void_frac,
+                value.burnup
+            )
+            materials[key] = (nuclide_indices, iso_wt_frac, mpar_row)
+        self._submit(self._write_mat_data, materials, store_at_end)
+
+    def _read_depletion_nuclides(self):
+        """Read the nuclides the depletion code can track, which make up
+        the nuclide axis of ``fixed`` layout composition arrays.
+
+        Raises
+        ------
+        RuntimeError
+            If the depletion code cannot list the nuclides it tracks.
+
+        """
+        if self.nuclide_axis == 'fixed' and self._depletion_nuclides is None:
+            nuclides = self.sim_depcode.get_depletion_nuclides()
+            if nuclides is None:
+                raise RuntimeError(
+                    'The fixed nuclide axis requires the nuclides the '
+                    'depletion code can track, but '
+                    f'{type(self.sim_depcode).__name__} cannot list them. '
+                    "Use nuclide_axis='dynamic', or store data after the "
+                    'first depletion step has run.')
+            self._depletion_nuclides = list(nuclides)
+
+    def _write_mat_data(self, materials, store_at_end):
+        """Write burnable material compositions and properties to the
+        database.
+
+        Parameters
+        ----------
+        materials : dict of str to tuple
+            Material names are keys, and ``(nuclide_indices, iso_wt_frac,
+            mpar_row)`` tuples are values.
+        store_at_end : bool
+            If `True`, the data is from the end of the depletion step.
+            Otherwise, the data is from the beginning of the depletion step.
+
         """
         # Determine moment in depletion step from which to store data
         if store_at_end:
@@ -353,97 +1054,59 @@ class Simulation():
             ('burnup', float)
         ])
 
-        print(
-            '\nStoring material data for depletion step #%i.' %
-            (dep_step + 1))
-        db = tb.open_file(
-            self.db_path,
-            mode='a',
-            filters=self.compression_params)
-        if not hasattr(db.root, 'materials'):
-            comp_group = db.create_group('/',
-                                         'materials',
-                                         'Material data')
-        # Iterate over all materials
-        for key, value in mats.items():
-            nuclide_indices = []
-            iso_wt_frac = []
-            coun = 0
-            # Create group for each material
-            if not hasattr(db.root.materials, key):
-                db.create_group(comp_group,
-                                key)
-            # Create group for composition and parameters before reprocessing
-            mat_node = getattr(db.root.materials, key)
-            if not hasattr(mat_node, dep_step_str[0]):
-                db.create_group(mat_node,
-                                dep_step_str[0],
-                                'Material data {dep_step_str[1]} reprocessing')
-            comp_pfx = '/materials/' + str(key) + '/' + dep_step_str[0]
-            # Order the nucnames by ZAM
-            nuclide_codes = list(map(self.sim_depcode.name_to_nuclide_code, mats[key].comp.keys()))
-            ordered_nucs = [nucname for nuclide_code, nucname in sorted(zip(nuclide_codes,mats[key].comp.keys()))]
-            # Read isotopes from Materialflow for material
-            for nuc in ordered_nucs:
-                wt_frac = mats[key].comp[nuc]
-                # Dictonary in format {isotope_name : index(int)}
-                nuclide_indices.append((nuc, coun))
-                # Convert wt% to total mass [g]
-                iso_wt_frac.append(wt_frac * mats[key].mass)
-                coun += 1
-            nuclide_indices_array = np.array(nuclide_indices,
-                                             dtype=self.nuclide_indices_dtype)
-            # Store information about material properties in new array row
-            mpar_row = (
-                mats[key].mass,
-                mats[key].get_density(),
-                mats[key].volume,
-                mats[key].mass_flowrate,
-                mats[key].void_frac,
-                mats[key].burnup
-            )
-            mpar_array = np.array([mpar_row], dtype=mpar_dtype)
-            # Try to open EArray and table and if not exist - create new one
-            try:
-                earr = db.get_node(comp_pfx, 'comp')
-                print(str(earr.title) + ' array exist, appending data.')
-                mpar_table = db.get_node(comp_pfx, 'parameters')
-            except Exception:
-                print(
-                    'Material ' +
-                    key +
-                    ' array is not exist, making new one.')
-                earr = db.create_earray(
-                    comp_pfx,
-                    'comp',
-                    atom=tb.Float64Atom(),
-                    shape=(0, len(nuclide_indices_array)),
-                    title="Isotopic composition for %s" % key)
-                # Save isotope indexes map and units in EArray attributes
-                earr.flavor = 'python'
-                # Create table for material Parameters
-                print('Creating ' + key + ' lookup table.')
-                db.create_table(comp_pfx,
-                                'nuclide_map',
-                                description=nuclide_indices_array)
-                print('Creating ' + key + ' parameters table.')
-                mpar_table = db.create_table(
-                    comp_pfx,
-                    'parameters',
-                    np.empty(0, dtype=mpar_dtype),
-                    title="Material parameters data")
-            print('Dumping Material %s data %s to %s.' %
-                  (key, dep_step_str[0], os.path.abspath(self.db_path)))
-
-            earr, iso_wt_frac = self._fix_nuclide_discrepancy(db, earr, nuclide_indices, iso_wt_frac)
-
-            # Add row for the timestep to EArray and Material Parameters table
-            earr.append(np.array([iso_wt_frac], dtype=np.float64))
-            mpar_table.append(mpar_array)
-            del (iso_wt_frac)
-            del (mpar_array)
-            mpar_table.flush()
-        db.close()
+        with self._database() as db:
+            layout_version = self._layout_version(db)
+            self._require_group(db, '/', 'materials', 'Material data')
+            # Iterate over all materials
+            for key, (nuclide_indices, iso_wt_frac, mpar_row) in \
+                    materials.items():
+                # Create group for each material
+                self._require_group(db, '/materials', key)
+                # Create group for composition and parameters before
+                # reprocessing
+                self._require_group(
+                    db,
+                    '/materials/' + str(key),
+                    dep_step_str[0],
+                    'Material data {dep_step_str[1]} reprocessing')
+                comp_pfx = '/materials/' + str(key) + '/' + dep_step_str[0]
+                mpar_array = np.array([mpar_row], dtype=mpar_dtype)
+                # Try to open EArray and table and if not exist - create new
+                # one
+                earr = self._get_node(db, comp_pfx + '/comp')
+                if earr is not None:
+                    print(str(earr.title) + ' array exist, appending data.')
+                    mpar_table = self._get_node(db, comp_pfx + '/parameters')
+                else:
+                    print(
+                        'Material ' +
+                        key +
+                        ' array is not exist, making new one.')
+                    # Create table for material Parameters
+                    print('Creating ' + key + ' lookup table.')
+                    earr = self._create_comp(
+                        db,
+                        comp_pfx,
+                        "Isotopic composition for %s" % key,
+                        nuclide_indices,
+                        layout_version)
+                    print('Creating ' + key + ' parameters table.')
+                    mpar_table = db.create_table(
+                        comp_pfx,
+                        'parameters',
+                        np.empty(0, dtype=mpar_dtype),
+                        title="Material parameters data")
+                    self._nodes[comp_pfx + '/parameters'] = mpar_table
+                print('Dumping Material %s data %s to %s.' %
+                      (key, dep_step_str[0], os.path.abspath(self.db_path)))
+
+                # Add row for the timestep to EArray and Material Parameters
+                # table
+                self._append_comp(db, earr, nuclide_indices, iso_wt_frac,
+                                  layout_version)
+                mpar_table.append(mpar_array)
+                del (iso_wt_frac)
+                del (mpar_array)
 
     def store_step_neutronics_parameters(self):
         """Adds the following depletion code and SaltProc simulation
@@ -455,8 +1118,30 @@ class Simulation():
 
         # Read info from depcode _res.m File
         self.sim_depcode.read_neutronics_parameters()
+        neutronics_parameters = dict(self.sim_depcode.neutronics_parameters)
+        self._load_run_state()
+        self._burn_time += neutronics_parameters['burn_days']
+        self.burn_time = self._burn_time
+        # keff is stored in single precision
+        self._keff_eds.append(
+            float(np.float32(neutronics_parameters['keff_eds'][0])))
+        self._submit(self._write_step_neutronics_parameters,
+                     neutronics_parameters,
+                     self.burn_time)
+
+    def _write_step_neutronics_parameters(self, neutronics_parameters, burn_time):
+        """Write depletion step neutronics parameters to the database.
+
+        Parameters
+        ----------
+        neutronics_parameters : dict of str to type
+            Neutronics parameters read from the depletion code.
+        burn_time : float
+            Cumulative depletion time at the end of the depletion step.
+
+        """
         # Initialize beta groups number
-        b_g = len(self.sim_depcode.neutronics_parameters['beta_eff_bds'])
+        b_g = len(neutronics_parameters['beta_eff_bds'])
         # numpy array row storage for run info
 
         class Step_info(tb.IsDescription):
@@ -473,54 +1158,51 @@ class Simulation():
             fission_mass_bds = tb.Float32Col()
             fission_mass_eds = tb.Float32Col()
         # Open or restore db and append data to it
-        db = tb.open_file(
-            self.db_path,
-            mode='a',
-            filters=self.compression_params)
-        try:
-            step_info_table = db.get_node(
-                db.root,
-                'simulation_parameters')
-            # Read burn_time from previous step
-            self.burn_time = step_info_table.col('cumulative_time_at_eds')[-1]
-        except Exception:
-            step_info_table = db.create_table(
-                db.root,
-                'simulation_parameters',
-                Step_info,  # self.sim_depcode.Step_info,
-                "Simulation parameters after each timestep")
-            # Intializing burn_time array at the first depletion step
-            self.burn_time = 0.0
-        self.burn_time += self.sim_depcode.neutronics_parameters['burn_days']
-        # Define row of table as step_info
-        step_info = step_info_table.row
+        with self._database() as db:
+            step_info_table = self._get_node(db, '/simulation_parameters')
+            if step_info_table is None:
+                step_info_table = db.create_table(
+                    db.root,
+                    'simulation_parameters',
+                    Step_info,  # self.sim_depcode.Step_info,
+                    "Simulation parameters after each timestep")
+                self._nodes['/simulation_parameters'] = step_info_table
+            self._append_step_info(step_info_table,
+                                   neutronics_parameters,
+                                   burn_time)
+
+    def _append_step_info(self, step_info_table, neutronics_parameters,
+                          burn_time):
+        """Append a row of depletion step neutronics parameters to the
+        ``simulation_parameters`` table."""
+        # Define row of table as step_info. Rows are appended as arrays,
+        # because flushing a table flushes the whole database
+        step_info = np.zeros(1, dtype=step_info_table.dtype)
         # Define all values in the row
 
-        step_info['keff_bds'] = self.sim_depcode.neutronics_parameters['keff_bds']
-        step_info['keff_eds'] = self.sim_depcode.neutronics_parameters['keff_eds']
-        step_info['breeding_ratio_bds'] = self.sim_depcode.neutronics_parameters[
+        step_info['keff_bds'] = neutronics_parameters['keff_bds']
+        step_info['keff_eds'] = neutronics_parameters['keff_eds']
+        step_info['breeding_ratio_bds'] = neutronics_parameters[
             'breeding_ratio_bds']
-        step_info['breeding_ratio_eds'] = self.sim_depcode.neutronics_parameters[
+        step_info['breeding_ratio_eds'] = neutronics_parameters[
             'breeding_ratio_eds']
-        step_info['cumulative_time_at_eds'] = self.burn_time
-        step_info['power_level'] = self.sim_depcode.neutronics_parameters['power_level']
-        step_info['beta_eff_bds'] = self.sim_depcode.neutronics_parameters[
+        step_info['cumulative_time_at_eds'] = burn_time
+        step_info['power_level'] = neutronics_parameters['power_level']
+        step_info['beta_eff_bds'] = neutronics_parameters[
             'beta_eff_bds']
-        step_info['beta_eff_eds'] = self.sim_depcode.neutronics_parameters[
+        step_info['beta_eff_eds'] = neutronics_parameters[
             'beta_eff_eds']
-        step_info['delayed_neutrons_lambda_bds'] = self.sim_depcode.neutronics_parameters[
+        step_info['delayed_neutrons_lambda_bds'] = neutronics_parameters[
             'delayed_neutrons_lambda_bds']
-        step_info['delayed_neutrons_lambda_eds'] = self.sim_depcode.neutronics_parameters[
+        step_info['delayed_neutrons_lambda_eds'] = neutronics_parameters[
             'delayed_neutrons_lambda_eds']
-        step_info['fission_mass_bds'] = self.sim_depcode.neutronics_parameters[
+        step_info['fission_mass_bds'] = neutronics_parameters[
             'fission_mass_bds']
-        step_info['fission_mass_eds'] = self.sim_depcode.neutronics_parameters[
+        step_info['fission_mass_eds'] = neutronics_parameters[
             'fission_mass_eds']
 
         # Inject the Record value into the table
-        step_info.append()
-        step_info_table.flush()
-        db.close()
+        step_info_table.append(step_info)
 
     def store_depcode_metadata(self):
         """Adds the following depletion code and SaltProc simulation parameters
@@ -554,22 +1236,20 @@ class Simulation():
             self.sim_depcode.depcode_metadata['xs_data_path']
         )
         depcode_metadata_array = np.array([depcode_metadata_row], dtype=depcode_metadata_dtype)
+        self._submit(self._write_depcode_metadata, depcode_metadata_array)
 
+    def _write_depcode_metadata(self, depcode_metadata_array):
+        """Write depletion code metadata to the database."""
         # Open or restore db and append datat to it
-        db = tb.open_file(
-            self.db_path,
-            mode='a',
-            filters=self.compression_params)
-        try:
-            depcode_metadata_table = db.get_node(db.root, 'depcode_metadata')
-        except Exception:
-            depcode_metadata_table = db.create_table(
-                db.root,
-                'depcode_metadata',
-                depcode_metadata_array,
-                "Depletion code metadata")
-        depcode_metadata_table.flush()
-        db.close()
+        with self._database() as db:
+            depcode_metadata_table = self._get_node(db, '/depcode_metadata')
+            if depcode_metadata_table is None:
+                depcode_metadata_table = db.create_table(
+                    db.root,
+                    'depcode_metadata',
+                    depcode_metadata_array,
+                    "Depletion code metadata")
+                self._nodes['/depcode_metadata'] = depcode_metadata_table
 
     def store_step_metadata(self):
         """Adds the following depletion code and SaltProc simulation parameters
@@ -608,24 +1288,23 @@ class Simulation():
 
         )
         step_metadata_array = np.array([step_metadata_row], dtype=step_metadata_dtype)
+        self._submit(self._write_step_metadata, step_metadata_array)
 
+    def _write_step_metadata(self, step_metadata_array):
+        """Write depletion step metadata to the database."""
         # Open or restore db and append datat to it
-        db = tb.open_file(
-            self.db_path,
-            mode='a',
-            filters=self.compression_params)
-        try:
-            step_metadata_table = db.get_node(db.root, 'depletion_step_metadata')
-        except Exception:
-            step_metadata_table = db.create_table(
-                db.root,
-                'depletion_step_metadata',
-                np.empty(0, dtype=step_metadata_dtype),
-                "Depletion step metadata")
-
-        step_metadata_table.append(step_metadata_array)
-        step_metadata_table.flush()
-        db.close()
+        with self._database() as db:
+            step_metadata_table = self._get_node(db,
+                                                 '/depletion_step_metadata')
+            if step_metadata_table is None:
+                step_metadata_table = db.create_table(
+                    db.root,
+                    'depletion_step_metadata',
+                    np.empty(0, dtype=step_metadata_array.dtype),
+                    "Depletion step metadata")
+                self._nodes['/depletion_step_metadata'] = step_metadata_table
+
+            step_metadata_table.append(step_metadata_array)
 
     def read_k_eds_delta(self, current_timestep):
         """Reads from database delta between previous and current `keff` at the
@@ -645,11 +1324,8 @@ class Simulation():
         """
 
         if current_timestep > 3 or self.restart_flag:
-            # Open or restore db and read data
-            db = tb.open_file(self.db_path, mode='r')
-            sim_param = db.root.simulation_parameters
-            k_eds = np.array([x['keff_eds'][0] for x in sim_param.iterrows()])
-            db.close()
+            self._load_run_state()
+            k_eds = np.array(self._keff_eds)
             delta_keff = np.diff(k_eds)
             avrg_keff_drop = abs(np.mean(delta_keff[-4:-1]))
             print("Average keff drop per step ", avrg_keff_drop)
@@ -0,0 +1,100 @@
+"""Compares the ``step`` and ``nuclide`` chunk layouts of the composition
+arrays in the SaltProc results database.
+
+For each layout, the script stores synthetic material compositions for a
+number of depletion steps with :class:`saltproc.Simulation`, then times
+reading the full history of a few nuclides and reading complete
+compositions at a few depletion steps.
+
+Usage::
+
+    python composition_chunk_layout.py [--nuclides N] [--steps S]
+
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+import tables as tb
+
+from saltproc import Materialflow, Simulation
+
+
+def make_materials(n_nuclides, n_steps, seed=1):
+    """Returns a list with one ``{'fuel': Materialflow}`` dictionary per
+    depletion step."""
+    rng = np.random.default_rng(seed)
+    # Light and heavy nuclides with ZAM codes Z * 10000 + A * 10
+    zams = [z * 10000 + a * 10
+            for z in range(1, 99)
+            for a in range(z, 3 * z + 10)][:n_nuclides]
+    positions = Materialflow.nuclide_index.zam_positions(zams)
+    materials = []
+    for _ in range(n_steps):
+        fractions = rng.random(len(positions))
+        fractions /= fractions.sum()
+        fuel = Materialflow.from_arrays(positions, fractions, density=3.0,
+                                        volume=1e6)
+        materials += [{'fuel': fuel}]
+    return materials
+
+
+def store(db_path, materials, chunk_layout):
+    """Stores `materials` and returns the storage time [s]."""
+    simulation = Simulation(db_path=db_path, chunk_layout=chunk_layout,
+                            durability='close')
+    start = time.perf_counter()
+    with simulation, contextlib.redirect_stdout(io.StringIO()):
+        for step, mats in enumerate(materials):
+            simulation.store_mat_data(mats, step)
+    return time.perf_counter() - start
+
+
+def read(db_path, columns, rows):
+    """Returns the time [s] to read the history of the nuclides in
+    `columns`, and the time to read the compositions at `rows`."""
+    with tb.open_file(db_path, mode='r') as db:
+        comp = db.root.materials.fuel.before_reproc.comp
+        start = time.perf_counter()
+        for column in columns:
+            comp[:, column]
+        history_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for row in rows:
+            comp[row]
+        step_time = time.perf_counter() - start
+        chunkshape = tuple(map(int, comp.chunkshape))
+    return history_time, step_time, chunkshape
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--nuclides', type=int, default=1500,
+                        help='number of nuclides')
+    parser.add_argument('--steps', type=int, default=300,
+                        help='number of depletion steps')
+    args = parser.parse_args()
+
+    materials = make_materials(args.nuclides, args.steps)
+    columns = np.linspace(0, args.nuclides - 1, 10, dtype=int)
+    rows = np.linspace(0, args.steps - 1, 10, dtype=int)
+    print(f'{args.nuclides} nuclides, {args.steps} depletion steps')
+    print(f'{"layout":<10}{"chunkshape":>14}{"store [s]":>12}'
+          f'{"10 histories [s]":>18}{"10 steps [s]":>14}{"size [MB]":>12}')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for chunk_layout in Simulation.CHUNK_LAYOUTS:
+            db_path = os.path.join(tmpdir, f'{chunk_layout}.h5')
+            store_time = store(db_path, materials, chunk_layout)
+            history_time, step_time, chunkshape = read(db_path, columns, rows)
+            size = os.path.getsize(db_path) / 1024 ** 2
+            print(f'{chunk_layout:<10}{str(chunkshape):>14}'
+                  f'{store_time:>12.3f}{history_time:>18.4f}'
+                  f'{step_time:>14.4f}{size:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
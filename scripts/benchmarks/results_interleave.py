@@ -0,0 +1,120 @@
+"""Compares reading material histories with :class:`saltproc.Results` to
+the per-nuclide loops that :class:`saltproc.Results` used before.
+
+The script stores synthetic material compositions before and after
+reprocessing for a number of depletion steps, then times assembling the
+interleaved composition and parameter histories of the material.
+
+Usage::
+
+    python results_interleave.py [--nuclides N] [--steps S]
+
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+import tables as tb
+
+from saltproc import Results, Simulation
+
+from composition_chunk_layout import make_materials
+
+
+def store(db_path, materials):
+    """Stores the initial composition, and `materials` before and after
+    reprocessing at each depletion step."""
+    simulation = Simulation(db_path=db_path, durability='close')
+    neutronics_parameters = {
+        'keff_bds': [1.0, 1e-4],
+        'keff_eds': [1.0, 1e-4],
+        'breeding_ratio_bds': [0.9, 1e-3],
+        'breeding_ratio_eds': [0.9, 1e-3],
+        'power_level': 1e9,
+        'beta_eff_bds': np.full((8, 2), 1e-3),
+        'beta_eff_eds': np.full((8, 2), 1e-3),
+        'delayed_neutrons_lambda_bds': np.full((8, 2), 1e-1),
+        'delayed_neutrons_lambda_eds': np.full((8, 2), 1e-1),
+        'fission_mass_bds': 1e6,
+        'fission_mass_eds': 1e6}
+    with simulation, contextlib.redirect_stdout(io.StringIO()):
+        simulation.store_mat_data(materials[0], -1, False)
+        for step, mats in enumerate(materials):
+            simulation.store_mat_data(mats, step, False)
+            simulation._write_step_neutronics_parameters(
+                neutronics_parameters, step + 1.0)
+            simulation.store_mat_data(mats, step, True)
+
+
+def legacy_read(db_path):
+    """Assembles the composition and mass histories with one column read
+    and a growing list per nuclide."""
+    with tb.open_file(db_path, mode='r') as db:
+        material = db.root.materials.fuel
+        nuc_map = material.before_reproc.nuclide_map
+        nucs = list(map(bytes.decode, nuc_map.col('nuclide')))
+        nuc_map = dict(zip(nucs, nuc_map.col('index')))
+        arr_dim = (len(nuc_map), len(material.before_reproc.comp) +
+                   len(material.after_reproc.comp))
+        material_comp = np.empty(arr_dim)
+        for nuc in nucs:
+            nuc_comp_br = material.before_reproc.comp[:, nuc_map[nuc]]
+            nuc_comp_ar = material.after_reproc.comp[:, nuc_map[nuc]]
+            nuc_comp_0 = nuc_comp_br.pop(0)
+            nuc_comp = []
+            for c1, c2 in zip(nuc_comp_br, nuc_comp_ar):
+                nuc_comp = nuc_comp + [c1, c2]
+            nuc_comp = [nuc_comp_0] + nuc_comp
+            material_comp[nuc_map[nuc], :] = nuc_comp
+        col_br = material.before_reproc.parameters.col('mass').tolist()
+        col_ar = material.after_reproc.parameters.col('mass').tolist()
+        col_0 = col_br.pop(0)
+        mass = []
+        for c1, c2 in zip(col_br, col_ar):
+            mass = mass + [c1, c2]
+        mass = [col_0] + mass
+    return material_comp, mass
+
+
+def results_read(db_path):
+    """Assembles the composition and mass histories with
+    :class:`saltproc.Results`."""
+    results = Results(db_path, load_in_out_streams=False)
+    return (results.material_composition['fuel'],
+            results.material_parameters['fuel']['mass'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--nuclides', type=int, default=300,
+                        help='number of nuclides')
+    parser.add_argument('--steps', type=int, default=1000,
+                        help='number of depletion steps')
+    args = parser.parse_args()
+
+    materials = make_materials(args.nuclides, args.steps)
+    print(f'{args.nuclides} nuclides, {args.steps} depletion steps')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, 'results.h5')
+        store(db_path, materials)
+        times = {}
+        histories = {}
+        for name, read in (('legacy', legacy_read),
+                           ('Results', results_read)):
+            start = time.perf_counter()
+            histories[name] = read(db_path)
+            times[name] = time.perf_counter() - start
+    for legacy, new in zip(histories['legacy'], histories['Results']):
+        np.testing.assert_allclose(legacy, new)
+    print(f'{"reader":<10}{"time [s]":>12}')
+    for name, read_time in times.items():
+        print(f'{name:<10}{read_time:>12.3f}')
+    print(f'speedup {times["legacy"] / times["Results"]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
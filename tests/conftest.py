@@ -1,4 +1,6 @@
+from copy import copy
 from pathlib import Path
+import numpy as np
 import pytest
 
 from tests.integration_tests import config as integration_config
@@ -99,3 +101,92 @@ def openmc_depcode(openmc_runtime):
 def openmc_reactor(openmc_runtime):
     reactor = openmc_runtime[1]
     return reactor
+
+
+@pytest.fixture(scope='session')
+def results_depcode(serpent_depcode):
+    """SerpentDepcode object that reports fixed neutronics parameters and
+    metadata, so results databases can be written without a Serpent2
+    `*_res.m` file"""
+    depcode = copy(serpent_depcode)
+    depcode.depcode_metadata = {
+        'depcode_name': 'serpent',
+        'depcode_version': '2.1.32',
+        'title': 'results database',
+        'depcode_input_filename': depcode.runtime_inputfile,
+        'depcode_working_dir': str(depcode.output_path),
+        'xs_data_path': ''}
+    depcode.neutronics_parameters = {
+        'keff_bds': [1.0, 1e-4],
+        'keff_eds': [1.1, 1e-4],
+        'breeding_ratio_bds': [0.9, 1e-3],
+        'breeding_ratio_eds': [0.9, 1e-3],
+        'burn_days': 1.0,
+        'power_level': 1e9,
+        'beta_eff_bds': np.full((2, 2), 1e-3),
+        'beta_eff_eds': np.full((2, 2), 1e-3),
+        'delayed_neutrons_lambda_bds': np.full((2, 2), 1e-1),
+        'delayed_neutrons_lambda_eds': np.full((2, 2), 1e-1),
+        'fission_mass_bds': 1e6,
+        'fission_mass_eds': 1e6}
+    depcode.npop = 1000
+    depcode.active_cycles = 20
+    depcode.inactive_cycles = 5
+    depcode.step_metadata = {
+        'OMP_threads': 1,
+        'MPI_tasks': 1,
+        'memory_optimization_mode': 4,
+        'depletion_timestep_size': 1.0,
+        'step_execution_time': 1.0,
+        'step_memory_usage': 1.0}
+    for read in ('read_depcode_metadata',
+                 'read_neutronics_parameters',
+                 'read_step_metadata'):
+        setattr(depcode, read, lambda: None)
+    return depcode
+
+
+@pytest.fixture(scope='session')
+def store_step(results_depcode):
+    """Function that stores a depletion step through the public
+    Simulation API the way ``saltproc.app.run()`` does"""
+    mats = results_depcode.read_depleted_materials(True)
+
+    def store_step(sim, step, end_step=True):
+        """Stores depletion step `step`. Without `end_step`, the depletion
+        step is left in progress."""
+        sim.store_mat_data(mats, step, False)
+        sim.store_step_neutronics_parameters()
+        sim.store_step_metadata()
+        sim.store_after_repr(mats, None, step)
+        if end_step:
+            sim.end_step()
+    return store_step
+
+
+@pytest.fixture(scope='session')
+def store_run(results_depcode, store_step):
+    """Function that writes a results database of the initial state and a
+    number of depletion steps, and returns its Simulation object"""
+    mats = results_depcode.read_depleted_materials(False)
+
+    def store_run(db_path, n_steps, **kwargs):
+        sim = Simulation(sim_depcode=results_depcode,
+                         db_path=str(db_path),
+                         **kwargs)
+        with sim:
+            sim.store_depcode_metadata()
+            sim.store_mat_data(mats, -1, False)
+            for step in range(n_steps):
+                store_step(sim, step)
+        return sim
+    return store_run
+
+
+@pytest.fixture(scope='session')
+def results_db(store_run, tmpdir_factory):
+    """Path of a results database of the initial state and three depletion
+    steps"""
+    db_path = tmpdir_factory.mktemp('results') / 'results.h5'
+    store_run(db_path, 3)
+    return str(db_path)
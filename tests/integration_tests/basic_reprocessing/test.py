@@ -1,7 +1,11 @@
 """Test basic reprocessing functionality"""
+import json
+
 import pytest
 import numpy as np
+import networkx as nx
 from saltproc.app import reprocess_materials, refill_materials
+from saltproc.app import get_extraction_processes, ProcessingPlan
 
 
 def test_reprocessing_and_refill(
@@ -38,3 +42,94 @@ def test_reprocessing_and_refill(
     np.testing.assert_allclose(
         waste_feed_streams['fuel']['feed_leu'].get_mass('Li7'),
         67.75331008246572, rtol=1e-6)
+
+
+def test_reprocessing_with_plan(serpent_depcode,
+                                proc_test_file,
+                                path_test_file,
+                                monkeypatch):
+    plan = ProcessingPlan(proc_test_file, path_test_file)
+    plan.update()
+
+    # The caller updates the plan once per depletion step
+    def no_update():
+        raise AssertionError('the processing plan was updated')
+    monkeypatch.setattr(plan, 'update', no_update)
+    mats = serpent_depcode.read_depleted_materials(True)
+    waste_streams, extracted_mass = reprocess_materials(
+        mats, proc_test_file, path_test_file, processing_plan=plan)
+    np.testing.assert_allclose(extracted_mass['fuel'], 1401.0846504569054,
+                               rtol=1e-6)
+    waste_feed_streams = refill_materials(
+        mats, extracted_mass, waste_streams, proc_test_file,
+        processing_plan=plan)
+    np.testing.assert_allclose(
+        waste_feed_streams['fuel']['feed_leu'].get_mass('U235'),
+        43.573521906078334, rtol=1e-6)
+
+
+def _reprocess_by_paths(material, processes, paths):
+    """Reprocesses `material` along every path between core_outlet and
+    core_inlet separately, as ``reprocess_materials`` did before the
+    reprocessing system was composed into transfer fractions."""
+    waste_streams = {}
+    thru_flows = []
+    for path in paths:
+        thru_flow = material
+        for proc in path:
+            divisor = float(processes[proc].mass_flowrate /
+                            processes['core_outlet'].mass_flowrate)
+            thru_flow, waste_stream = \
+                processes[proc].process_material(divisor * thru_flow)
+            waste_streams['waste_' + proc] = waste_stream
+        thru_flows.append(thru_flow)
+    outflow = thru_flows[0]
+    for thru_flow in thru_flows[1:]:
+        outflow += thru_flow
+    return outflow, waste_streams
+
+
+@pytest.mark.parametrize('reactor_name, bypass_flowrate', [
+    ('tap', None),
+    ('msbr', None),
+    # the flow rates of bypass and liquid_metal no longer add up to the
+    # flow rate of core_outlet
+    ('msbr', 5e6)])
+def test_reprocessing_matches_paths(serpent_depcode, cwd, tmp_path,
+                                    reactor_name, bypass_flowrate):
+    process_file = cwd / f'{reactor_name}_processes.json'
+    dot_file = cwd / f'{reactor_name}_paths.dot'
+    if bypass_flowrate is not None:
+        process_data = json.loads(process_file.read_text())
+        process_data['fuel']['extraction_processes']['bypass'][
+            'mass_flowrate'] = bypass_flowrate
+        process_file = tmp_path / process_file.name
+        process_file.write_text(json.dumps(process_data))
+    mats = serpent_depcode.read_depleted_materials(True)
+    processes = get_extraction_processes(process_file)['fuel']
+    digraph = nx.drawing.nx_pydot.read_dot(dot_file)
+    paths = list(nx.all_simple_paths(digraph,
+                                     source='core_outlet',
+                                     target='core_inlet'))
+    expected_fuel, expected_waste_streams = \
+        _reprocess_by_paths(mats['fuel'], processes, paths)
+
+    inmass = mats['fuel'].mass
+    waste_streams, extracted_mass = reprocess_materials(mats,
+                                                        process_file,
+                                                        dot_file)
+    np.testing.assert_allclose(mats['fuel'].mass, expected_fuel.mass,
+                               rtol=1e-10)
+    np.testing.assert_allclose(mats['fuel'].volume, expected_fuel.volume,
+                               rtol=1e-10)
+    np.testing.assert_allclose(extracted_mass['fuel'],
+                               inmass - expected_fuel.mass, rtol=1e-8)
+    for nuc in ('U235', 'Xe135', 'I135', 'Sr90', 'Pa233'):
+        np.testing.assert_allclose(mats['fuel'].get_mass(nuc),
+                                   expected_fuel.get_mass(nuc), rtol=1e-8)
+    # Waste streams of processes on a single path
+    for name in ('waste_sparger', 'waste_entrainment_separator',
+                 'waste_nickel_filter', 'waste_liquid_metal'):
+        np.testing.assert_allclose(waste_streams['fuel'][name].mass,
+                                   expected_waste_streams[name].mass,
+                                   rtol=1e-8)
@@ -1,10 +1,15 @@
+from copy import copy, deepcopy
+import json
 from pathlib import Path
 import os
+import shutil
 
 import pytest
 import numpy as np
 import tables as tb
+import openmc.data
 
+from saltproc import Simulation, Results, ResultsCollection
 from saltproc.app import reprocess_materials, refill_materials
 
 
@@ -386,3 +391,543 @@ def test_store_step_neutronics_parameters(simulation):
 
     # use original db path
     simulation.db_path = db_path_old
+
+
+def test_async_storage(simulation, tmp_path):
+    """
+    Data stored by the background database writer should match the data
+    stored directly.
+    """
+    mats = simulation.sim_depcode.read_depleted_materials(True)
+    sync_simulation = Simulation(sim_depcode=simulation.sim_depcode,
+                                 db_path=str(tmp_path / 'sync.h5'))
+    async_simulation = Simulation(sim_depcode=simulation.sim_depcode,
+                                  db_path=str(tmp_path / 'async.h5'),
+                                  async_storage=True)
+    for sim in (sync_simulation, async_simulation):
+        sim.store_mat_data(mats, 0, False)
+        sim.store_mat_data(mats, 1, False)
+    async_simulation.flush()
+
+    with tb.open_file(sync_simulation.db_path, mode='r') as sync_db, \
+            tb.open_file(async_simulation.db_path, mode='r') as async_db:
+        sync_node = sync_db.root.materials.fuel.before_reproc
+        async_node = async_db.root.materials.fuel.before_reproc
+        np.testing.assert_array_equal(sync_node.comp[:], async_node.comp[:])
+        np.testing.assert_array_equal(sync_node.nuclide_map[:],
+                                      async_node.nuclide_map[:])
+        np.testing.assert_array_equal(sync_node.parameters[:],
+                                      async_node.parameters[:])
+
+
+@pytest.mark.parametrize('async_storage', [False, True])
+def test_database_session(simulation, tmp_path, monkeypatch, async_storage):
+    """
+    Data stored during a database session should match the data stored
+    without a session, and the session should keep a single file handle.
+    """
+    mats = simulation.sim_depcode.read_depleted_materials(True)
+    reference = Simulation(sim_depcode=simulation.sim_depcode,
+                           db_path=str(tmp_path / 'reference.h5'))
+    session = Simulation(sim_depcode=simulation.sim_depcode,
+                         db_path=str(tmp_path / 'session.h5'),
+                         async_storage=async_storage,
+                         durability='fsync')
+    for step in range(2):
+        reference.store_mat_data(mats, step, False)
+
+    handles = []
+    open_file = tb.open_file
+
+    def counting_open_file(*args, **kwargs):
+        handles.append(open_file(*args, **kwargs))
+        return handles[-1]
+    monkeypatch.setattr(tb, 'open_file', counting_open_file)
+    with session:
+        session.store_mat_data(mats, 0, False)
+        session.end_step()
+        session.flush()
+        assert len(handles) == 1
+        assert handles[0].isopen
+        session.store_mat_data(mats, 1, False)
+        session.end_step()
+        session.flush()
+        assert len(handles) == 1
+    assert not handles[0].isopen
+    monkeypatch.undo()
+
+    with tb.open_file(reference.db_path, mode='r') as reference_db, \
+            tb.open_file(session.db_path, mode='r') as session_db:
+        reference_node = reference_db.root.materials.fuel.before_reproc
+        session_node = session_db.root.materials.fuel.before_reproc
+        np.testing.assert_array_equal(reference_node.comp[:],
+                                      session_node.comp[:])
+        np.testing.assert_array_equal(reference_node.nuclide_map[:],
+                                      session_node.nuclide_map[:])
+        np.testing.assert_array_equal(reference_node.parameters[:],
+                                      session_node.parameters[:])
+
+
+def test_fixed_nuclide_axis(results_depcode, tmp_path):
+    """
+    Compositions stored with a fixed nuclide axis should match compositions
+    stored with a dynamic nuclide axis, and new nuclides should only rewrite
+    the composition array once the headroom is used up.
+    """
+    mats = results_depcode.read_depleted_materials(True)
+    new_mats = {}
+    for name, mat in mats.items():
+        new_mats[name] = deepcopy(mat)
+        comp = dict(mat.comp)
+        comp.update({'U250': 1e-6, 'Pu255': 1e-6})
+        new_mats[name].replace_components(comp)
+    # The depletion code tracks the nuclides of the initial materials
+    depcode = copy(results_depcode)
+    depcode.get_depletion_nuclides = \
+        lambda: list(dict.fromkeys(nuc for mat in mats.values()
+                                   for nuc in mat.comp))
+
+    dynamic = Simulation(sim_depcode=results_depcode,
+                         db_path=str(tmp_path / 'dynamic.h5'))
+    fixed = Simulation(sim_depcode=depcode,
+                       db_path=str(tmp_path / 'fixed.h5'),
+                       nuclide_axis='fixed',
+                       nuclide_headroom=1)
+    for sim in (dynamic, fixed):
+        with sim:
+            sim.store_depcode_metadata()
+            sim.store_mat_data(mats, -1, False)
+            for step, step_mats in enumerate((mats, new_mats)):
+                sim.store_mat_data(step_mats, step, False)
+                sim.store_step_neutronics_parameters()
+                sim.store_step_metadata()
+                sim.store_after_repr(step_mats, None, step)
+                sim.end_step()
+
+    with tb.open_file(dynamic.db_path, mode='r') as dynamic_db, \
+            tb.open_file(fixed.db_path, mode='r') as fixed_db:
+        assert dynamic_db.root._v_attrs.layout_version == 1
+        assert fixed_db.root._v_attrs.layout_version == 2
+        fixed_node = fixed_db.root.materials.fuel.before_reproc
+        # One column of headroom, so the array was widened for the second new nuclide
+        n_nucs = len(fixed_node.nuclide_map)
+        assert fixed_node.comp.shape[1] == n_nucs + 1
+        assert set(fixed_node.nuclide_map.col('nuclide')[-2:]) == \
+            {b'U250', b'Pu255'}
+
+    dynamic_results = Results(dynamic.db_path)
+    fixed_results = Results(fixed.db_path)
+    dynamic_map = dynamic_results.nuclide_idx['fuel']
+    fixed_map = fixed_results.nuclide_idx['fuel']
+    dynamic_comp = dynamic_results.material_composition['fuel']
+    fixed_comp = fixed_results.material_composition['fuel']
+    assert dynamic_comp.shape[1] == 5
+    assert set(dynamic_map) == set(fixed_map)
+    for nuc, idx in dynamic_map.items():
+        np.testing.assert_array_equal(dynamic_comp[idx],
+                                      fixed_comp[fixed_map[nuc]])
+
+
+def test_add_missing_nuclides(simulation, tmp_path, monkeypatch):
+    """
+    Compositions rewritten in blocks when new nuclides appear should match
+    the compositions rewritten in a single block.
+    """
+    mats = simulation.sim_depcode.read_depleted_materials(True)
+    fuel = mats['fuel']
+    nucs = fuel.get_nuclides()
+    steps = []
+    for drop, new_nucs in (([], []),
+                           (nucs[:3], ['U250']),
+                           (nucs[3:5], []),
+                           ([], ['Pu255'] + nucs[:3])):
+        comp = {nuc: value for nuc, value in steps[-1].items()
+                if nuc not in drop} if steps else dict(fuel.comp)
+        comp.update({nuc: 1e-6 for nuc in new_nucs})
+        steps += [comp]
+
+    db_paths = []
+    for copy_buffer_size in (8, 64 * 1024 ** 2):
+        monkeypatch.setattr('saltproc.simulation._COPY_BUFFER_SIZE',
+                            copy_buffer_size)
+        db_paths += [str(tmp_path / f'blocks_{copy_buffer_size}.h5')]
+        sim = Simulation(sim_depcode=simulation.sim_depcode,
+                         db_path=db_paths[-1])
+        for step, comp in enumerate(steps):
+            step_fuel = deepcopy(fuel)
+            step_fuel.replace_components(comp)
+            sim.store_mat_data({'fuel': step_fuel}, step)
+
+    with tb.open_file(db_paths[0], mode='r') as db, \
+            tb.open_file(db_paths[1], mode='r') as ref_db:
+        node = db.root.materials.fuel.before_reproc
+        ref_node = ref_db.root.materials.fuel.before_reproc
+        np.testing.assert_array_equal(node.comp[:], ref_node.comp[:])
+        np.testing.assert_array_equal(node.nuclide_map[:],
+                                      ref_node.nuclide_map[:])
+        nuclide_map = _create_nuclide_map(node)
+        comp = np.array(node.comp[:])
+    assert len(nuclide_map) == len(nucs) + 2
+    for step, step_comp in enumerate(steps):
+        for nuc, value in step_comp.items():
+            np.testing.assert_allclose(comp[step, nuclide_map[nuc]],
+                                       value * fuel.mass)
+        missing = [nuclide_map[nuc] for nuc in nuclide_map
+                   if nuc not in step_comp]
+        assert np.all(comp[step, missing] == 0.0)
+
+
+def _baseline_nuclide_code(nuc):
+    """Returns the Serpent2 nuclide code that SaltProc used to order
+    composition columns before nuclides were ordered by ZAM."""
+    Z, A, m = openmc.data.zam(nuc)
+    return Z * 1000 + (int(((A / 100) - 3) * 100) if m else 0)
+
+
+def test_restart_baseline_ordering(simulation, tmp_path):
+    """
+    A restarted simulation should place compositions by nuclide name in a
+    database whose columns are in the order of older SaltProc versions.
+    """
+    fuel = simulation.sim_depcode.read_depleted_materials(True)['fuel']
+    db_path = str(tmp_path / 'baseline.h5')
+    sim = Simulation(sim_depcode=simulation.sim_depcode, db_path=db_path)
+    sim.store_mat_data({'fuel': fuel}, -1, False)
+
+    # Rewrite the database the way older versions stored it
+    with tb.open_file(db_path, mode='a') as db:
+        del db.root._v_attrs.layout_version
+        node = db.root.materials.fuel.before_reproc
+        nuclide_map = _create_nuclide_map(node)
+        nucs = sorted(nuclide_map,
+                      key=lambda nuc: (_baseline_nuclide_code(nuc), nuc))
+        assert nucs != list(nuclide_map)
+        comp = np.asarray(node.comp[:])[:, [nuclide_map[nuc]
+                                            for nuc in nucs]]
+        db.remove_node(node.comp)
+        db.remove_node(node.nuclide_map)
+        db.create_earray(node, 'comp', obj=comp)
+        db.create_table(node, 'nuclide_map',
+                        obj=np.array(list(zip(nucs, range(len(nucs)))),
+                                     dtype=sim.nuclide_indices_dtype))
+
+    restarted = Simulation(sim_depcode=simulation.sim_depcode,
+                           db_path=db_path,
+                           restart_flag=True)
+    restarted.store_mat_data({'fuel': fuel}, 0, False)
+    with tb.open_file(db_path, mode='r') as db:
+        assert db.root._v_attrs.layout_version == 1
+        node = db.root.materials.fuel.before_reproc
+        nuclide_map = _create_nuclide_map(node)
+        comp = np.asarray(node.comp[:])
+    assert list(nuclide_map) == nucs
+    assert comp.shape == (2, len(nucs))
+    for nuc, fraction in fuel.comp.items():
+        np.testing.assert_allclose(comp[:, nuclide_map[nuc]],
+                                   fraction * fuel.mass)
+
+
+def test_chunk_layout(simulation, tmp_path):
+    """
+    Nuclide-major composition arrays should hold the same data as step-major
+    composition arrays.
+    """
+    mats = simulation.sim_depcode.read_depleted_materials(True)
+    sims = [Simulation(sim_depcode=simulation.sim_depcode,
+                       db_path=str(tmp_path / f'{chunk_layout}.h5'),
+                       chunk_layout=chunk_layout)
+            for chunk_layout in ('step', 'nuclide')]
+    for sim in sims:
+        with sim:
+            sim.store_mat_data(mats, 0, False)
+            sim.store_mat_data(mats, 1, False)
+
+    with tb.open_file(sims[0].db_path, mode='r') as step_db, \
+            tb.open_file(sims[1].db_path, mode='r') as nuclide_db:
+        step_comp = step_db.root.materials.fuel.before_reproc.comp
+        nuclide_comp = nuclide_db.root.materials.fuel.before_reproc.comp
+        assert nuclide_comp.chunkshape == (512, 16)
+        np.testing.assert_array_equal(step_comp[:], nuclide_comp[:])
+
+
+def test_sparse_streams(results_depcode, proc_test_file, path_test_file,
+                        tmp_path):
+    """
+    Waste and feed streams stored in compressed sparse row format should
+    densify to the streams stored as dense arrays.
+    """
+    mats = results_depcode.read_depleted_materials(True)
+    waste_streams, extracted_mass = reprocess_materials(
+        mats, proc_test_file, path_test_file)
+    waste_feed_streams = refill_materials(
+        mats, extracted_mass, waste_streams, proc_test_file)
+
+    sims = [Simulation(sim_depcode=results_depcode,
+                       db_path=str(tmp_path / f'sparse_{sparse}.h5'),
+                       sparse_streams=sparse)
+            for sparse in (False, True)]
+    for sim in sims:
+        with sim:
+            sim.store_depcode_metadata()
+            sim.store_mat_data(mats, -1, False)
+            for step in range(2):
+                sim.store_mat_data(mats, step, False)
+                sim.store_step_neutronics_parameters()
+                sim.store_step_metadata()
+                sim.store_after_repr(mats, waste_feed_streams, step)
+                sim.end_step()
+
+    with tb.open_file(sims[1].db_path, mode='r') as sparse_db:
+        assert 'indptr' in \
+            sparse_db.root.materials.fuel.in_out_streams.waste_sparger
+    dense_streams = Results(sims[0].db_path).waste_streams['fuel']
+    sparse_streams = Results(sims[1].db_path).waste_streams['fuel']
+    for name, stream in waste_feed_streams['fuel'].items():
+        if not stream.comp:
+            continue
+        dense = dense_streams[name]
+        sparse = sparse_streams[name]
+        assert len(sparse.indptr) == 3
+        # only nonzero masses are stored
+        assert set(sparse) == {nuc for nuc in stream.comp
+                               if stream.get_mass(nuc) != 0.0}
+        for nuc in stream.comp:
+            expected = dense[nuc]
+            if nuc in sparse:
+                np.testing.assert_array_equal(sparse[nuc], expected)
+            else:
+                assert np.all(np.asarray(expected) == 0.0)
+        dense_comp = sparse.to_dense()
+        for nuc, idx in sparse.nuclide_idx.items():
+            np.testing.assert_array_equal(dense_comp[idx], sparse[nuc])
+
+
+def test_live_results(serpent_depcode, results_depcode, store_step,
+                      tmp_path):
+    """
+    Live results should only read committed depletion steps, and a refresh
+    should read the depletion steps committed since the last read.
+    """
+    sim = Simulation(sim_depcode=results_depcode,
+                     db_path=str(tmp_path / 'live.h5'),
+                     live_results=True)
+    with sim:
+        sim.store_depcode_metadata()
+        sim.store_mat_data(serpent_depcode.read_depleted_materials(False),
+                           -1, False)
+        # The database is closed between depletion steps, so it can be read
+        store_step(sim, 0)
+        results = Results(sim.db_path, live=True)
+        assert results.n_steps == 1
+        np.testing.assert_array_equal(results.time_at_eds, [1.0])
+        assert results.material_composition['fuel'].shape[1] == 3
+
+        # A depletion step in progress is not read
+        store_step(sim, 1, end_step=False)
+        sim.close_database()
+        assert not results.refresh()
+        assert results.n_steps == 1
+        assert len(results.keff) == 2
+
+        sim.open_database()
+        sim.end_step()
+        assert results.refresh()
+        assert results.n_steps == 2
+        assert not results.refresh()
+
+    with tb.open_file(sim.db_path, mode='r') as db:
+        assert db.root._v_attrs.committed_steps == 2
+    reference = Results(sim.db_path)
+    np.testing.assert_array_equal(results.time_total, reference.time_total)
+    np.testing.assert_array_equal(results.material_composition['fuel'],
+                                  reference.material_composition['fuel'])
+    assert results.material_parameters == reference.material_parameters
+    assert results.depletion_step_metadata == \
+        reference.depletion_step_metadata
+
+
+def test_lazy_results(results_db, tmp_path):
+    """
+    Results should only read the data that is accessed, and preloaded
+    results should match lazily loaded results.
+    """
+    db_path = str(tmp_path / 'lazy.h5')
+    shutil.copy(results_db, db_path)
+    results = Results(db_path)
+    preloaded = Results(db_path, preload=True)
+    assert len(results.keff) == 6
+    assert set(results.material_composition) == {'fuel', 'ctrlPois'}
+    fuel_comp = results.material_composition['fuel']
+
+    # Data that was not accessed yet is read from the file when accessed
+    with tb.open_file(db_path, mode='a') as db:
+        db.remove_node('/materials/ctrlPois', recursive=True)
+    np.testing.assert_array_equal(results.time_total, preloaded.time_total)
+    np.testing.assert_array_equal(results.material_composition['fuel'],
+                                  fuel_comp)
+    with pytest.raises((tb.NoSuchNodeError, IndexError)):
+        results.material_composition['ctrlPois']
+
+    # Preloaded data is read when the results are opened
+    for name in ('time_total', 'power_level', 'fission_mass'):
+        np.testing.assert_array_equal(getattr(results, name),
+                                      getattr(preloaded, name))
+    np.testing.assert_array_equal(preloaded.material_composition['fuel'],
+                                  fuel_comp)
+    assert preloaded.material_composition['ctrlPois'].shape[1] == 7
+    assert results.nuclide_idx['fuel'] == preloaded.nuclide_idx['fuel']
+    assert results.depcode_metadata == preloaded.depcode_metadata
+
+
+def test_results_export(results_db):
+    """
+    Results exported to labeled arrays should wrap the composition history
+    without a copy, and chunked reads should match it.
+    """
+    results = Results(results_db)
+    comp = results.material_composition['fuel']
+    nucs = list(results.nuclide_idx['fuel'])
+
+    df = results.to_dataframe('fuel')
+    assert np.shares_memory(df.to_numpy(), comp)
+    assert df.index.names == ['time', 'moment']
+    assert list(df.columns) == nucs
+    np.testing.assert_array_equal(df.xs('after', level='moment'),
+                                  comp[:, 2::2].T)
+
+    xr = pytest.importorskip('xarray')
+    composition = results.to_xarray('fuel')
+    assert composition.dims == ('time', 'nuclide')
+    assert np.shares_memory(composition.values, comp)
+    np.testing.assert_array_equal(composition.time, results.time_total)
+    np.testing.assert_array_equal(
+        composition.where(composition.moment == 'before', drop=True),
+        comp[:, [0, 1, 3, 5]].T)
+
+    pytest.importorskip('dask')
+    chunked = results.to_xarray('fuel', chunks=(2, 100))
+    assert chunked.shape == comp.T.shape
+    xr.testing.assert_equal(chunked.compute(), composition)
+    for key in ((slice(None),), (slice(1, 4), slice(2, 9)), (4,),
+                (slice(0, 7, 2), [1, 5])):
+        np.testing.assert_array_equal(chunked.data[key].compute(),
+                                      comp.T[key])
+
+
+def test_derived_quantities(results_db):
+    """
+    Element masses, actinide masses, activity, and decay heat should match
+    sums over the nuclides of each material.
+    """
+    results = Results(results_db)
+
+    nuclides = set().union(*results.nuclide_idx.values())
+    decay_constants = {nuc: 1e-3 * openmc.data.zam(nuc)[1]
+                       for nuc in nuclides}
+    decay_energies = {nuc: 1e6 * openmc.data.zam(nuc)[0] for nuc in nuclides}
+    element_mass = results.element_mass()
+    activity = results.activity(decay_constants=decay_constants)
+    decay_heat = results.decay_heat(decay_constants=decay_constants,
+                                    decay_energies=decay_energies)
+    assert set(element_mass) == set(activity) == {'fuel', 'ctrlPois'}
+    for name in ('fuel', 'ctrlPois'):
+        comp = results.material_composition[name]
+        expected_elements = {}
+        expected_activity = np.zeros(comp.shape[1])
+        expected_decay_heat = np.zeros(comp.shape[1])
+        for nuc, idx in results.nuclide_idx[name].items():
+            Z, A, _ = openmc.data.zam(nuc)
+            element = openmc.data.ATOMIC_SYMBOL[Z]
+            expected_elements[element] = \
+                expected_elements.get(element, 0.0) + comp[idx]
+            nuc_activity = comp[idx] * 1e-3 * A * openmc.data.AVOGADRO \
+                / openmc.data.atomic_mass(nuc)
+            expected_activity += nuc_activity
+            expected_decay_heat += \
+                nuc_activity * 1e6 * Z * openmc.data.JOULE_PER_EV
+        assert list(element_mass[name]) == sorted(
+            expected_elements, key=openmc.data.ATOMIC_NUMBER.get)
+        for element, mass in expected_elements.items():
+            np.testing.assert_allclose(element_mass[name][element], mass)
+        np.testing.assert_allclose(
+            results.actinide_mass(name),
+            sum(mass for element, mass in expected_elements.items()
+                if openmc.data.ATOMIC_NUMBER[element] >= 89))
+        np.testing.assert_allclose(activity[name], expected_activity)
+        np.testing.assert_allclose(decay_heat[name], expected_decay_heat)
+    np.testing.assert_array_equal(
+        results.activity('fuel', decay_constants=decay_constants),
+        activity['fuel'])
+    # nuclides without a decay constant are stable
+    np.testing.assert_array_equal(results.activity('fuel', decay_constants={}),
+                                  0.0)
+
+
+def test_results_collection(store_run, tmp_path, monkeypatch):
+    """
+    A results collection should read the same values as Results, keyed by
+    the run parameters, and cache them.
+    """
+    runs = tmp_path / 'runs'
+    for n_steps in (1, 2, 3):
+        os.makedirs(runs / f'steps_{n_steps}')
+        store_run(runs / f'steps_{n_steps}' / 'run.h5', n_steps)
+    (runs / 'broken.h5').write_text('not a results file')
+
+    collection = ResultsCollection(str(runs),
+                                   parameters=r'steps_(?P<n>\d+)',
+                                   processes=2)
+    assert list(collection.index['n_steps']) == [0, 1, 2, 3]
+    keff = collection.keff()
+    assert keff.index.names == ['n']
+    assert np.isnan(keff.iloc[0])
+    fuel_mass = collection.nuclide_mass('fuel', 'U235', 1.5)
+    for n_steps in (1, 2, 3):
+        results = Results(str(runs / f'steps_{n_steps}' / 'run.h5'))
+        assert keff[float(n_steps)] == pytest.approx(
+            results.keff[-1].nominal_value)
+        time_index = np.searchsorted(results.time_total, 1.5,
+                                     side='right') - 1
+        assert fuel_mass[float(n_steps)] == results.get_nuclide_mass(
+            'fuel', 'U235', time_index)
+
+    # Queries are cached, so no results file is read again
+    cached = ResultsCollection(str(runs), processes=1)
+    with open(cached.cache_file) as f:
+        # files that could not be read are not cached
+        assert set(json.load(f)['files']) == {
+            f'steps_{n_steps}/run.h5' for n_steps in (1, 2, 3)}
+
+    def open_file(*args, **kwargs):
+        raise OSError('results file read')
+    monkeypatch.setattr(tb, 'open_file', open_file)
+    np.testing.assert_array_equal(cached.keff().values, keff.values)
+    np.testing.assert_array_equal(
+        cached.nuclide_mass('fuel', 'U235', 1.5).values, fuel_mass.values)
+    assert cached.keff(moment='bds').isna().all()
+
+
+def test_results_collection_read_failure(store_run, tmp_path, monkeypatch):
+    """
+    Results files that cannot be read should give NaN without caching it,
+    so they are read by the next query.
+    """
+    runs = tmp_path / 'runs'
+    os.makedirs(runs)
+    store_run(runs / 'run.h5', 2)
+    open_file = tb.open_file
+
+    def busy_open_file(*args, **kwargs):
+        raise OSError('results file is being written')
+    monkeypatch.setattr(tb, 'open_file', busy_open_file)
+    collection = ResultsCollection(str(runs), processes=1)
+    assert collection.index['n_steps'].iloc[0] == 0
+    assert collection.keff().isna().all()
+
+    monkeypatch.setattr(tb, 'open_file', open_file)
+    keff = collection.keff()
+    assert keff.iloc[0] == pytest.approx(
+        Results(str(runs / 'run.h5')).keff[-1].nominal_value)
+    assert collection.index['n_steps'].iloc[0] == 2
+    with open(collection.cache_file) as f:
+        assert list(json.load(f)['files']) == ['run.h5']
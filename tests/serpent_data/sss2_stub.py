@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Stand-in for a resident Serpent2 process used to test
+``SerpentDepcode`` persistent sessions without Serpent2.
+
+Follows the coupled calculation protocol expected by SaltProc: after each
+depletion interval, the stub writes ``SIGUSR1`` to the output
+communication file and waits for a signal on the input communication
+file. ``SIGUSR2`` reloads the included files and runs the next interval,
+``SIGTERM`` ends the run. Every interval appends the first line of each
+included file to ``<input>.stub_log``, and writes the depletion times of
+the intervals run so far to ``<input>_dep.m``.
+
+If the ``SSS2_STUB_STOCK`` environment variable is set, the stub behaves
+like stock Serpent2 instead, and repeats the first interval on
+``SIGUSR2``.
+"""
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+
+
+def read_input(input_file):
+    comfile_in = comfile_out = None
+    include_files = []
+    step_length = 0.0
+    for line in Path(input_file).read_text().splitlines():
+        if line.startswith('set comfile'):
+            comfile_in, comfile_out = line.split('"')[1::2]
+        elif line.startswith('include'):
+            include_files.append(line.split('"')[1])
+        elif line.startswith('set    power'):
+            step_length = float(line.split()[-1])
+    return Path(comfile_in), Path(comfile_out), include_files, step_length
+
+
+def run_interval(input_file, include_files, days):
+    with open(f'{input_file}.stub_log', 'a') as log:
+        for include_file in include_files:
+            with open(include_file) as f:
+                log.write(f.readline())
+    with open(f'{input_file}_dep.m', 'w') as f:
+        f.write('ZAI = [ 666 0 ];\n')
+        f.write(f'BU = [ {" ".join(["0.0"] * len(days))} ];\n')
+        f.write(f'DAYS = [ {" ".join(map(str, days))} ];\n')
+
+
+def wait_for_signal(comfile_in):
+    while True:
+        if comfile_in.exists():
+            sig = comfile_in.read_text().strip()
+            if sig:
+                comfile_in.unlink()
+                return int(sig)
+        time.sleep(0.05)
+
+
+def main():
+    input_file = sys.argv[-1]
+    comfile_in, comfile_out, include_files, step_length = \
+        read_input(input_file)
+    days = [0.0, step_length]
+    while True:
+        run_interval(input_file, include_files, days)
+        comfile_out.write_text(f'{int(signal.SIGUSR1)}\n')
+        sig = wait_for_signal(comfile_in)
+        if sig == signal.SIGTERM:
+            break
+        elif sig != signal.SIGUSR2:
+            sys.exit(f'Unexpected signal {sig}')
+        if not os.environ.get('SSS2_STUB_STOCK'):
+            days.append(days[-1] + step_length)
+
+
+if __name__ == '__main__':
+    main()
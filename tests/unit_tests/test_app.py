@@ -1,6 +1,7 @@
 """Test methods in the app package"""
 from pathlib import Path
 import json
+import os
 
 import numpy as np
 import pytest
@@ -10,7 +11,10 @@ from saltproc.app import (_validate_depletion_timesteps_power_levels,
                           _scale_depletion_timesteps)
 from saltproc.app import (SECOND_UNITS, MINUTE_UNITS, HOUR_UNITS, DAY_UNITS,
                           YEAR_UNITS)
-from saltproc.app import get_feeds, get_extraction_process_paths
+from saltproc.app import get_feeds
+from saltproc.app import get_extraction_process_graph
+from saltproc.app import ProcessingPlan, ReprocessingTransfer
+from saltproc import Materialflow
 
 
 @pytest.fixture
@@ -215,9 +219,136 @@ def test_get_feeds(proc_test_file):
                                    293096800.37484)
 
 
-def test_get_extraction_process_paths(path_test_file):
-    burnable_mat, paths = get_extraction_process_paths(path_test_file)
+def test_get_extraction_process_graph(path_test_file, tmp_path):
+    burnable_mat, graph, order = get_extraction_process_graph(path_test_file)
     assert burnable_mat == 'fuel'
-    assert paths[0][1] == 'sparger'
-    assert paths[1][-2] == 'heat_exchanger'
-    assert np.shape(paths) == (2, 7)
+    assert order == ['core_outlet', 'sparger', 'entrainment_separator',
+                     'nickel_filter', 'bypass', 'liquid_metal',
+                     'heat_exchanger', 'core_inlet']
+    assert sorted(graph.successors('nickel_filter')) == ['bypass',
+                                                          'liquid_metal']
+    assert sorted(graph.predecessors('heat_exchanger')) == ['bypass',
+                                                             'liquid_metal']
+    # waste streams and feeds are not part of the flow
+    assert 'waste_sparger' not in graph
+    assert 'LEU_feed' not in graph
+
+    cyclic_file = tmp_path / 'cyclic.dot'
+    cyclic_file.write_text('digraph fuel {\n'
+                           'core_outlet -> sparger;\n'
+                           'sparger -> bypass;\n'
+                           'bypass -> sparger;\n'
+                           'bypass -> core_inlet;\n'
+                           '}\n')
+    with pytest.raises(ValueError):
+        get_extraction_process_graph(cyclic_file)
+
+
+def test_processing_plan(proc_test_file, path_test_file, tmp_path):
+    process_file = tmp_path / 'processes.json'
+    dot_file = tmp_path / 'paths.dot'
+    process_file.write_text(proc_test_file.read_text())
+    dot_file.write_text(path_test_file.read_text())
+
+    plan = ProcessingPlan(process_file, dot_file)
+    assert plan.n_builds == 0
+    assert plan.update() is True
+    assert plan.material_for_extraction == 'fuel'
+    assert plan.process_order[-1] == 'core_inlet'
+    assert plan.extraction_processes['fuel']['sparger'].efficiency['Xe'] == 0.6
+    np.testing.assert_almost_equal(plan.feeds['fuel']['leu'].mass, 4.9602E+8)
+    assert plan.build_time > 0.0
+
+    # unchanged files
+    assert plan.update() is False
+    # new modification time, same content
+    stat = os.stat(dot_file)
+    os.utime(dot_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert plan.update() is False
+    assert plan.n_builds == 1
+
+    # new content
+    process_data = json.loads(process_file.read_text())
+    process_data['fuel']['extraction_processes']['sparger']['efficiency']['Xe'] = 0.5
+    process_file.write_text(json.dumps(process_data))
+    assert plan.update() is True
+    assert plan.n_builds == 2
+    assert plan.extraction_processes['fuel']['sparger'].efficiency['Xe'] == 0.5
+
+
+def test_reprocessing_transfer(proc_test_file, path_test_file):
+    processes = get_extraction_processes(proc_test_file)['fuel']
+    _, graph, order = get_extraction_process_graph(path_test_file)
+    transfer = ReprocessingTransfer(processes, graph, order)
+    # entrainment_separator efficiency for Xe is a function
+    assert not transfer.is_constant
+    assert 'Xe' in transfer.elements
+    assert transfer.split_fractions['nickel_filter'] == [('bypass', 0.9),
+                                                         ('liquid_metal', 0.1)]
+
+    # every element either leaves core_inlet or ends up in a waste stream
+    total_fractions = transfer.thru_fractions + \
+        np.sum(list(transfer.waste_fractions.values()), axis=0)
+    np.testing.assert_allclose(total_fractions, 1.0)
+    # elements without removal pass through unchanged
+    assert transfer.thru_fractions[-1] == 1.0
+    xe_idx = transfer.elements.index('Xe')
+    np.testing.assert_almost_equal(
+        transfer.waste_fractions['sparger'][xe_idx],
+        processes['sparger'].efficiency['Xe'])
+
+    processes['entrainment_separator'].efficiency['Xe'] = 0.5
+    assert ReprocessingTransfer(processes, graph, order).is_constant
+
+    # a branch without flow would silently drop its inflow
+    processes['liquid_metal'].mass_flowrate = 0.0
+    with pytest.raises(ValueError):
+        ReprocessingTransfer(processes, graph, order)
+
+
+def test_reprocessing_transfer_without_waste(proc_test_file, path_test_file):
+    processes = get_extraction_processes(proc_test_file)['fuel']
+    _, graph, order = get_extraction_process_graph(path_test_file)
+    transfer = ReprocessingTransfer(processes, graph, order)
+    # none of the elements in the material are removed
+    material = Materialflow(comp={'U235': 0.2, 'U238': 0.8},
+                            density=2.0,
+                            volume=10.0)
+    waste_streams = {}
+    outflow = transfer.apply(material, waste_streams)
+    assert set(waste_streams) == {'waste_' + proc for proc in order}
+    for waste_stream in waste_streams.values():
+        assert not waste_stream.comp
+        assert waste_stream.mass == 0.0
+    np.testing.assert_array_equal(outflow.positions, material.positions)
+    np.testing.assert_allclose(outflow.fractions, material.fractions)
+    assert outflow.mass == pytest.approx(material.mass)
+    assert outflow.volume == pytest.approx(material.volume)
+
+    # the same holds if the processes remove nothing
+    for process in processes.values():
+        for element in process.efficiency:
+            process.efficiency[element] = 0.0
+    transfer = ReprocessingTransfer(processes, graph, order)
+    material = Materialflow(comp={'U235': 0.2, 'Xe135': 0.8},
+                            density=2.0,
+                            volume=10.0)
+    outflow = transfer.apply(material, waste_streams)
+    for waste_stream in waste_streams.values():
+        assert waste_stream.mass == 0.0
+    np.testing.assert_allclose(outflow.fractions, material.fractions)
+    assert outflow.mass == pytest.approx(material.mass)
+
+
+def test_reprocessing_transfer_empty_material(proc_test_file,
+                                              path_test_file):
+    processes = get_extraction_processes(proc_test_file)['fuel']
+    _, graph, order = get_extraction_process_graph(path_test_file)
+    transfer = ReprocessingTransfer(processes, graph, order)
+    waste_streams = {}
+    outflow = transfer.apply(Materialflow(), waste_streams)
+    assert outflow.mass == 0.0
+    assert outflow.volume == 0.0
+    assert not np.isnan(outflow.fractions).any()
+    for waste_stream in waste_streams.values():
+        assert waste_stream.mass == 0.0
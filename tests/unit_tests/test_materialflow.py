@@ -1,4 +1,10 @@
 """Test Materialflow functions"""
+from copy import deepcopy
+
+import numpy as np
+import pytest
+
+from saltproc import Materialflow
 
 
 def test_get_mass(serpent_depcode):
@@ -16,3 +22,80 @@ def test_scale_matflow(serpent_depcode):
     assert scaled_matflow['F19'] == scale_factor * mats['fuel'].get_mass('F19')
     assert scaled_matflow['Li7'] == scale_factor * mats['fuel'].get_mass('Li7')
 
+
+def test_add():
+    x = Materialflow(comp={'U235': 0.2, 'U238': 0.8},
+                     density=10.0,
+                     volume=2.0,
+                     mass_flowrate=1.0,
+                     burnup=1.0)
+    y = Materialflow(comp={'U238': 0.5, 'Pu239': 0.5},
+                     density=5.0,
+                     volume=4.0,
+                     mass_flowrate=2.0,
+                     burnup=4.0)
+    z = x + y
+    assert z.mass == 40.0
+    # the sum keeps the density of the first material flow
+    assert z.volume == 4.0
+    assert z.get_nuclides() == ['U235', 'U238', 'Pu239']
+    np.testing.assert_almost_equal(z.get_mass('U235'), 4.0)
+    np.testing.assert_almost_equal(z.get_mass('U238'), 26.0)
+    np.testing.assert_almost_equal(z.get_mass('Pu239'), 10.0)
+    assert z.mass_flowrate == 3.0
+    np.testing.assert_almost_equal(z.burnup, 2.5)
+
+    empty = Materialflow()
+    assert (x + empty) is x
+    assert (empty + x) is x
+
+
+def test_rmul():
+    x = Materialflow(comp={'U235': 0.2, 'U238': 0.8},
+                     density=10.0,
+                     volume=2.0,
+                     mass_flowrate=1.0)
+    y = 0.5 * x
+    assert y.volume == 1.0
+    assert y.mass == 10.0
+    assert y.mass_flowrate == 0.5
+    assert y.comp == x.comp
+    # composition arrays are shared and read-only
+    assert y.fractions is x.fractions
+    with pytest.raises(ValueError):
+        y.fractions[0] = 1.0
+
+
+def test_from_arrays():
+    x = Materialflow(comp={'U235': 0.2, 'U238': 0.8}, density=10.0)
+    y = Materialflow.from_arrays(x.positions, x.fractions, density=10.0)
+    assert y.comp == x.comp
+    assert y.mass == x.mass
+
+
+def test_deepcopy():
+    x = Materialflow(comp={'U235': 0.2, 'U238': 0.8},
+                     density=10.0,
+                     volume=2.0,
+                     mass_flowrate=1.0,
+                     void_frac=0.1,
+                     burnup=1.0,
+                     name='fuel',
+                     temperature=900.0)
+    y = deepcopy(x)
+    for slot in Materialflow.__slots__:
+        if slot != '_comp':
+            np.testing.assert_equal(getattr(y, slot), getattr(x, slot))
+    assert y.name == 'fuel'
+    assert y.temperature == 900.0
+    assert y.comp == x.comp
+    # the key-word arguments are copied, not shared
+    assert y._material_kwargs is not x._material_kwargs
+    assert y.to_openmc().name == 'fuel'
+
+
+def test_print_attr(capsys):
+    Materialflow().print_attr()
+    assert 'Density not set' in capsys.readouterr().out
+    Materialflow(density=10.0).print_attr()
+    assert 'Density 10.000000 g/cm3' in capsys.readouterr().out
@@ -0,0 +1,50 @@
+"""Test NuclideIndex functions"""
+import numpy as np
+import pytest
+
+from saltproc import NuclideIndex
+
+
+def test_zam_sorted_construction():
+    index = NuclideIndex(['U238', 'Am242_m1', 'U235', 'Am242'])
+    assert index.names == ['U235', 'U238', 'Am242', 'Am242_m1']
+    np.testing.assert_array_equal(index.zam,
+                                  [922350, 922380, 952420, 952421])
+    np.testing.assert_array_equal(index.elements, ['U', 'U', 'Am', 'Am'])
+
+
+def test_positions():
+    index = NuclideIndex(['U235'])
+    positions = index.positions(['Xe135', 'U235', 'Xe135'])
+    np.testing.assert_array_equal(positions, [1, 0, 1])
+    assert len(index) == 2
+    # positions of known nuclides never change
+    np.testing.assert_array_equal(index.zam_positions([922350, 922380]),
+                                  [0, 2])
+    assert index.names_at([2, 1]) == ['U238', 'Xe135']
+    np.testing.assert_array_equal(index.zam_order([0, 1, 2]), [1, 0, 2])
+
+
+def test_nuclide_codes():
+    index = NuclideIndex(['U235', 'Am242', 'Am242_m1', 'Ag110_m1'])
+    positions = index.positions(['U235', 'Am242', 'Am242_m1', 'Ag110_m1'])
+    np.testing.assert_array_equal(index.nuclide_codes(positions, 'mcnp'),
+                                  [92235, 95242, 95642, 47510])
+    np.testing.assert_array_equal(index.nuclide_codes(positions, 'nndc'),
+                                  [92235, 95642, 95242, 47510])
+    np.testing.assert_array_equal(index.nuclide_codes(positions, 'serpent'),
+                                  [92235, 95242, 95342, 47310])
+    with pytest.raises(ValueError):
+        index.nuclide_codes(positions, 'endf')
+
+
+def test_nuclide_codes_of_added_nuclides():
+    index = NuclideIndex(['U235'])
+    positions = index.positions(['Xe135', 'Am242_m1', 'U235'])
+    np.testing.assert_array_equal(positions, [1, 2, 0])
+    np.testing.assert_array_equal(index.nuclide_codes(positions, 'nndc'),
+                                  [54135, 95242, 92235])
+    # nuclides keep the position they were added at, and are sorted by ZAM
+    # on request
+    np.testing.assert_array_equal(
+        np.asarray(positions)[index.zam_order(positions)], [1, 0, 2])
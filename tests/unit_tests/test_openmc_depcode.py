@@ -1,4 +1,7 @@
 """Test OpenMCDepcode functions"""
+import io
+import sys
+
 import pytest
 
 import numpy as np
@@ -6,6 +9,8 @@ from pathlib import Path
 
 import openmc
 
+from saltproc.openmc_deplete import update_materials
+
 
 def test_read_depcode_metadata(openmc_depcode):
     old_output_path = openmc_depcode.output_path
@@ -72,3 +77,36 @@ def test_name_to_nuclide_code(openmc_depcode):
     assert openmc_depcode.name_to_nuclide_code('Ag110_m1') == 47510
     assert openmc_depcode.name_to_nuclide_code('Am242') == 95242
     assert openmc_depcode.name_to_nuclide_code('Am242_m1') == 95642
+
+
+def test_update_materials(openmc_depcode):
+    openmc.reset_auto_ids()
+    materials = openmc.Materials.from_xml(
+        openmc_depcode.template_input_file_path['materials'])
+    model = openmc.model.Model(materials=materials)
+    name = [material.name for material in materials if material.depletable][0]
+
+    update_materials(model, {name: {'density': 3.0,
+                                    'volume': 10.0,
+                                    'comp': {'U235': 0.4, 'U238': 0.6}}})
+    material = [material for material in model.materials
+                if material.name == name][0]
+    np.testing.assert_almost_equal(material.get_mass_density(), 3.0)
+    assert material.volume == 10.0
+    assert sorted(material.get_nuclides()) == ['U235', 'U238']
+
+
+def test_close_session_without_session(openmc_depcode):
+    assert openmc_depcode.persistent_session is False
+    # no session has been started, so this should do nothing
+    openmc_depcode.close_session()
+
+
+def test_start_session_without_stdout_fileno(openmc_depcode, tmp_path,
+                                             monkeypatch):
+    # sys.stdout may be replaced by an object without a file descriptor,
+    # e.g. in notebooks
+    monkeypatch.setattr(openmc_depcode, 'output_path', tmp_path)
+    monkeypatch.setattr(sys, 'stdout', io.StringIO())
+    with pytest.raises(RuntimeError, match='SESSION FAILED TO START'):
+        openmc_depcode._start_session([sys.executable, '-c', 'pass'])
@@ -1,10 +1,16 @@
 """Test SerpentDepcode functions"""
+import io
+import sys
+
 import pytest
 import numpy as np
 import tempfile
 from pathlib import Path
 
+import serpentTools
+
 from saltproc import SerpentDepcode
+from saltproc.serpent_depcode import _read_dep_file
 
 
 def test_create_nuclide_name_map_zam_to_serpent(serpent_depcode, cwd):
@@ -52,6 +58,49 @@ def test_create_nuclide_name_map_zam_to_serpent(serpent_depcode, cwd):
     serpent_depcode.zaid_convention = 'serpent'
 
 
+def test_nuclide_code_map_cache(serpent_depcode, tmp_path, monkeypatch):
+    out_file = tmp_path / 'runtime_input.serpent.out'
+    out_file.write_text('  1  U235  92235.09c  TRA\n'
+                        '  2  Cf251  982510  c  DEC\n')
+    monkeypatch.setattr(serpent_depcode, 'runtime_inputfile',
+                        str(tmp_path / 'runtime_input.serpent'))
+    monkeypatch.setattr(serpent_depcode, 'nuclide_code_map_file',
+                        str(tmp_path / 'nuclide_codes.json'))
+    monkeypatch.setattr(serpent_depcode, '_nuc_code_map', None)
+    scans = []
+    scan = serpent_depcode.map_nuclide_name_to_serpent_name
+
+    def counted_scan():
+        scans.append(1)
+        return scan()
+
+    monkeypatch.setattr(serpent_depcode, 'map_nuclide_name_to_serpent_name',
+                        counted_scan)
+
+    expected = {'U235': '92235.09c', 'Cf251': '982510'}
+    assert serpent_depcode.get_nuclide_code_map(['U235']) == expected
+    assert serpent_depcode.get_nuclide_code_map(['U235', 'Cf251']) == expected
+    assert len(scans) == 1
+
+    # Restarted simulations read the saved map
+    monkeypatch.setattr(serpent_depcode, '_nuc_code_map', None)
+    assert serpent_depcode.get_nuclide_code_map(['Cf251']) == expected
+    assert len(scans) == 1
+
+    # Unknown nuclides are added from the output file
+    out_file.write_text(out_file.read_text() + '  3  H1  1001.09c  TRA\n')
+    assert serpent_depcode.get_nuclide_code_map(['H1'])['H1'] == '1001.09c'
+    assert len(scans) == 2
+    monkeypatch.setattr(serpent_depcode, '_nuc_code_map', None)
+    assert 'H1' in serpent_depcode.get_nuclide_code_map()
+
+    # Maps saved with other settings are rebuilt
+    monkeypatch.setattr(serpent_depcode, '_nuc_code_map', None)
+    monkeypatch.setattr(serpent_depcode, 'zaid_convention', 'mcnp')
+    serpent_depcode.get_nuclide_code_map()
+    assert len(scans) == 3
+
+
 def test_nuclide_code_to_zam(serpent_depcode):
     assert serpent_depcode._nuclide_code_to_zam(47310) == (47, 110, 1)
     assert serpent_depcode._nuclide_code_to_zam(95342) == (95, 242, 1)
@@ -62,6 +111,25 @@ def test_nuclide_code_to_zam(serpent_depcode):
     assert serpent_depcode._nuclide_code_to_zam(48315) == (48, 115, 1)
 
 
+def test_nuclide_code_translation(serpent_depcode, monkeypatch):
+    codes = ['92235.09c', '95342.09c', '61348.03c', '1001.09c', '20060',
+             '491142']
+    names = ['U235', 'Am242_m1', 'Pm148_m1', 'H1', 'He6', 'In114_m2']
+    assert serpent_depcode.nuclide_codes_to_names(codes) == names
+    np.testing.assert_array_equal(
+        serpent_depcode.names_to_nuclide_codes(names[:4]),
+        [92235, 95342, 61348, 1001])
+    assert serpent_depcode.name_to_nuclide_code('U238') == 92238
+    assert serpent_depcode.name_to_nuclide_code('Ag110_m1') == 47310
+
+    monkeypatch.setattr(serpent_depcode, 'zaid_convention', 'nndc')
+    assert serpent_depcode.nuclide_codes_to_names(
+        ['95242.82c', '95642.82c', '61548.82c']) == \
+        ['Am242_m1', 'Am242', 'Pm148_m1']
+    assert serpent_depcode.name_to_nuclide_code('Am242_m1') == 95242
+    assert serpent_depcode.name_to_nuclide_code('Ag110_m1') == 47510
+
+
 def test_get_neutron_settings(serpent_depcode):
     template_str = serpent_depcode.read_plaintext_file(
         serpent_depcode.template_input_file_path)
@@ -241,6 +309,48 @@ def test_read_neutronics_parameters(serpent_depcode):
     assert serpent_depcode.neutronics_parameters['fission_mass_eds'] == 70077.1
 
 
+def test_read_res_file(serpent_depcode, cwd, tmp_path, monkeypatch):
+    res_file = tmp_path / 'runtime_input.serpent_res.m'
+    res_file.write_text((cwd / 'serpent_data' / 'tap_reference_res.m').read_text())
+    parsed = []
+
+    def read(path):
+        parsed.append(path)
+        return object()
+
+    monkeypatch.setattr('saltproc.serpent_depcode.serpentTools.read', read)
+    monkeypatch.setattr(serpent_depcode, 'runtime_inputfile',
+                        str(tmp_path / 'runtime_input.serpent'))
+    monkeypatch.setattr(serpent_depcode, '_output_files', {})
+
+    # The three readers of a depletion step share one parse
+    res = serpent_depcode._read_res_file()
+    assert serpent_depcode._read_res_file() is res
+    assert serpent_depcode._read_res_file() is res
+    assert parsed == [str(res_file)]
+
+    # The next depletion step's output replaces the parsed file
+    res_file.write_text(res_file.read_text() + '\n')
+    assert serpent_depcode._read_res_file() is not res
+    assert len(parsed) == 2
+
+
+def test_read_dep_file(cwd):
+    dep_file = str(cwd / 'serpent_data' / 'tap_reference_dep.m')
+    dep = _read_dep_file(dep_file)
+    reference = serpentTools.read(dep_file)
+    np.testing.assert_array_equal(dep['days'], reference.days)
+    np.testing.assert_array_equal(dep['burnup'], reference.burnup)
+    assert set(dep['materials']) == {'fuel', 'ctrlPois'}
+    for name, material in dep['materials'].items():
+        np.testing.assert_array_equal(dep['zai'],
+                                      reference.materials[name].zai)
+        np.testing.assert_array_equal(material['volume'],
+                                      reference.materials[name].volume)
+        np.testing.assert_array_equal(material['mdens'],
+                                      reference.materials[name].mdens)
+
+
 def test_read_depleted_materials(serpent_depcode):
     mats = serpent_depcode.read_depleted_materials(True)
     np.testing.assert_allclose(mats['fuel'].get_mass('U235'), 3499538.3359278883, rtol=1e-6)
@@ -251,3 +361,58 @@ def test_read_depleted_materials(serpent_depcode):
     np.testing.assert_allclose(mats['fuel'].get_mass('Pu239'), 1231.3628804629795, rtol=1e-6)
     np.testing.assert_allclose(mats['ctrlPois'].get_mass('Gd155'), 5812.83289505528, rtol=1e-6)
     np.testing.assert_allclose(mats['ctrlPois'].get_mass('O16'), 15350.701473655872, rtol=1e-6)
+
+
+def _stub_session(serpent_depcode, cwd, tmp_path):
+    depcode = SerpentDepcode(output_path=tmp_path,
+                             exec_path=str(cwd / 'serpent_data' / 'sss2_stub.py'),
+                             template_input_file_path=serpent_depcode.template_input_file_path,
+                             geo_file_paths=serpent_depcode.geo_file_paths,
+                             zaid_convention='mcnp',
+                             persistent_session=True)
+    matfile = Path(depcode.runtime_matfile)
+    power_card = 'set    power   1.250000000E+09   dep daystep   3.00000E+00\n'
+    lines = depcode.set_comfile([f'include "{matfile}"\n', power_card])
+    assert lines[-1].startswith('set comfile')
+    # set_comfile should not add a second card
+    assert len(depcode.set_comfile(lines)) == 3
+    with open(depcode.runtime_inputfile, 'w') as f:
+        f.writelines(lines)
+    return depcode, matfile
+
+
+def test_persistent_session(serpent_depcode, cwd, tmp_path, monkeypatch):
+    depcode, matfile = _stub_session(serpent_depcode, cwd, tmp_path)
+    # sys.stdout may be replaced by an object without a file descriptor,
+    # e.g. in notebooks
+    monkeypatch.setattr(sys, 'stdout', io.StringIO())
+    matfile.write_text('% step 0\n')
+    depcode.run_depletion_step()
+    process = depcode._session
+    matfile.write_text('% step 1\n')
+    depcode.run_depletion_step()
+    # the resident process should be reused
+    assert depcode._session is process
+    depcode.close_session()
+
+    assert process.returncode == 0
+    assert depcode._session is None
+    log = Path(f'{depcode.runtime_inputfile}.stub_log').read_text()
+    assert log == '% step 0\n% step 1\n'
+    # the second interval is appended to the depletion output
+    days = depcode._read_depletion_output()['days']
+    np.testing.assert_allclose(days, [0.0, 3.0, 6.0])
+
+
+def test_persistent_session_stock_serpent(serpent_depcode, cwd, tmp_path,
+                                          monkeypatch):
+    monkeypatch.setenv('SSS2_STUB_STOCK', '1')
+    depcode, matfile = _stub_session(serpent_depcode, cwd, tmp_path)
+    matfile.write_text('% step 0\n')
+    depcode.run_depletion_step()
+    process = depcode._session
+    # stock Serpent2 repeats the first interval on SIGUSR2
+    with pytest.raises(RuntimeError, match='did not advance'):
+        depcode.run_depletion_step()
+    assert depcode._session is None
+    assert process.wait(timeout=10) == 0
@@ -1,5 +1,13 @@
 """Test Simulation functions"""
 from pathlib import Path
+import threading
+
+import pytest
+import tables as tb
+
+import saltproc.simulation
+from saltproc import Simulation
+from saltproc.simulation import _DatabaseWriter
 
 
 def test_check_switch_geo_trigger(simulation):
@@ -26,3 +34,160 @@ def test_read_k_eds_delta(simulation):
     simulation.db_path = str(Path(simulation.db_path).parents[1] / 'tap_reference_db.h5')
     assert simulation.read_k_eds_delta(7) is False
     simulation.db_path = old_db_path
+
+
+def test_database_writer():
+    writer = _DatabaseWriter()
+    written = []
+    for i in range(5):
+        writer.submit(written.append, i)
+    writer.flush()
+    assert written == [0, 1, 2, 3, 4]
+
+    def fail():
+        raise ValueError('bad write')
+    writer.submit(fail)
+    writer.submit(written.append, 5)
+    with pytest.raises(RuntimeError, match='Writing to the database failed'):
+        writer.flush()
+    # requests after a failed write are skipped
+    assert written == [0, 1, 2, 3, 4]
+    # and the error is raised by later requests instead of skipping them
+    with pytest.raises(RuntimeError, match='Writing to the database failed'):
+        writer.submit(written.append, 6)
+    assert written == [0, 1, 2, 3, 4]
+    writer.close()
+    with pytest.raises(RuntimeError, match='The database writer is closed'):
+        writer.submit(written.append, 6)
+
+
+def test_durability(simulation):
+    with pytest.raises(ValueError):
+        Simulation(sim_depcode=simulation.sim_depcode, durability='never')
+
+
+def test_async_end_step(simulation, tmp_path):
+    sim = Simulation(sim_depcode=simulation.sim_depcode,
+                     db_path=str(tmp_path / 'db.h5'),
+                     async_storage=True,
+                     durability='step')
+    synced = []
+    sim._sync_database = lambda: synced.append(True)
+    # end_step(wait=True) returns once the writes of the step are done
+    sim.end_step(wait=True)
+    assert synced == [True]
+
+    def fail():
+        raise ValueError('bad write')
+    sim._submit(fail)
+    with pytest.raises(RuntimeError, match='Writing to the database failed'):
+        sim.end_step(wait=True)
+    with pytest.raises(RuntimeError, match='Writing to the database failed'):
+        sim._submit(synced.append, True)
+    assert synced == [True]
+    sim._writer.close()
+
+
+def test_async_step_overlap(simulation, tmp_path, monkeypatch):
+    mats = simulation.sim_depcode.read_depleted_materials(True)
+    sim = Simulation(sim_depcode=simulation.sim_depcode,
+                     db_path=str(tmp_path / 'db.h5'),
+                     async_storage=True,
+                     durability='fsync')
+    next_steps = [threading.Event() for step in range(2)]
+    overlapped = []
+
+    def fsync(fd):
+        # the end of step fsync waits until the next step has started
+        overlapped.append(
+            next_steps[len(overlapped)].wait(timeout=5.0))
+    monkeypatch.setattr(saltproc.simulation.os, 'fsync', fsync)
+    with sim:
+        for step, next_step in enumerate(next_steps):
+            sim.store_mat_data(mats, step, False)
+            sim.end_step()
+            next_step.set()
+    assert overlapped == [True, True]
+    with tb.open_file(sim.db_path, mode='r') as db:
+        assert db.root.materials.fuel.before_reproc.comp.nrows == 2
+    sim._writer.close()
+
+
+def test_run_state(simulation, monkeypatch):
+    db_path = str(Path(simulation.db_path).parents[1] / 'tap_reference_db.h5')
+    sim = Simulation(sim_depcode=simulation.sim_depcode,
+                     db_path=db_path,
+                     restart_flag=True)
+    failed_step = sim.check_restart()
+    assert failed_step == len(sim._keff_eds) > 0
+
+    # The run state is read once, so later steps do not read the database
+    def no_reads(*args, **kwargs):
+        raise AssertionError('the database was read')
+    monkeypatch.setattr('tables.open_file', no_reads)
+    assert sim.read_k_eds_delta(7) is False
+    assert sim.check_restart() == failed_step
+
+
+def test_open_locked_live_database(simulation, tmp_path, monkeypatch):
+    sim = Simulation(sim_depcode=simulation.sim_depcode,
+                     db_path=str(tmp_path / 'db.h5'),
+                     live_results=True)
+    open_file = tb.open_file
+    attempts = []
+
+    def locked_open_file(*args, **kwargs):
+        # a reader holds the lock for the first attempts
+        attempts.append(True)
+        if len(attempts) < 4:
+            raise tb.exceptions.HDF5ExtError('unable to lock file')
+        return open_file(*args, **kwargs)
+    monkeypatch.setattr(tb, 'open_file', locked_open_file)
+    monkeypatch.setattr(saltproc.simulation, '_LOCK_RETRY_INTERVAL', 0.01)
+    monkeypatch.setattr(saltproc.simulation, '_LOCK_WARNING_TIME', 0.0)
+    # the writer waits for the reader instead of failing
+    with pytest.warns(UserWarning, match='locked by a reader'):
+        db = sim._open_db('w')
+    db.close()
+    assert len(attempts) == 4
+
+
+def test_open_live_database_timeout(simulation, tmp_path, monkeypatch):
+    sim = Simulation(sim_depcode=simulation.sim_depcode,
+                     db_path=str(tmp_path / 'db.h5'),
+                     live_results=True,
+                     live_results_timeout=0.05)
+    attempts = []
+
+    def locked_open_file(*args, **kwargs):
+        attempts.append(True)
+        raise tb.exceptions.HDF5ExtError('unable to lock file')
+    monkeypatch.setattr(tb, 'open_file', locked_open_file)
+    monkeypatch.setattr(saltproc.simulation, '_LOCK_RETRY_INTERVAL', 0.01)
+    # a reader that never closes the database stops the writer eventually
+    with pytest.raises(TimeoutError, match='locked by a reader'):
+        sim._open_db('a')
+    assert len(attempts) > 1
+
+
+def test_open_broken_live_database(simulation, tmp_path):
+    db_path = tmp_path / 'db.h5'
+    db_path.write_text('not an HDF5 file')
+    sim = Simulation(sim_depcode=simulation.sim_depcode,
+                     db_path=str(db_path),
+                     live_results=True)
+    # only lock errors are retried
+    with pytest.raises(tb.exceptions.HDF5ExtError):
+        sim._open_db('a')
+
+
+def test_fixed_nuclide_axis_without_nuclides(simulation, tmp_path,
+                                             monkeypatch):
+    mats = simulation.sim_depcode.read_depleted_materials(True)
+    monkeypatch.setattr(simulation.sim_depcode, 'get_depletion_nuclides',
+                        lambda: None)
+    sim = Simulation(sim_depcode=simulation.sim_depcode,
+                     db_path=str(tmp_path / 'db.h5'),
+                     nuclide_axis='fixed')
+    with pytest.raises(RuntimeError, match='cannot list them'):
+        sim.store_mat_data(mats, 0, False)